@@ -3,29 +3,42 @@ Smart Routing API Endpoints
 Handles intelligent route finding with traffic prediction
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
 from datetime import datetime
-import json
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.workers import get_worker_pool
 from app.schemas.routing import (
     RouteRequest,
     RouteResponse,
     AlternativeRoutesRequest,
+    MatrixRequest,
+    MatrixResponse,
+    IsochroneRequest,
+    IsochroneResponse,
+    BestDepartureRequest,
+    BestDepartureResponse,
+    BatchRouteRequest,
+    BatchRouteResult,
+    RerouteRequest,
+    RerouteResponse,
     RoadStatusResponse
 )
+from app.core.config import settings
 from app.services.routing_service import get_routing_service
+from app.services.batch_routing import group_trips, chunk_groups, batch_snapshot, route_groups
+from app.services.route_cache import get_route_cache
+from app.services.search_stats import get_search_metrics
+from app.services.vehicle_profiles import resolve_vehicle_profile
 
 router = APIRouter()
 
 
 @router.post("/find-route", response_model=RouteResponse)
-async def find_optimal_route(
-    request: RouteRequest,
-    db: Session = Depends(get_db)
-):
+async def find_optimal_route(request: RouteRequest):
     """
     Tìm đường đi tối ưu từ điểm A đến điểm B
     
@@ -35,47 +48,44 @@ async def find_optimal_route(
     - origin: Origin road segment ID
     - destination: Destination road segment ID
     - departure_time: Departure time (optional, default: now)
+    - heuristic: A* heuristic - geo (default), alt (precomputed landmarks), none
+    - engine: astar (default, ML predictions), td (historical travel time profiles) or ch (contraction hierarchy lookup)
+    - bidirectional: Also search backward from the destination on free-flow times (astar/td),
+      which settles far fewer segments on long routes
+    - include_stats: Add search_stats (segments settled, edges relaxed, heap pushes, cost
+      evaluations, DB queries, model calls and timings) to the response
+    - vehicle_profile / vehicle_id: Only use segments the vehicle type, height, width and
+      weight are allowed on (a Vehicle entity adds its cargo weight)
     
     Returns:
-    - Optimal route with segments, distance, estimated time
+    - Optimal route with segments, distance, estimated time, and a route_id for /reroute
     """
-    try:
+    def compute(db: Session) -> Dict:
         routing_service = get_routing_service(db)
+        vehicle = resolve_vehicle_profile(db, request.vehicle_profile, request.vehicle_id)
         
         # Find optimal route
         result = routing_service.find_optimal_route(
             origin=request.origin,
             destination=request.destination,
-            departure_time=request.departure_time
+            departure_time=request.departure_time,
+            heuristic=request.heuristic or "geo",
+            engine=request.engine or "astar",
+            bidirectional=bool(request.bidirectional),
+            vehicle=vehicle
         )
+        if result['success']:
+            result['route_id'] = routing_service.track_route(
+                request.origin, request.destination, result['path'], vehicle
+            )
+        return result
+    
+    try:
+        result = await get_worker_pool('routing').run_with_db(compute)
         
         if not result['success']:
             raise HTTPException(status_code=404, detail=result.get('error', 'Route not found'))
         
-        # Parse GeoJSON coordinates from database
-        from app.models.traffic import RoadSegment
-        
-        for segment in result['segments']:
-            segment_id = segment['segment_id']
-            # Fetch segment with coordinates
-            db_segment = db.query(RoadSegment).filter(RoadSegment.id == segment_id).first()
-            
-            if db_segment:
-                try:
-                    # Parse GeoJSON startPoint and endPoint
-                    if db_segment.startPoint:
-                        start_geojson = json.loads(db_segment.startPoint)
-                        if 'coordinates' in start_geojson:
-                            segment['start_coordinates'] = start_geojson['coordinates']  # [lon, lat]
-                    
-                    if db_segment.endPoint:
-                        end_geojson = json.loads(db_segment.endPoint)
-                        if 'coordinates' in end_geojson:
-                            segment['end_coordinates'] = end_geojson['coordinates']  # [lon, lat]
-                except (json.JSONDecodeError, KeyError, TypeError) as e:
-                    # If parse fails, skip coordinates
-                    print(f"Warning: Could not parse GeoJSON for {segment_id}: {e}")
-        
         return {
             "success": True,
             "route": {
@@ -87,30 +97,28 @@ async def find_optimal_route(
             "origin": request.origin,
             "destination": request.destination,
             "mode": request.mode or "optimal",
+            "vehicle": result.get('vehicle'),
             "departure_time": result.get('departure_time'),
             "estimated_arrival_time": result.get('estimated_arrival_time'),
             "generated_at": datetime.now(),
             "incidents_avoided": result.get('incidents_avoided', 0),
             "prediction_based": result.get('prediction_based', True),
-            "explanation": result.get('explanation', '')
+            "explanation": result.get('explanation', ''),
+            "graph_version": result.get('graph_version'),
+            "route_id": result['route_id'],
+            "search_stats": result['search_stats'] if request.include_stats else None
         }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-        
+    
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/alternative-routes", response_model=List[RouteResponse])
-async def find_alternative_routes(
-    request: AlternativeRoutesRequest,
-    db: Session = Depends(get_db)
-):
+async def find_alternative_routes(request: AlternativeRoutesRequest):
     """
     Tìm nhiều lộ trình thay thế
     
@@ -118,19 +126,23 @@ async def find_alternative_routes(
     - origin: Điểm xuất phát (segment ID)
     - destination: Điểm đích (segment ID)
     - num_alternatives: Số lộ trình thay thế (1-5)
+    - heuristic, engine, vehicle_profile, vehicle_id: As for /find-route
     
     Returns:
-    - List of alternative routes sorted by preference
+    - List of alternative routes sorted by estimated time, with overlap/diversity scores
     """
     try:
-        routing_service = get_routing_service(db)
-        
         # Find alternative routes
-        routes = routing_service.find_alternative_routes(
-            origin=request.origin,
-            destination=request.destination,
-            departure_time=request.departure_time,
-            num_routes=min(request.num_alternatives or 3, 5)
+        routes = await get_worker_pool('routing').run_with_db(
+            lambda db: get_routing_service(db).find_alternative_routes(
+                origin=request.origin,
+                destination=request.destination,
+                departure_time=request.departure_time,
+                num_routes=min(request.num_alternatives or 3, 5),
+                heuristic=request.heuristic or "geo",
+                engine=request.engine or "astar",
+                vehicle=resolve_vehicle_profile(db, request.vehicle_profile, request.vehicle_id)
+            )
         )
         
         # Format response
@@ -148,20 +160,364 @@ async def find_alternative_routes(
                     "origin": request.origin,
                     "destination": request.destination,
                     "mode": "alternative",
-                    "generated_at": datetime.now()
+                    "vehicle": route.get('vehicle'),
+                    "departure_time": route.get('departure_time'),
+                    "estimated_arrival_time": route.get('estimated_arrival_time'),
+                    "generated_at": datetime.now(),
+                    "incidents_avoided": route.get('incidents_avoided', 0),
+                    "graph_version": route.get('graph_version'),
+                    "overlap": route.get('overlap'),
+                    "diversity_score": route.get('diversity_score')
                 })
         
         return results
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/matrix", response_model=MatrixResponse)
+async def travel_time_matrix(request: MatrixRequest):
+    """
+    Ma trận thời gian di chuyển giữa nhiều điểm
+    
+    One multi-source Dijkstra per departure bucket over the shared road graph
+    
+    Parameters:
+    - origins: Origin segment IDs (rows)
+    - destinations: Destination segment IDs (columns)
+    - departure_time: Departure time for all origins (optional, default: now)
+    - departure_times: Per-origin departure times (optional)
+    - engine: td (default, travel time profiles) or ch (contraction hierarchy metric)
+    - vehicle_profile / vehicle_id: As for /find-route
+    
+    Returns:
+    - Travel times in minutes (null where unreachable)
+    """
+    if len(request.origins) * len(request.destinations) > settings.ROUTING_MATRIX_MAX_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Matrix too large (max {settings.ROUTING_MATRIX_MAX_CELLS} cells)"
+        )
+    if request.departure_times is not None and len(request.departure_times) != len(request.origins):
+        raise HTTPException(status_code=400, detail="departure_times must have one entry per origin")
+    
+    try:
+        result = await get_worker_pool('routing').run_with_db(
+            lambda db: get_routing_service(db).compute_travel_time_matrix(
+                origins=request.origins,
+                destinations=request.destinations,
+                departure_time=request.departure_time,
+                departure_times=request.departure_times,
+                engine=request.engine or "td",
+                vehicle=resolve_vehicle_profile(db, request.vehicle_profile, request.vehicle_id)
+            )
+        )
+        
+        if not result['success']:
+            raise HTTPException(status_code=404, detail=result.get('error', 'Segments not found'))
         
+        durations = result['durations']
+        return {
+            "success": True,
+            "origins": request.origins,
+            "destinations": request.destinations,
+            "durations": [
+                [round(float(value), 2) if value != float('inf') else None for value in row]
+                for row in durations.tolist()
+            ],
+            "departure_times": result['departure_times'],
+            "engine": result['engine'],
+            "generated_at": datetime.now(),
+            "graph_version": result.get('graph_version')
+        }
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/isochrone", response_model=IsochroneResponse)
+async def isochrone(request: IsochroneRequest):
+    """
+    Vùng có thể đến được trong khoảng thời gian cho trước
+    
+    One time-dependent Dijkstra bounded by the largest budget
+    
+    Parameters:
+    - origin: Origin segment ID (or latitude/longitude to snap to the nearest segment)
+    - departure_time: Departure time (optional, default: now)
+    - budgets: Travel time budgets in minutes (default: 10, 20, 30)
+    - include_geometry: Include merged GeoJSON per budget
+    - engine: td (default, travel time profiles) or ch (contraction hierarchy metric)
+    - vehicle_profile / vehicle_id: As for /find-route
+    
+    Returns:
+    - Reachable segment IDs per budget
+    """
+    if request.origin is None and (request.latitude is None or request.longitude is None):
+        raise HTTPException(status_code=400, detail="Provide an origin segment or latitude/longitude")
+    if any(budget <= 0 for budget in request.budgets):
+        raise HTTPException(status_code=400, detail="Budgets must be positive")
+    
+    try:
+        result = await get_worker_pool('routing').run_with_db(
+            lambda db: get_routing_service(db).compute_isochrone(
+                origin=request.origin,
+                budgets=request.budgets,
+                departure_time=request.departure_time,
+                latitude=request.latitude,
+                longitude=request.longitude,
+                engine=request.engine or "td",
+                include_geometry=bool(request.include_geometry),
+                vehicle=resolve_vehicle_profile(db, request.vehicle_profile, request.vehicle_id)
+            )
+        )
+        
+        if not result['success']:
+            raise HTTPException(status_code=404, detail=result.get('error', 'Origin not found'))
+        
+        result['generated_at'] = datetime.now()
+        return result
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/best-departure", response_model=BestDepartureResponse)
+async def best_departure(request: BestDepartureRequest):
+    """
+    Tìm thời điểm xuất phát tốt nhất trong một khoảng thời gian
+    
+    One profile search over historical travel time profiles evaluates every
+    departure in the window at once, instead of one /find-route per departure
+    
+    Parameters:
+    - origin: Origin segment ID
+    - destination: Destination segment ID
+    - window_start, window_end: Departure window (e.g. 06:30 - 09:00)
+    - step_minutes: Spacing of evaluated departures (default: 5)
+    - heuristic: geo (default), alt (precomputed landmarks), none
+    - vehicle_profile / vehicle_id: As for /find-route
+    - include_stats: Add search_stats to the response
+    
+    Returns:
+    - Arrival time and travel time per departure, and the route of the best departure
+    """
+    if request.window_end < request.window_start:
+        raise HTTPException(status_code=400, detail="window_end must not be before window_start")
+    window_minutes = (request.window_end - request.window_start).total_seconds() / 60.0
+    if window_minutes // (request.step_minutes or 5) + 1 > settings.ROUTING_PROFILE_MAX_DEPARTURES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many departures (max {settings.ROUTING_PROFILE_MAX_DEPARTURES}), increase step_minutes"
+        )
+    
+    try:
+        result = await get_worker_pool('routing').run_with_db(
+            lambda db: get_routing_service(db).find_best_departure(
+                origin=request.origin,
+                destination=request.destination,
+                window_start=request.window_start,
+                window_end=request.window_end,
+                step_minutes=request.step_minutes or 5,
+                heuristic=request.heuristic or "geo",
+                vehicle=resolve_vehicle_profile(db, request.vehicle_profile, request.vehicle_id)
+            )
+        )
+        
+        if not result['success']:
+            raise HTTPException(status_code=404, detail=result.get('error', 'Route not found'))
+        
+        return {
+            "success": True,
+            "origin": request.origin,
+            "destination": request.destination,
+            "best_departure_time": result['departure_time'],
+            "best_arrival_time": result['estimated_arrival_time'],
+            "best_travel_time_min": result['estimated_time_min'],
+            "departures": result['departures'],
+            "route": {
+                "segments": result['segments'],
+                "total_distance": result['total_distance_km'],
+                "total_duration": result['estimated_time_min'],
+                "traffic_conditions": "Historical profiles"
+            },
+            "generated_at": datetime.now(),
+            "graph_version": result.get('graph_version'),
+            "search_stats": result['search_stats'] if request.include_stats else None
+        }
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/find-routes")
+async def find_routes(request: BatchRouteRequest):
+    """
+    Tìm đường cho nhiều chuyến đi trong một yêu cầu
+    
+    Trips sharing an origin and a 5-minute departure bucket are answered by
+    one time-dependent search over historical travel time profiles. Chunks
+    of ROUTING_BATCH_GROUPS_PER_JOB groups run on the batch worker
+    processes (up to ROUTING_BATCH_JOBS at a time), which memory-map one
+    snapshot of the graph and profiles, so batches neither share the GIL
+    with nor take workers from interactive routing requests
+    
+    Parameters:
+    - trips: (origin, destination, departure_time) triples, at most ROUTING_BATCH_MAX_TRIPS
+    - vehicle_profile / vehicle_id: As for /find-route, applied to every trip
+    - include_path: Include the segment IDs of each route
+    
+    Returns:
+    - NDJSON stream, one BatchRouteResult line per trip as its chunk completes
+      ('index' is the trip's position in the request)
+    """
+    if len(request.trips) > settings.ROUTING_BATCH_MAX_TRIPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many trips (max {settings.ROUTING_BATCH_MAX_TRIPS})"
+        )
+    
+    pool = get_worker_pool('routing')
+    vehicle = None
+    if request.vehicle_profile or request.vehicle_id:
+        try:
+            vehicle = await pool.run_with_db(
+                lambda db: resolve_vehicle_profile(db, request.vehicle_profile, request.vehicle_id)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        snapshot = await pool.run_with_db(batch_snapshot, timeout=settings.ROUTING_BATCH_TIMEOUT)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not prepare the batch workers: {e}")
+    
+    now = datetime.now()
+    trips = [(trip.origin, trip.destination, trip.departure_time or now) for trip in request.trips]
+    chunks = iter(chunk_groups(group_trips(trips), settings.ROUTING_BATCH_GROUPS_PER_JOB))
+    batch_pool = get_worker_pool('batch')
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.ROUTING_BATCH_TIMEOUT
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def run_jobs():
+        # Takes chunks until none are left; the batch's jobs share the iterator
+        for groups in chunks:
+            try:
+                routes = await batch_pool.run_with_db(
+                    route_groups,
+                    snapshot,
+                    {index: trips[index] for group in groups for index in group},
+                    groups,
+                    vehicle,
+                    timeout=max(deadline - loop.time(), 0.001)
+                )
+                queue.put_nowait((groups, routes, None))
+            except HTTPException as e:
+                queue.put_nowait((groups, [], e.detail))
+            except Exception as e:
+                queue.put_nowait((groups, [], str(e)))
+        queue.put_nowait(None)
+    
+    def line(index: int, result: Dict) -> str:
+        origin, destination, _ = trips[index]
+        return BatchRouteResult(
+            index=index,
+            origin=origin,
+            destination=destination,
+            success=result['success'],
+            departure_time=result.get('departure_time'),
+            estimated_arrival_time=result.get('estimated_arrival_time'),
+            estimated_time_min=result.get('estimated_time_min'),
+            total_distance_km=result.get('total_distance_km'),
+            path=result.get('path') if request.include_path else None,
+            graph_version=result.get('graph_version'),
+            error=result.get('error')
+        ).model_dump_json() + "\n"
+    
+    async def stream():
+        jobs = [asyncio.ensure_future(run_jobs()) for _ in range(max(1, settings.ROUTING_BATCH_JOBS))]
+        running = len(jobs)
+        try:
+            while running:
+                item = await queue.get()
+                if item is None:
+                    running -= 1
+                    continue
+                groups, routes, error = item
+                for index, result in routes:
+                    yield line(index, result)
+                
+                # Trips the job did not answer (503, timeout) get error lines
+                if error is not None:
+                    failed = {'success': False, 'error': error}
+                    for group in groups:
+                        for index in group:
+                            yield line(index, failed)
+        finally:
+            # Client gone or done: no further chunks are started
+            for job in jobs:
+                job.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/cache-stats")
+async def route_cache_stats():
+    """
+    Thống kê bộ nhớ đệm lộ trình
+    
+    Returns:
+    - Route cache size, hit/miss/eviction counters and the versions it holds
+    - Worker pool admission counters (rejected = 503, timed_out = 504)
+    """
+    return {
+        "success": True,
+        "enabled": settings.ENABLE_CACHE,
+        **get_route_cache().stats(),
+        "workers": {
+            name: get_worker_pool(name).stats() for name in ('routing', 'traffic', 'batch')
+        }
+    }
+
+
+@router.get("/metrics")
+async def search_metrics():
+    """
+    Thống kê hiệu năng tìm đường
+    
+    Returns:
+    - Per-engine histograms of /find-route search statistics (cumulative "le" buckets,
+      sum, count and mean): segments settled, edges relaxed, heap pushes, cost
+      evaluations, DB queries, model calls, feature/model/total time in ms
+    """
+    return {
+        "success": True,
+        "engines": get_search_metrics().snapshot()
+    }
+
+
 @router.get("/road-status/{road_segment_id}", response_model=RoadStatusResponse)
-async def get_road_status(
-    road_segment_id: str,
-    db: Session = Depends(get_db)
-):
+async def get_road_status(road_segment_id: str):
     """
     Kiểm tra trạng thái đoạn đường
     
@@ -188,29 +544,61 @@ async def get_road_status(
         raise HTTPException(status_code=404, detail="Road segment not found")
 
 
-@router.post("/reroute")
-async def reroute(
-    current_route_id: str,
-    current_location: dict,
-    db: Session = Depends(get_db)
-):
+@router.post("/reroute", response_model=RerouteResponse)
+async def reroute(request: RerouteRequest):
     """
     Tính toán lại lộ trình khi có thay đổi
     
+    Repairs the route's retained D* Lite search when incidents change, instead of searching again
+    
     Parameters:
-    - current_route_id: ID lộ trình hiện tại
-    - current_location: Vị trí hiện tại
+    - route_id: Route handle returned by /find-route
+    - current_segment: Segment the vehicle is on
+    - departure_time: Time at the current segment (optional, default: now)
     
     Returns:
     - Updated route from current location
     """
     try:
-        # TODO: Implement rerouting
+        result = await get_worker_pool('routing').run_with_db(
+            lambda db: get_routing_service(db).reroute(
+                route_id=request.route_id,
+                current_segment=request.current_segment,
+                departure_time=request.departure_time
+            )
+        )
+        
+        if not result['success']:
+            raise HTTPException(status_code=404, detail=result.get('error', 'Route not found'))
+        
+        if not result['incremental']:
+            reason = "Route planned from current location"
+        elif result['route_changed']:
+            reason = "Traffic conditions changed"
+        else:
+            reason = "Current route is still optimal"
+        
         return {
             "success": True,
-            "message": "Route updated successfully",
-            "new_route": {},
-            "reason": "Traffic conditions changed"
+            "route_id": request.route_id,
+            "route": {
+                "segments": result['segments'],
+                "total_distance": result['total_distance_km'],
+                "total_duration": result['estimated_time_min'],
+                "traffic_conditions": "Historical profiles"
+            },
+            "route_changed": result['route_changed'],
+            "reason": reason,
+            "incremental": result['incremental'],
+            "edges_updated": result['edges_updated'],
+            "nodes_expanded": result['nodes_expanded'],
+            "departure_time": result.get('departure_time'),
+            "estimated_arrival_time": result.get('estimated_arrival_time'),
+            "generated_at": datetime.now(),
+            "graph_version": result.get('graph_version')
         }
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
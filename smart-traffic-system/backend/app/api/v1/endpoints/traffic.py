@@ -3,12 +3,12 @@ Traffic Prediction API Endpoints
 Handles AI-powered traffic prediction requests with ML models
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.workers import get_worker_pool
 from app.schemas.traffic import (
     TrafficPredictionRequest,
     TrafficPredictionResponse,
@@ -26,10 +26,7 @@ router = APIRouter()
 
 
 @router.post("/predict", response_model=TrafficPredictionResponse)
-async def predict_traffic(
-    request: TrafficPredictionRequest,
-    db: Session = Depends(get_db)
-):
+async def predict_traffic(request: TrafficPredictionRequest):
     """
     🔮 Dự đoán giao thông cho đoạn đường cụ thể sử dụng ML models
     
@@ -55,6 +52,11 @@ async def predict_traffic(
     }
     ```
     """
+    return await get_worker_pool('traffic').run_with_db(_predict_traffic, request)
+
+
+def _predict_traffic(db: Session, request: TrafficPredictionRequest):
+    """Blocking part of predict_traffic (runs on the traffic worker pool)"""
     try:
         # Initialize services
         ml_service = get_prediction_service()
@@ -129,10 +131,7 @@ async def predict_traffic(
 
 
 @router.get("/current/{road_segment_id}", response_model=CurrentTrafficResponse)
-async def get_current_traffic(
-    road_segment_id: str,
-    db: Session = Depends(get_db)
-):
+async def get_current_traffic(road_segment_id: str):
     """
     📊 Lấy dữ liệu giao thông hiện tại cho đoạn đường (với ML prediction)
     
@@ -149,6 +148,11 @@ async def get_current_traffic(
     GET /api/v1/traffic/current/segment_001
     ```
     """
+    return await get_worker_pool('traffic').run_with_db(_get_current_traffic, road_segment_id)
+
+
+def _get_current_traffic(db: Session, road_segment_id: str):
+    """Blocking part of get_current_traffic (runs on the traffic worker pool)"""
     try:
         feature_service = FeatureEngineeringService(db)
         ml_service = get_prediction_service()
@@ -212,8 +216,7 @@ async def get_traffic_history(
     road_segment_id: str,
     start_date: Optional[datetime] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="End date (ISO format)"),
-    limit: int = Query(288, le=1000, description="Max records (default: 288 = 1 day)"),
-    db: Session = Depends(get_db)
+    limit: int = Query(288, le=1000, description="Max records (default: 288 = 1 day)")
 ):
     """
     📈 Lấy lịch sử giao thông của đoạn đường
@@ -232,6 +235,19 @@ async def get_traffic_history(
     GET /api/v1/traffic/history/segment_001?start_date=2025-10-15T00:00:00
     ```
     """
+    return await get_worker_pool('traffic').run_with_db(
+        _get_traffic_history, road_segment_id, start_date, end_date, limit
+    )
+
+
+def _get_traffic_history(
+    db: Session,
+    road_segment_id: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    limit: int
+):
+    """Blocking part of get_traffic_history (runs on the traffic worker pool)"""
     try:
         from sqlalchemy import text
         
@@ -340,8 +356,7 @@ async def get_traffic_history(
 
 @router.get("/realtime/all", response_model=AllTrafficResponse)
 async def get_all_realtime_traffic(
-    limit: int = Query(100, le=1000, description="Max segments to return"),
-    db: Session = Depends(get_db)
+    limit: int = Query(100, le=1000, description="Max segments to return")
 ):
     """
     🗺️ Lấy dữ liệu giao thông real-time của tất cả đoạn đường (với ML predictions)
@@ -360,6 +375,11 @@ async def get_all_realtime_traffic(
     
     **Use case:** Display all traffic on map with color-coded congestion
     """
+    return await get_worker_pool('traffic').run_with_db(_get_all_realtime_traffic, limit)
+
+
+def _get_all_realtime_traffic(db: Session, limit: int):
+    """Blocking part of get_all_realtime_traffic (runs on the traffic worker pool)"""
     try:
         feature_service = FeatureEngineeringService(db)
         ml_service = get_prediction_service()
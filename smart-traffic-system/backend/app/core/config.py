@@ -63,6 +63,47 @@ class Settings(BaseSettings):
     CACHE_TTL: int = 300
     ENABLE_CACHE: bool = True
     
+    # Routing Graph
+    ROUTING_GRAPH_CHECK_INTERVAL: int = 30  # seconds between RoadSegment change probes
+    ROUTING_CONNECT_TOLERANCE_M: float = 15.0  # endpoint snapping distance for segment connectivity
+    ROUTING_ALT_LANDMARKS: int = 16  # landmarks for the ALT heuristic
+    ROUTING_CACHE_DIR: str = "../cache/routing"  # persisted routing precomputation (keyed by graph version)
+    ROUTING_SHARED_GRAPH: bool = False  # memory-map graph/landmark/CH snapshots so worker processes share one copy
+    ROUTING_SHARED_GRAPH_WAIT: float = 300.0  # seconds before another worker's unfinished snapshot build counts as abandoned
+    ROUTING_GRAPH_SNAPSHOT: str = ""  # offline-built graph snapshot loaded at startup (ml-pipeline/scripts/build_graph_snapshot.py)
+    ROUTING_GRAPH_SNAPSHOT_VERIFY: bool = True  # check the snapshot checksum before loading it
+    ROUTING_CH_CUSTOMIZE_INTERVAL: int = 300  # seconds before contraction hierarchy weights are re-applied
+    ROUTING_CH_METRIC: str = "baseline"  # CH weights: free_flow, baseline (by hour), predicted (refreshed in the background)
+    ROUTING_PROFILE_HISTORY_DAYS: int = 28  # TrafficFlowObserved history behind travel time profiles
+    ROUTING_PROFILE_REFRESH_INTERVAL: int = 3600  # seconds before travel time profiles are rebuilt
+    ROUTING_BATCH_LOOKAHEAD: int = 16  # frontier nodes whose neighbours join each prediction batch
+    ROUTING_ALT_PENALTY: float = 0.5  # cost increase of an edge per alternative route using it
+    ROUTING_ALT_MAX_OVERLAP: float = 0.8  # max shared length fraction between alternative routes
+    ROUTING_MATRIX_MAX_CELLS: int = 250000  # largest origins x destinations matrix per request
+    ROUTING_PROFILE_MAX_DEPARTURES: int = 288  # departures evaluated per /routing/best-departure request
+    ROUTING_BATCH_MAX_TRIPS: int = 5000  # trips per /routing/find-routes request
+    ROUTING_REROUTE_MAX_SESSIONS: int = 1000  # route handles kept for /routing/reroute
+    ROUTING_REROUTE_SESSION_TTL: int = 3600  # seconds an unused route handle is kept
+    ROUTING_REROUTE_MAX_STATE_NODES: int = 50000  # larger reroute planners are rebuilt instead of kept
+    ROUTING_ROUTE_CACHE_SIZE: int = 10000  # cached /find-route results (LRU)
+    ROUTING_INCIDENT_CHECK_INTERVAL: int = 30  # seconds between CityWork/RoadAccident change probes
+    ROUTING_INCIDENT_LOOKBACK_HOURS: int = 24  # incidents that ended longer ago are not loaded
+    ROUTING_ACCIDENT_CLEARANCE_MIN: int = 90  # minutes an accident affects routing after accidentDate
+    ROUTING_ACCIDENT_MATCH_RADIUS_M: float = 50.0  # max distance from an accident to its segment
+    ROUTING_WORK_MATCH_RADIUS_M: float = 20.0  # max distance from a CityWork location to impacted segments
+    
+    # Worker Pools (blocking work runs off the event loop)
+    ROUTING_WORKER_THREADS: int = 4  # concurrent /routing searches per process
+    ROUTING_WORKER_MAX_PENDING: int = 16  # running + queued /routing jobs before 503
+    ROUTING_REQUEST_TIMEOUT: float = 30.0  # seconds before a /routing request returns 504
+    ROUTING_BATCH_JOBS: int = 3  # worker processes running /routing/find-routes batches
+    ROUTING_BATCH_GROUPS_PER_JOB: int = 8  # trip groups per batch job (results stream as each job completes)
+    ROUTING_BATCH_MAX_PENDING: int = 12  # running + queued batch jobs before 503
+    ROUTING_BATCH_TIMEOUT: float = 600.0  # seconds a /routing/find-routes batch may run
+    TRAFFIC_WORKER_THREADS: int = 4  # concurrent /traffic lookups and predictions per process
+    TRAFFIC_WORKER_MAX_PENDING: int = 32  # running + queued /traffic jobs before 503
+    TRAFFIC_REQUEST_TIMEOUT: float = 15.0  # seconds before a /traffic request returns 504
+    
     @property
     def database_url(self) -> str:
         """Construct SQL Server connection string"""
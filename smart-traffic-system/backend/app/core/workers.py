@@ -0,0 +1,159 @@
+"""
+Worker Pools
+Bounded thread and process pools that run blocking database, search and
+model work off the event loop, with backpressure and per-request timeouts
+"""
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.graph_snapshot import SnapshotPending
+
+
+def _with_session(fn: Callable, args, kwargs):
+    """Call fn(db, *args, **kwargs) with a session owned by the worker thread or process"""
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+class WorkerPool:
+    """
+    Thread (or process) pool with a bounded number of admitted jobs
+    
+    At most max_pending jobs (running or queued) are admitted; further
+    requests are rejected with 503 and Retry-After instead of queueing
+    without limit. A request waits at most `timeout` seconds (504 after
+    that). A running job cannot be interrupted, so it keeps its slot until
+    it actually finishes, and a flood of slow jobs turns into fast 503s.
+    Jobs still in the queue are dropped on timeout.
+    
+    With processes, jobs run in spawned worker processes, so CPU-bound
+    Python work runs in parallel instead of taking turns on the GIL; the
+    job function and its arguments must be picklable, and the workers
+    start on first use.
+    """
+    
+    def __init__(self, name: str, max_workers: int, max_pending: int, timeout: float, processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self.timeout = timeout
+        self.processes = processes
+        if processes:
+            # Spawned, not forked: the server process has running threads and an event loop
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+    
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool and await its result
+        
+        Raises:
+            HTTPException: 503 when the pool is full or fn needs a snapshot
+                or precomputation that is still being built, 504 on timeout;
+                other exceptions raised by fn propagate unchanged
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Server busy ({self.name} workers saturated), retry shortly",
+                    headers={"Retry-After": "1"}
+                )
+            self._pending += 1
+        
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except SnapshotPending as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise HTTPException(
+                status_code=504,
+                detail=f"Request timed out after {timeout or self.timeout:g} s"
+            )
+    
+    async def run_with_db(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Like run, passing a new database session as fn's first argument
+        
+        The session is opened and closed on the worker thread (or in the
+        worker process), so a job that outlives its request never shares a
+        session that was closed.
+        """
+        return await self.run(_with_session, fn, args, kwargs, timeout=timeout)
+    
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled():
+                self.completed += 1
+    
+    def stats(self) -> Dict:
+        """Pool size and admission counters"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'processes': self.processes,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'timeout_s': self.timeout
+            }
+
+
+# Singleton instances: routing searches cannot starve traffic lookups, and
+# batches cannot starve either
+_worker_pools = {
+    'routing': WorkerPool(
+        'routing',
+        settings.ROUTING_WORKER_THREADS,
+        settings.ROUTING_WORKER_MAX_PENDING,
+        settings.ROUTING_REQUEST_TIMEOUT
+    ),
+    'traffic': WorkerPool(
+        'traffic',
+        settings.TRAFFIC_WORKER_THREADS,
+        settings.TRAFFIC_WORKER_MAX_PENDING,
+        settings.TRAFFIC_REQUEST_TIMEOUT
+    ),
+    'batch': WorkerPool(
+        'batch',
+        settings.ROUTING_BATCH_JOBS,
+        settings.ROUTING_BATCH_MAX_PENDING,
+        settings.ROUTING_BATCH_TIMEOUT,
+        processes=True
+    )
+}
+
+
+def get_worker_pool(name: str) -> WorkerPool:
+    """Get a process-wide worker pool ('routing', 'traffic' or 'batch')"""
+    return _worker_pools[name]
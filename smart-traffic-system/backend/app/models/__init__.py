@@ -7,10 +7,12 @@ from app.models.traffic_flow import TrafficFlowObserved
 from app.models.road_segment import RoadSegment
 from app.models.road_accident import RoadAccident
 from app.models.city_work import CityWork
+from app.models.vehicle import Vehicle
 
 __all__ = [
     "TrafficFlowObserved",
     "RoadSegment",
     "RoadAccident",
-    "CityWork"
+    "CityWork",
+    "Vehicle"
 ]
@@ -0,0 +1,109 @@
+"""
+Vehicle Model
+Fleet vehicles; vehicleType and cargoWeight select the routing profile
+"""
+
+from sqlalchemy import Column, String, Integer, Text, DateTime, Date, DECIMAL, Boolean
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class Vehicle(Base):
+    __tablename__ = "Vehicle"
+    
+    # Primary Key
+    id = Column(String(255), primary_key=True)
+    
+    # Vehicle Identification
+    vehiclePlateIdentifier = Column(String(50), index=True)
+    vehicleIdentificationNumber = Column(String(100))
+    license_plate = Column(String(50))
+    fleetVehicleId = Column(String(100))
+    
+    # Vehicle Type & Configuration - IMPORTANT for routing
+    vehicleType = Column(String(100), index=True)  # 'car', 'bus', 'lorry', 'motorcycle', etc.
+    vehicleConfiguration = Column(String(100))
+    vehicleSpecialUsage = Column(String(50))  # 'ambulance', 'police', 'taxi', etc.
+    emergencyVehicleType = Column(String(50))
+    
+    # Category & Classification
+    category = Column(Text)  # JSON array
+    
+    # Physical Attributes
+    color = Column(String(50))
+    cargoWeight = Column(DECIMAL(10, 2))  # kg
+    
+    # Location & Movement
+    location = Column(Text)  # GeoJSON Point
+    previousLocation = Column(Text)  # GeoJSON Point
+    bearing = Column(DECIMAL(10, 2))  # degrees
+    heading = Column(Text)  # JSON
+    speed = Column(Text)  # JSON with value and unit
+    vehicleAltitude = Column(String(100))
+    
+    # Status
+    serviceStatus = Column(String(50), index=True)  # 'parked', 'onRoute', 'broken', 'outOfService'
+    vehicleRunningStatus = Column(String(50))  # 'running', 'stopped', 'waiting'
+    serviceOnDuty = Column(Boolean)
+    ignitionStatus = Column(Boolean)
+    
+    # Battery & Device
+    battery = Column(DECIMAL(5, 2))  # percentage
+    deviceBatteryStatus = Column(String(50))
+    deviceSimNumber = Column(String(50))
+    vehicleTrackerDevice = Column(String(255))
+    
+    # Fuel
+    fuelType = Column(String(50))
+    fuelFilled = Column(DECIMAL(10, 2))
+    fuelEfficiency = Column(DECIMAL(10, 2))
+    
+    # Mileage & Trip
+    mileageFromOdometer = Column(DECIMAL(15, 2))
+    currentTripCount = Column(Integer)
+    tripNetWeightCollected = Column(DECIMAL(10, 2))
+    
+    # Service Information
+    serviceProvided = Column(Text)  # JSON
+    
+    # Dates
+    dateFirstUsed = Column(Date)
+    dateVehicleFirstRegistered = Column(Date)
+    purchaseDate = Column(DateTime)
+    observationDateTime = Column(DateTime, index=True)
+    
+    # Municipality Info
+    municipalityInfo = Column(Text)  # JSON
+    wardId = Column(String(50))
+    wardName = Column(String(255))
+    zoneName = Column(String(255))
+    
+    # Metadata
+    name = Column(String(255))
+    alternateName = Column(String(255))
+    description = Column(Text)
+    areaServed = Column(String(255))
+    address = Column(Text)  # JSON
+    
+    # Media
+    image = Column(String(500))
+    
+    # Annotations & Features
+    annotations = Column(Text)  # JSON
+    feature = Column(Text)  # JSON
+    
+    # Report
+    reportId = Column(String(100))
+    
+    # Provenance
+    dataProvider = Column(String(255))
+    source = Column(String(255))
+    owner = Column(Text)  # JSON
+    seeAlso = Column(Text)  # JSON
+    
+    # Timestamps
+    dateCreated = Column(DateTime, default=func.now())
+    dateModified = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<Vehicle(id={self.id}, type={self.vehicleType}, plate={self.vehiclePlateIdentifier})>"
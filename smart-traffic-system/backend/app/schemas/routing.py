@@ -18,6 +18,7 @@ class RouteSegment(BaseModel):
     incidents: List[Dict[str, Any]] = Field(default_factory=list, description="Active incidents")
     start_coordinates: Optional[List[float]] = Field(None, description="Start point [lon, lat]")
     end_coordinates: Optional[List[float]] = Field(None, description="End point [lon, lat]")
+    coordinates: Optional[List[List[float]]] = Field(None, description="Segment LineString [[lon, lat], ...]")
 
 
 class RouteInfo(BaseModel):
@@ -34,6 +35,12 @@ class RouteRequest(BaseModel):
     destination: str = Field(..., description="Destination segment ID", example="segment_010")
     departure_time: Optional[datetime] = Field(None, description="Departure time (default: now)")
     mode: Optional[str] = Field("optimal", description="Route mode: optimal, fastest, shortest")
+    heuristic: Optional[str] = Field("geo", description="A* heuristic: geo, alt (landmarks), none")
+    engine: Optional[str] = Field("astar", description="Search engine: astar (ML predictions), td (travel time profiles), ch (contraction hierarchy)")
+    bidirectional: Optional[bool] = Field(False, description="Bound the astar/td search with a backward free-flow search from the destination")
+    vehicle_profile: Optional[str] = Field(None, description="Vehicle profile: car, motorcycle, moped, bicycle, van, bus, lorry, tanker, trailer, agriculturalVehicle")
+    vehicle_id: Optional[str] = Field(None, description="Vehicle entity ID whose type and cargo weight restrict the route (overrides vehicle_profile)")
+    include_stats: Optional[bool] = Field(False, description="Include search statistics in the response")
 
 
 class RouteResponse(BaseModel):
@@ -43,12 +50,18 @@ class RouteResponse(BaseModel):
     origin: str = Field(..., description="Origin segment ID")
     destination: str = Field(..., description="Destination segment ID")
     mode: str = Field(..., description="Route mode used")
+    vehicle: Optional[Dict[str, Any]] = Field(None, description="Vehicle profile the route was restricted to")
     departure_time: Optional[str] = Field(None, description="Departure time in ISO format")
     estimated_arrival_time: Optional[str] = Field(None, description="Estimated arrival time in ISO format")
     generated_at: datetime = Field(..., description="Response generation time")
     incidents_avoided: Optional[int] = Field(0, description="Number of incidents avoided")
     prediction_based: Optional[bool] = Field(True, description="Whether route uses ML predictions")
     explanation: Optional[str] = Field(None, description="Explanation of routing decision")
+    graph_version: Optional[str] = Field(None, description="Version stamp of the road graph used")
+    overlap: Optional[float] = Field(None, description="Largest shared length fraction with another returned route")
+    diversity_score: Optional[float] = Field(None, description="1 - overlap (alternative routes only)")
+    route_id: Optional[str] = Field(None, description="Handle for /reroute")
+    search_stats: Optional[Dict[str, Any]] = Field(None, description="Search counters and timings (include_stats only)")
 
 
 class AlternativeRoutesRequest(BaseModel):
@@ -57,6 +70,153 @@ class AlternativeRoutesRequest(BaseModel):
     destination: str = Field(..., description="Destination segment ID")
     departure_time: Optional[datetime] = Field(None, description="Departure time")
     num_alternatives: Optional[int] = Field(3, ge=1, le=5, description="Number of alternative routes (1-5)")
+    heuristic: Optional[str] = Field("geo", description="A* heuristic: geo, alt (landmarks), none")
+    engine: Optional[str] = Field("astar", description="Cost model: astar (ML predictions), td (travel time profiles), ch (contraction hierarchy metric)")
+    vehicle_profile: Optional[str] = Field(None, description="Vehicle profile: car, motorcycle, moped, bicycle, van, bus, lorry, tanker, trailer, agriculturalVehicle")
+    vehicle_id: Optional[str] = Field(None, description="Vehicle entity ID whose type and cargo weight restrict the route (overrides vehicle_profile)")
+
+
+class MatrixRequest(BaseModel):
+    """Request for a travel time matrix"""
+    origins: List[str] = Field(..., min_length=1, description="Origin segment IDs")
+    destinations: List[str] = Field(..., min_length=1, description="Destination segment IDs")
+    departure_time: Optional[datetime] = Field(None, description="Departure time for all origins (default: now)")
+    departure_times: Optional[List[datetime]] = Field(None, description="Per-origin departure times (same length as origins)")
+    engine: Optional[str] = Field("td", description="Cost model: td (travel time profiles), ch (contraction hierarchy metric)")
+    vehicle_profile: Optional[str] = Field(None, description="Vehicle profile: car, motorcycle, moped, bicycle, van, bus, lorry, tanker, trailer, agriculturalVehicle")
+    vehicle_id: Optional[str] = Field(None, description="Vehicle entity ID whose type and cargo weight restrict the route (overrides vehicle_profile)")
+
+
+class MatrixResponse(BaseModel):
+    """Travel time matrix (minutes; null where unreachable)"""
+    success: bool = Field(True, description="Request success status")
+    origins: List[str] = Field(..., description="Origin segment IDs (rows)")
+    destinations: List[str] = Field(..., description="Destination segment IDs (columns)")
+    durations: List[List[Optional[float]]] = Field(..., description="Travel times in minutes, origins x destinations")
+    departure_times: List[str] = Field(..., description="Departure time per origin in ISO format")
+    engine: str = Field(..., description="Cost model used")
+    generated_at: datetime = Field(..., description="Response generation time")
+    graph_version: Optional[str] = Field(None, description="Version stamp of the road graph used")
+
+
+class IsochroneRequest(BaseModel):
+    """Request for reachable segments within travel time budgets"""
+    origin: Optional[str] = Field(None, description="Origin segment ID", example="segment_001")
+    latitude: Optional[float] = Field(None, description="Origin latitude (when no origin segment is given)")
+    longitude: Optional[float] = Field(None, description="Origin longitude (when no origin segment is given)")
+    departure_time: Optional[datetime] = Field(None, description="Departure time (default: now)")
+    budgets: List[float] = Field([10, 20, 30], min_length=1, max_length=10, description="Travel time budgets in minutes")
+    include_geometry: Optional[bool] = Field(False, description="Include merged GeoJSON geometry per budget")
+    engine: Optional[str] = Field("td", description="Cost model: td (travel time profiles), ch (contraction hierarchy metric)")
+    vehicle_profile: Optional[str] = Field(None, description="Vehicle profile: car, motorcycle, moped, bicycle, van, bus, lorry, tanker, trailer, agriculturalVehicle")
+    vehicle_id: Optional[str] = Field(None, description="Vehicle entity ID whose type and cargo weight restrict the route (overrides vehicle_profile)")
+
+
+class IsochroneBand(BaseModel):
+    """Segments reachable within one budget"""
+    budget_min: float = Field(..., description="Travel time budget in minutes")
+    segment_ids: List[str] = Field(..., description="Reachable segment IDs, nearest first")
+    geometry: Optional[Dict[str, Any]] = Field(None, description="GeoJSON MultiLineString of the reachable segments")
+
+
+class IsochroneResponse(BaseModel):
+    """Response for isochrone queries"""
+    success: bool = Field(True, description="Request success status")
+    origin: str = Field(..., description="Origin segment ID (snapped if a coordinate was given)")
+    departure_time: str = Field(..., description="Departure time in ISO format")
+    isochrones: List[IsochroneBand] = Field(..., description="One band per budget, ascending")
+    segments_settled: int = Field(..., description="Segments reached within the largest budget")
+    engine: str = Field(..., description="Cost model used")
+    generated_at: datetime = Field(..., description="Response generation time")
+    graph_version: Optional[str] = Field(None, description="Version stamp of the road graph used")
+
+
+class BestDepartureRequest(BaseModel):
+    """Request for the best departure time within a window"""
+    origin: str = Field(..., description="Origin segment ID", example="segment_001")
+    destination: str = Field(..., description="Destination segment ID", example="segment_010")
+    window_start: datetime = Field(..., description="Earliest departure time", example="2024-01-15T06:30:00")
+    window_end: datetime = Field(..., description="Latest departure time", example="2024-01-15T09:00:00")
+    step_minutes: Optional[float] = Field(5, gt=0, le=60, description="Spacing of evaluated departures in minutes")
+    heuristic: Optional[str] = Field("geo", description="A* heuristic: geo, alt (landmarks), none")
+    vehicle_profile: Optional[str] = Field(None, description="Vehicle profile: car, motorcycle, moped, bicycle, van, bus, lorry, tanker, trailer, agriculturalVehicle")
+    vehicle_id: Optional[str] = Field(None, description="Vehicle entity ID whose type and cargo weight restrict the route (overrides vehicle_profile)")
+    include_stats: Optional[bool] = Field(False, description="Include search statistics in the response")
+
+
+class DepartureOption(BaseModel):
+    """Arrival for one departure time"""
+    departure_time: str = Field(..., description="Departure time in ISO format")
+    arrival_time: str = Field(..., description="Earliest arrival time in ISO format")
+    travel_time_min: float = Field(..., description="Travel time in minutes")
+
+
+class BestDepartureResponse(BaseModel):
+    """Arrival time function over a departure window"""
+    success: bool = Field(True, description="Request success status")
+    origin: str = Field(..., description="Origin segment ID")
+    destination: str = Field(..., description="Destination segment ID")
+    best_departure_time: str = Field(..., description="Departure with the shortest travel time in ISO format")
+    best_arrival_time: str = Field(..., description="Arrival for the best departure in ISO format")
+    best_travel_time_min: float = Field(..., description="Shortest travel time in the window (minutes)")
+    departures: List[DepartureOption] = Field(..., description="Arrival time function, one entry per evaluated departure")
+    route: RouteInfo = Field(..., description="Route for the best departure")
+    generated_at: datetime = Field(..., description="Response generation time")
+    graph_version: Optional[str] = Field(None, description="Version stamp of the road graph used")
+    search_stats: Optional[Dict[str, Any]] = Field(None, description="Search counters and timings (include_stats only)")
+
+
+class BatchTrip(BaseModel):
+    """One origin/destination pair of a batch"""
+    origin: str = Field(..., description="Origin segment ID", example="segment_001")
+    destination: str = Field(..., description="Destination segment ID", example="segment_010")
+    departure_time: Optional[datetime] = Field(None, description="Departure time (default: now)")
+
+
+class BatchRouteRequest(BaseModel):
+    """Request for routes of many trips"""
+    trips: List[BatchTrip] = Field(..., min_length=1, description="Trips to route")
+    vehicle_profile: Optional[str] = Field(None, description="Vehicle profile for every trip (see /find-route)")
+    vehicle_id: Optional[str] = Field(None, description="Vehicle entity ID for every trip (overrides vehicle_profile)")
+    include_path: Optional[bool] = Field(False, description="Include the segment IDs of each route")
+
+
+class BatchRouteResult(BaseModel):
+    """One line of the /find-routes stream"""
+    index: int = Field(..., description="Position of the trip in the request")
+    origin: str = Field(..., description="Origin segment ID")
+    destination: str = Field(..., description="Destination segment ID")
+    success: bool = Field(..., description="Whether a route was found")
+    departure_time: Optional[str] = Field(None, description="Departure time in ISO format")
+    estimated_arrival_time: Optional[str] = Field(None, description="Estimated arrival time in ISO format")
+    estimated_time_min: Optional[float] = Field(None, description="Travel time in minutes")
+    total_distance_km: Optional[float] = Field(None, description="Route length in km")
+    path: Optional[List[str]] = Field(None, description="Segment IDs of the route (include_path only)")
+    graph_version: Optional[str] = Field(None, description="Version stamp of the road graph used")
+    error: Optional[str] = Field(None, description="Why no route was returned")
+
+
+class RerouteRequest(BaseModel):
+    """Request to recompute a tracked route from the vehicle's position"""
+    route_id: str = Field(..., description="Route handle returned by /find-route")
+    current_segment: str = Field(..., description="Segment the vehicle is on")
+    departure_time: Optional[datetime] = Field(None, description="Time at the current segment (default: now)")
+
+
+class RerouteResponse(BaseModel):
+    """Response for reroute requests"""
+    success: bool = Field(True, description="Request success status")
+    route_id: str = Field(..., description="Route handle")
+    route: RouteInfo = Field(..., description="Route from the current segment")
+    route_changed: bool = Field(..., description="Whether the route differs from the remainder of the previous one")
+    reason: str = Field(..., description="Why the route was (or was not) changed")
+    incremental: bool = Field(..., description="Whether the previous search state was repaired rather than rebuilt")
+    edges_updated: int = Field(0, description="Edges whose cost changed since the previous reroute")
+    nodes_expanded: int = Field(0, description="Segments expanded by the search")
+    departure_time: Optional[str] = Field(None, description="Time at the current segment in ISO format")
+    estimated_arrival_time: Optional[str] = Field(None, description="Estimated arrival time in ISO format")
+    generated_at: datetime = Field(..., description="Response generation time")
+    graph_version: Optional[str] = Field(None, description="Version stamp of the road graph used")
 
 
 class RoadStatusResponse(BaseModel):
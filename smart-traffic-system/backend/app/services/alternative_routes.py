@@ -0,0 +1,154 @@
+"""
+Alternative Routes
+Penalty method for k diverse routes: after each route is found its edges get
+more expensive and the search is repeated, keeping only routes that do not
+overlap too much with the ones already accepted
+"""
+
+import heapq
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.compact_graph import CompactRoadGraph
+
+
+class EdgeCostCache:
+    """
+    Lazily evaluated per-edge costs shared by repeated searches
+    
+    Costs are computed the first time an edge is relaxed, with all of a
+    node's uncached edges evaluated in one call, and reused afterwards.
+    """
+    
+    def __init__(self, num_edges: int, evaluate: Callable[[np.ndarray], np.ndarray]):
+        self.evaluate = evaluate
+        self.costs = np.full(num_edges, np.nan)
+        self.evaluations = 0
+    
+    def __call__(self, edges: np.ndarray) -> np.ndarray:
+        costs = self.costs[edges]
+        missing = np.isnan(costs)
+        if missing.any():
+            self.costs[edges[missing]] = self.evaluate(edges[missing])
+            self.evaluations += int(missing.sum())
+            costs = self.costs[edges]
+        return costs
+
+
+class RouteCandidate:
+    """A route as node and CSR edge sequences"""
+    
+    def __init__(self, nodes: List[int], edges: List[int], cost: float):
+        self.nodes = nodes
+        self.edges = edges
+        self.cost = cost
+        self.overlap = 0.0
+
+
+def _penalized_search(
+    graph: CompactRoadGraph,
+    source: int,
+    target: int,
+    edge_costs: EdgeCostCache,
+    factors: np.ndarray,
+    estimate_remaining
+) -> Optional[RouteCandidate]:
+    """A* with edge costs scaled by per-edge penalty factors (>= 1)"""
+    offsets, targets = graph.offsets, graph.targets
+    open_set = [(0.0, 0.0, source)]
+    g_score = {source: 0.0}
+    came_from = {}
+    closed_set = set()
+    
+    while open_set:
+        _, current_g, current = heapq.heappop(open_set)
+        if current == target:
+            nodes, edges = [current], []
+            while current in came_from:
+                current, edge = came_from[current]
+                nodes.append(current)
+                edges.append(edge)
+            nodes.reverse()
+            edges.reverse()
+            return RouteCandidate(nodes, edges, current_g)
+        if current in closed_set:
+            continue
+        closed_set.add(current)
+        
+        edges = np.arange(offsets[current], offsets[current + 1])
+        neighbors = targets[edges]
+        costs = edge_costs(edges) * factors[edges]
+        estimates = estimate_remaining(neighbors)
+        for edge, neighbor, cost, estimate in zip(edges.tolist(), neighbors.tolist(), costs.tolist(), estimates.tolist()):
+            if neighbor in closed_set:
+                continue
+            tentative_g = current_g + cost
+            if tentative_g < g_score.get(neighbor, float('inf')):
+                g_score[neighbor] = tentative_g
+                came_from[neighbor] = (current, edge)
+                heapq.heappush(open_set, (tentative_g + estimate, tentative_g, neighbor))
+    return None
+
+
+def route_overlap(graph: CompactRoadGraph, route: RouteCandidate, other: RouteCandidate) -> float:
+    """Share of `route`'s length (km) that also belongs to `other`"""
+    lengths = graph.weights.astype(np.float64)
+    total = lengths[route.edges].sum()
+    if total <= 0:
+        return 1.0 if set(route.nodes) <= set(other.nodes) else 0.0
+    shared = np.isin(route.edges, other.edges)
+    return float(lengths[np.array(route.edges)[shared]].sum() / total)
+
+
+def find_alternatives(
+    graph: CompactRoadGraph,
+    source: int,
+    target: int,
+    edge_costs: EdgeCostCache,
+    estimate_remaining,
+    num_routes: int = 3,
+    penalty: float = settings.ROUTING_ALT_PENALTY,
+    max_overlap: float = settings.ROUTING_ALT_MAX_OVERLAP
+) -> List[RouteCandidate]:
+    """
+    Up to num_routes routes, each sharing at most max_overlap of its length with another
+    
+    Args:
+        graph: Road graph
+        source, target: Node IDs
+        edge_costs: Shared cost cache (unpenalized minutes)
+        estimate_remaining: Admissible heuristic for the unpenalized costs
+            (stays admissible because penalties only increase costs)
+        num_routes: Routes wanted, the first is the optimum
+        penalty: Relative cost increase of an edge per accepted route using it
+        max_overlap: Largest allowed shared length fraction
+    
+    Returns:
+        Accepted routes with .overlap set to the largest overlap with any other route
+    """
+    factors = np.ones(graph.num_edges)
+    routes: List[RouteCandidate] = []
+    
+    for _ in range(max(num_routes, 1) * 3):
+        candidate = _penalized_search(graph, source, target, edge_costs, factors, estimate_remaining)
+        if candidate is None:
+            break
+        # Report unpenalized cost
+        candidate.cost = float(edge_costs(np.array(candidate.edges, dtype=np.int64)).sum()) if candidate.edges else 0.0
+        
+        if not routes or all(
+            candidate.edges != route.edges and route_overlap(graph, candidate, route) <= max_overlap
+            for route in routes
+        ):
+            routes.append(candidate)
+            if len(routes) >= num_routes:
+                break
+        factors[candidate.edges] *= 1.0 + penalty
+    
+    for route in routes:
+        overlaps = [max(route_overlap(graph, route, other), route_overlap(graph, other, route))
+                    for other in routes if other is not route]
+        route.overlap = max(overlaps, default=0.0)
+    return routes
@@ -0,0 +1,140 @@
+"""
+Batch Routing
+Many origin/destination trips answered with one time-dependent search per
+origin and departure bucket, spread over the batch worker processes
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.compact_graph import CompactRoadGraph
+from app.services.graph_cache import get_graph_cache
+from app.services.graph_snapshot import prune_snapshots, save_graph, snapshot_path
+from app.services.routing_service import get_routing_service
+from app.services.travel_time_profiles import BUCKET_MINUTES, TravelTimeProfiles
+from app.services.vehicle_profiles import VehicleProfile
+
+# (origin segment ID, destination segment ID, departure time)
+Trip = Tuple[str, str, datetime]
+
+# Snapshot the batch worker process is routing on
+_attached_snapshot: Optional[str] = None
+
+# Snapshots this process exported, latest last
+_exported_snapshots: List[Path] = []
+
+
+def group_trips(trips: List[Trip]) -> List[List[int]]:
+    """Trip indices grouped by origin and 5-minute departure bucket, in order of first appearance"""
+    groups: Dict[Tuple[str, int], List[int]] = {}
+    for index, (origin, _, departure_time) in enumerate(trips):
+        bucket = int(departure_time.timestamp() // (BUCKET_MINUTES * 60))
+        groups.setdefault((origin, bucket), []).append(index)
+    return list(groups.values())
+
+
+def chunk_groups(groups: List[List[int]], size: int) -> List[List[List[int]]]:
+    """
+    Consecutive runs of `size` groups, one per batch job
+    
+    Every group costs one search. Small jobs keep results streaming and
+    let idle workers pick up the next chunk.
+    """
+    size = max(1, size)
+    return [groups[i:i + size] for i in range(0, len(groups), size)]
+
+
+def batch_snapshot(db: Session) -> str:
+    """
+    Snapshot of the current graph and travel time profiles for the batch workers
+    
+    Written once per graph version and profile build, next to the shared
+    graph snapshots (see graph_snapshot), and memory-mapped by every batch
+    worker process instead of each one rebuilding graph and profiles.
+    """
+    routing_service = get_routing_service(db)
+    return export_snapshot(routing_service.graph, routing_service._travel_time_profiles())
+
+
+def export_snapshot(graph: CompactRoadGraph, profiles: TravelTimeProfiles) -> str:
+    """
+    Write graph and profiles as a snapshot unless it exists; returns its directory
+    
+    Every profile rebuild brings a new snapshot. Once it is written, older
+    ones are deleted except the previous export, which batch workers may
+    still be attached to; other processes' snapshots are kept for a
+    batch timeout (a missing one is written again on its next batch).
+    """
+    path = snapshot_path(f"{graph.version}_profiles_{int(profiles.built_at)}")
+    if not path.exists():
+        save_graph(graph, path, profiles)
+    if path not in _exported_snapshots:
+        _exported_snapshots.append(path)
+        for stale in _exported_snapshots[:-2]:
+            prune_snapshots(stale.name, [])
+        del _exported_snapshots[:-2]
+        prune_snapshots("graph_*_profiles_*", _exported_snapshots, min_age=settings.ROUTING_BATCH_TIMEOUT)
+    return str(path)
+
+
+def attach_snapshot(path: str):
+    """
+    Route on a snapshot written by export_snapshot in this worker process
+    
+    The graph is pinned, and replaced when a later batch brings the
+    snapshot of a newer graph version or profile build.
+    
+    Raises:
+        RuntimeError: The snapshot could not be loaded
+    """
+    global _attached_snapshot
+    if _attached_snapshot == path:
+        return
+    if not get_graph_cache().load_snapshot(Path(path), verify=False):
+        raise RuntimeError(f"Batch worker could not load graph snapshot {path}")
+    _attached_snapshot = path
+
+
+def route_groups(
+    db: Session,
+    snapshot: str,
+    trips: Dict[int, Trip],
+    groups: List[List[int]],
+    vehicle: Optional[VehicleProfile] = None
+) -> List[Tuple[int, Dict]]:
+    """
+    Route groups of trips with one SmartRoutingService
+    
+    Runs in a batch worker process (see WorkerPool.run_with_db), on the
+    graph and profiles of `snapshot`; incidents come from the worker's own
+    session.
+    
+    Args:
+        db: Session owned by the worker process
+        snapshot: Directory from batch_snapshot
+        trips: The trips of these groups, by index in the batch
+        groups: Trip indices sharing an origin and departure bucket (see group_trips)
+        vehicle: Only use segments this vehicle may enter (None: no restrictions)
+    
+    Returns:
+        (trip index, route dict) for every trip of the groups
+    """
+    attach_snapshot(snapshot)
+    routing_service = get_routing_service(db)
+    routes = []
+    for group in groups:
+        try:
+            results = routing_service.find_routes_from(
+                trips[group[0]][0],
+                [trips[index][1] for index in group],
+                [trips[index][2] for index in group],
+                vehicle
+            )
+        except Exception as e:
+            results = [{'success': False, 'error': str(e)} for _ in group]
+        routes.extend(zip(group, results))
+    return routes
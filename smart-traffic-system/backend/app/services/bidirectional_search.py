@@ -0,0 +1,371 @@
+"""
+Bidirectional Time-Dependent Search
+Forward time-dependent search from the origin combined with a backward
+search from the destination on lower-bound costs, which bounds the part
+of the network the forward search has to settle
+"""
+
+import heapq
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.compact_graph import CompactRoadGraph
+from app.services.heuristics import GeoHeuristic
+from app.services.search_stats import SearchStats
+
+# Weight on the straight-line estimate in the search for a first route
+FIRST_ROUTE_WEIGHT = 2.0
+# Radius of the unbalanced backward search, as a share of the first route's cost
+BOUNDED_BACKWARD_SHARE = 0.3
+
+
+class BidirectionalResult:
+    """A route as node and CSR edge sequences, with search counters"""
+    
+    def __init__(
+        self,
+        nodes: List[int],
+        edges: List[int],
+        arrival: List[float],
+        forward_settled: int,
+        backward_settled: int,
+        cost_evaluations: int
+    ):
+        self.nodes = nodes
+        self.edges = edges
+        self.arrival = arrival                  # minutes after departure, per node
+        self.forward_settled = forward_settled
+        self.backward_settled = backward_settled
+        self.cost_evaluations = cost_evaluations
+    
+    @property
+    def cost(self) -> float:
+        return self.arrival[-1]
+
+
+def reversed_edge_ids(graph: CompactRoadGraph) -> np.ndarray:
+    """Original CSR edge index of every position in graph.reversed_csr()"""
+    return graph.get_precomputed('reversed_edge_ids', lambda: np.argsort(graph.targets, kind='stable'))
+
+
+def first_route(
+    graph: CompactRoadGraph,
+    source: int,
+    target: int,
+    allowed: Optional[np.ndarray] = None,
+    stats: Optional[SearchStats] = None
+) -> Optional[List[int]]:
+    """
+    Some route from source to target, found quickly
+    
+    Weighted A* on free-flow minutes with the straight-line estimate
+    scaled by FIRST_ROUTE_WEIGHT: not optimal, but it settles little more
+    than a corridor between the two.
+    
+    Returns:
+        CSR edges of the route, or None if there is none
+    """
+    offsets, targets = graph.offsets, graph.targets
+    minutes = graph.free_flow_minutes
+    estimate = GeoHeuristic(graph, target)
+    
+    open_set = [(0.0, 0.0, source)]
+    g_score: Dict[int, float] = {source: 0.0}
+    parent: Dict[int, Tuple[int, int]] = {}
+    closed = set()
+    relaxed, pushes = 0, 1
+    
+    while open_set:
+        _, current_g, current = heapq.heappop(open_set)
+        if current in closed:
+            continue
+        closed.add(current)
+        
+        if current == target:
+            edges = []
+            while current in parent:
+                current, edge = parent[current]
+                edges.append(edge)
+            edges.reverse()
+            if stats is not None:
+                stats.record_search(len(closed), relaxed, pushes)
+            return edges
+        
+        edges = np.arange(offsets[current], offsets[current + 1])
+        if allowed is not None:
+            edges = edges[allowed[edges]]
+        if not len(edges):
+            continue
+        neighbors = targets[edges]
+        estimates = estimate(neighbors)
+        for edge, neighbor, cost, remaining in zip(
+            edges.tolist(), neighbors.tolist(), minutes[edges].tolist(), estimates.tolist()
+        ):
+            if neighbor in closed:
+                continue
+            relaxed += 1
+            tentative_g = current_g + cost
+            if tentative_g < g_score.get(neighbor, float('inf')):
+                g_score[neighbor] = tentative_g
+                parent[neighbor] = (current, edge)
+                heapq.heappush(open_set, (tentative_g + FIRST_ROUTE_WEIGHT * remaining, tentative_g, neighbor))
+                pushes += 1
+    
+    if stats is not None:
+        stats.record_search(len(closed), relaxed, pushes)
+    return None
+
+
+def bidirectional_td_search(
+    graph: CompactRoadGraph,
+    source: int,
+    target: int,
+    edge_costs: Callable[[np.ndarray, float], np.ndarray],
+    path_costs: Callable[[np.ndarray, float], List[float]],
+    lower_bounds: Callable[[float], np.ndarray],
+    forward_estimate,
+    stats: Optional[SearchStats] = None,
+    allowed: Optional[np.ndarray] = None,
+    balanced: bool = True,
+    prefetch: Optional[Callable[[np.ndarray, float, Callable[[], List[Tuple[np.ndarray, float]]]], None]] = None
+) -> Optional[BidirectionalResult]:
+    """
+    Earliest arrival route from source to target
+    
+    The backward search cannot run on time-dependent costs because the
+    arrival time at the target is unknown, so it runs on lower bounds of
+    the edge costs. The search has three phases:
+    
+    1. first_route, priced at its real arrival times, gives an upper
+       bound mu on the travel time. A faster route enters all its edges
+       less than mu minutes after departure, so the lower bounds only
+       have to hold over that window, which makes profile bounds much
+       tighter than bounds over the whole day.
+    2. Balanced: forward Dijkstra on time-dependent costs and backward
+       Dijkstra on the lower bounds take turns, the side that has settled
+       fewer nodes going next, until their radii K_f + K_b reach mu. Where
+       they meet, the joined route is priced and may lower mu.
+       Unbalanced (for loose bounds, whose meetings rarely lower mu): the
+       backward search alone, up to BOUNDED_BACKWARD_SHARE of mu.
+    3. Forward A* with the exact lower-bound distance to the target as
+       potential on backward-settled nodes (the backward radius
+       elsewhere), combined with forward_estimate, until it settles the
+       target or its smallest key reaches mu (the best priced route is
+       then optimal). Once K_f + K_b reaches mu, a faster route only runs
+       through backward-settled nodes, and the search is restricted to
+       them.
+    
+    Args:
+        graph: Road graph
+        source, target: Node IDs
+        edge_costs: Time-dependent costs (edge array, minutes after departure) -> minutes
+        path_costs: (edges of a path, minutes after departure at its start)
+            -> arrival minutes at its start and after each edge
+        lower_bounds: Horizon (minutes) -> per-CSR-edge lower bound on the
+            cost of an edge entered at most that long after departure
+        forward_estimate: Admissible heuristic towards target, combined
+            with the backward distances in phase 3
+        stats: Counters to add the work of all phases to (edge costs are
+            counted by edge_costs itself)
+        allowed: Boolean per CSR edge of the edges that may be taken (None = all)
+        balanced: Phase 2 variant
+        prefetch: Called with the edges about to be priced, their entry
+            minutes and a function listing (out-edges, entry minutes) of
+            the next ROUTING_BATCH_LOOKAHEAD forward frontier nodes, so the
+            cost model can batch its work
+    
+    Returns:
+        BidirectionalResult, or None if the target is unreachable
+    """
+    offsets, targets = graph.offsets, graph.targets
+    reversed_offsets, sources, _ = graph.reversed_csr()
+    reversed_edges = reversed_edge_ids(graph)
+    
+    # Phase 1: upper bound and the lower bounds valid below it
+    route = first_route(graph, source, target, allowed, stats)
+    if route is None:
+        return None
+    best_edges = route
+    best_arrival = path_costs(np.array(route, dtype=np.int64), 0.0)
+    evaluations = len(route)
+    mu = best_arrival[-1]
+    bounds = lower_bounds(mu)
+    
+    forward_closed: Dict[int, float] = {}
+    backward_closed: Dict[int, float] = {}
+    forward_open = [(0.0, 0.0, source)]
+    forward_g: Dict[int, float] = {source: 0.0}
+    forward_parent: Dict[int, Tuple[int, int]] = {}
+    backward_open = [(0.0, target)]
+    backward_d: Dict[int, float] = {target: 0.0}
+    backward_next: Dict[int, Tuple[int, int]] = {}
+    relaxed, pushes = 0, 2
+    
+    def record():
+        if stats is not None:
+            stats.record_search(len(forward_closed) + len(backward_closed), relaxed, pushes)
+    
+    def forward_edges(node: int) -> List[int]:
+        edges = []
+        while node in forward_parent:
+            node, edge = forward_parent[node]
+            edges.append(edge)
+        edges.reverse()
+        return edges
+    
+    def result(edges: List[int], arrival: List[float]) -> BidirectionalResult:
+        record()
+        return BidirectionalResult(
+            [source] + targets[np.array(edges, dtype=np.int64)].tolist(), edges, arrival,
+            forward_settled=len(forward_closed),
+            backward_settled=len(backward_closed),
+            cost_evaluations=evaluations
+        )
+    
+    def forward_result(node: int) -> BidirectionalResult:
+        edges = forward_edges(node)
+        return result(edges, [0.0] + [forward_g[int(targets[edge])] for edge in edges])
+    
+    def meet(node: int):
+        """Price the route joining both searches at node, keeping it if it beats mu"""
+        nonlocal mu, best_edges, best_arrival, evaluations
+        if forward_closed[node] + backward_closed[node] >= mu:
+            return
+        suffix, current = [], node
+        while current in backward_next:
+            current, edge = backward_next[current]
+            suffix.append(edge)
+        arrival = path_costs(np.array(suffix, dtype=np.int64), forward_closed[node])
+        evaluations += len(suffix)
+        if arrival[-1] < mu:
+            prefix = forward_edges(node)
+            mu = arrival[-1]
+            best_edges = prefix + suffix
+            best_arrival = [0.0] + [forward_g[int(targets[edge])] for edge in prefix] + arrival[1:]
+    
+    def out_edges(node: int) -> np.ndarray:
+        edges = np.arange(offsets[node], offsets[node + 1])
+        return edges if allowed is None else edges[allowed[edges]]
+    
+    def expand_forward(node: int, g: float, potential: Optional[Callable[[np.ndarray], np.ndarray]], restricted: bool):
+        """Relax the edges out of node into open nodes (backward-settled ones only if restricted)"""
+        nonlocal relaxed, pushes, evaluations
+        edges = out_edges(node)
+        # Only price edges into nodes the search can still use
+        usable = [
+            i for i, neighbor in enumerate(targets[edges].tolist())
+            if neighbor not in forward_closed and (not restricted or neighbor in backward_closed)
+        ]
+        if not usable:
+            return
+        edges = edges[usable]
+        neighbors = targets[edges]
+        if prefetch is not None:
+            prefetch(edges, g, lambda: [
+                (out_edges(frontier), frontier_g)
+                for _, frontier_g, frontier in heapq.nsmallest(settings.ROUTING_BATCH_LOOKAHEAD, forward_open)
+                if frontier not in forward_closed
+            ])
+        costs = edge_costs(edges, g)
+        evaluations += len(edges)
+        estimates = potential(neighbors) if potential is not None else np.zeros(len(edges))
+        for edge, neighbor, cost, estimate in zip(edges.tolist(), neighbors.tolist(), costs.tolist(), estimates.tolist()):
+            if cost == float('inf'):
+                continue
+            relaxed += 1
+            tentative_g = g + cost
+            if tentative_g < forward_g.get(neighbor, float('inf')):
+                forward_parent[neighbor] = (node, edge)
+                forward_g[neighbor] = tentative_g
+                heapq.heappush(forward_open, (tentative_g + estimate, tentative_g, neighbor))
+                pushes += 1
+    
+    def expand_backward(node: int, d: float):
+        nonlocal relaxed, pushes
+        positions = np.arange(reversed_offsets[node], reversed_offsets[node + 1])
+        edges = reversed_edges[positions]
+        if allowed is not None:
+            usable = allowed[edges]
+            positions, edges = positions[usable], edges[usable]
+        for predecessor, edge, minutes in zip(sources[positions].tolist(), edges.tolist(), bounds[edges].tolist()):
+            if predecessor in backward_closed:
+                continue
+            relaxed += 1
+            tentative_d = d + minutes
+            if tentative_d < backward_d.get(predecessor, float('inf')):
+                backward_d[predecessor] = tentative_d
+                backward_next[predecessor] = (node, edge)
+                heapq.heappush(backward_open, (tentative_d, predecessor))
+                pushes += 1
+    
+    def forward_key() -> float:
+        while forward_open and (forward_open[0][2] in forward_closed or forward_open[0][1] > forward_g[forward_open[0][2]]):
+            heapq.heappop(forward_open)
+        return forward_open[0][0] if forward_open else float('inf')
+    
+    def backward_key() -> float:
+        while backward_open and backward_open[0][1] in backward_closed:
+            heapq.heappop(backward_open)
+        return backward_open[0][0] if backward_open else float('inf')
+    
+    # Phase 2: balanced Dijkstra in both directions, or the backward
+    # search alone up to a share of mu when meetings would rarely improve it
+    if balanced:
+        while forward_key() + backward_key() < mu:
+            if len(forward_closed) <= len(backward_closed) or not backward_open:
+                _, g, node = heapq.heappop(forward_open)
+                forward_closed[node] = g
+                if node == target:
+                    return forward_result(node)
+                if node in backward_closed:
+                    meet(node)
+                expand_forward(node, g, None, False)
+            else:
+                d, node = heapq.heappop(backward_open)
+                backward_closed[node] = d
+                if node in forward_closed:
+                    meet(node)
+                expand_backward(node, d)
+    else:
+        while backward_key() < BOUNDED_BACKWARD_SHARE * mu:
+            d, node = heapq.heappop(backward_open)
+            backward_closed[node] = d
+            expand_backward(node, d)
+    
+    # Phase 3: A* on the exact lower-bound distances of backward-settled
+    # nodes (at least the backward radius elsewhere)
+    radius = backward_key()
+    restricted = forward_key() + radius >= mu
+    
+    def potential(nodes: np.ndarray) -> np.ndarray:
+        exact = np.array([backward_closed.get(node, radius) for node in nodes.tolist()])
+        return np.maximum(exact, forward_estimate(nodes))
+    
+    frontier = {
+        node: g for _, g, node in forward_open
+        if node not in forward_closed and g == forward_g[node] and (not restricted or node in backward_closed)
+    }
+    if frontier:
+        nodes = np.fromiter(frontier.keys(), dtype=np.int64, count=len(frontier))
+        forward_open = [(g + h, g, node) for (node, g), h in zip(frontier.items(), potential(nodes).tolist())]
+        heapq.heapify(forward_open)
+    else:
+        forward_open = []
+    
+    while forward_open:
+        key, g, node = heapq.heappop(forward_open)
+        if node in forward_closed or g > forward_g[node]:
+            continue
+        if key >= mu:
+            break
+        forward_closed[node] = g
+        if node == target:
+            return forward_result(node)
+        expand_forward(node, g, potential, restricted)
+    
+    if mu == float('inf'):
+        record()
+        return None
+    return result(best_edges, best_arrival)
@@ -0,0 +1,327 @@
+"""
+Compact Road Graph
+Array-backed (CSR) road network for city-scale routing
+"""
+
+import threading
+from collections.abc import Mapping
+from typing import Dict, List, Tuple, Optional, Iterator
+from datetime import datetime
+
+import numpy as np
+
+from app.services.graph_search import reverse_csr
+from app.services.segment_geometry import SegmentGeometry
+from app.services.spatial_index import haversine_km
+
+COORDINATE_KEYS = ('start_lat', 'start_lon', 'end_lat', 'end_lon')
+LIMIT_KEYS = ('max_height', 'max_width', 'max_weight')
+ALL_VEHICLES_MASK = np.iinfo(np.uint16).max
+
+
+class SegmentInfoView(Mapping):
+    """
+    Read-only dict-style view over the segment attribute arrays
+    
+    Keeps the legacy `graph.segment_info[segment_id]` API working; each
+    lookup materialises a small dict, so hot loops should use the arrays.
+    """
+    
+    def __init__(self, graph: 'CompactRoadGraph'):
+        self._graph = graph
+    
+    def __getitem__(self, segment_id: str) -> Dict:
+        node = self._graph.index_of(segment_id)
+        if node is None:
+            raise KeyError(segment_id)
+        return self._graph.node_info(node)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._graph.get_all_segments())
+    
+    def __len__(self) -> int:
+        return self._graph.num_nodes
+
+
+class CompactRoadGraph:
+    """
+    Directed road graph in compressed sparse row (CSR) form
+    
+    Nodes are road segments interned to integer IDs (their position in the
+    sorted segment ID array). Outgoing edges of node i are
+    targets[offsets[i]:offsets[i + 1]] with matching weights (km).
+    Segment attributes are stored struct-of-arrays, one entry per node.
+    """
+    
+    def __init__(
+        self,
+        segment_ids: np.ndarray,
+        offsets: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray,
+        max_speed: np.ndarray,
+        lanes: np.ndarray,
+        road_class: np.ndarray,
+        road_classes: List[str],
+        name_codes: np.ndarray,
+        names: List[str],
+        coordinates: Optional[Dict[str, np.ndarray]] = None,
+        version: Optional[str] = None,
+        geometry: Optional[SegmentGeometry] = None,
+        restrictions: Optional[Dict[str, np.ndarray]] = None
+    ):
+        self.segment_ids = segment_ids      # sorted, dtype 'S' (utf-8 bytes)
+        self.offsets = offsets              # int64, num_nodes + 1
+        self.targets = targets              # int32, num_edges
+        self.weights = weights              # float32, num_edges (km)
+        self.max_speed = max_speed          # float32, km/h
+        self.lanes = lanes                  # int16
+        self.road_class = road_class        # int16 code into road_classes
+        self.road_classes = road_classes
+        self.name_codes = name_codes        # int32 code into names
+        self.names = names
+        
+        # Endpoint coordinates in travel direction, float32 degrees (NaN = unknown)
+        if coordinates is None:
+            missing = np.full(len(max_speed), np.nan, dtype=np.float32)
+            coordinates = {key: missing for key in COORDINATE_KEYS}
+        self.start_lat = coordinates['start_lat']
+        self.start_lon = coordinates['start_lon']
+        self.end_lat = coordinates['end_lat']
+        self.end_lon = coordinates['end_lon']
+        
+        # Vehicle restrictions: allowed type bitmask (see vehicle_profiles.VEHICLE_TYPES)
+        # and float32 height (m), width (m) and weight (t) limits, inf = no limit
+        if restrictions is None:
+            unlimited = np.full(len(max_speed), np.inf, dtype=np.float32)
+            restrictions = {key: unlimited for key in LIMIT_KEYS}
+            restrictions['vehicle_types'] = np.full(len(max_speed), ALL_VEHICLES_MASK, dtype=np.uint16)
+        self.vehicle_types = restrictions['vehicle_types']
+        self.max_height = restrictions['max_height']
+        self.max_width = restrictions['max_width']
+        self.max_weight = restrictions['max_weight']
+        self.version = version
+        self.geometry = geometry            # RoadSegment points and LineStrings for responses
+        self.built_at = datetime.now()
+        self.segment_info = SegmentInfoView(self)
+        
+        # Derived tables (landmarks, hierarchies, ...) live and die with this graph version
+        self.precomputed: Dict[str, object] = {}
+        self._lock = threading.RLock()
+    
+    @classmethod
+    def from_edges(
+        cls,
+        segment_ids: List[str],
+        sources: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray,
+        attributes: Dict[str, List],
+        version: Optional[str] = None,
+        geometry: Optional[SegmentGeometry] = None
+    ) -> 'CompactRoadGraph':
+        """
+        Compile an edge list into CSR form
+        
+        Args:
+            segment_ids: Segment IDs, already sorted; edge endpoints index into this list
+            sources: Edge source node indices
+            targets: Edge target node indices
+            weights: Edge distances in km
+            attributes: Per-node 'name', 'max_speed', 'total_lanes' and 'road_class' lists,
+                optionally 'start'/'end' (lon, lat) tuples or None, and 'vehicle_types'
+                masks with 'max_height'/'max_width'/'max_weight' limits or None
+            version: Version stamp of the source data
+            geometry: Optional parsed segment geometry, in node order
+        
+        Returns:
+            CompactRoadGraph
+        """
+        num_nodes = len(segment_ids)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+        
+        # Group edges by source; lexsort is stable so the first duplicate wins
+        order = np.lexsort((targets, sources))
+        sources, targets, weights = sources[order], targets[order], weights[order]
+        if len(sources) > 1:
+            keep = np.ones(len(sources), dtype=bool)
+            keep[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+            sources, targets, weights = sources[keep], targets[keep], weights[keep]
+        
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+        
+        road_classes, road_class = _intern(attributes['road_class'])
+        names, name_codes = _intern(attributes['name'])
+        
+        coordinates = None
+        if 'start' in attributes and 'end' in attributes:
+            coordinates = {}
+            for endpoint in ('start', 'end'):
+                points = np.array(
+                    [point if point is not None else (np.nan, np.nan) for point in attributes[endpoint]],
+                    dtype=np.float32
+                ).reshape(-1, 2)
+                coordinates[f'{endpoint}_lon'] = np.ascontiguousarray(points[:, 0])
+                coordinates[f'{endpoint}_lat'] = np.ascontiguousarray(points[:, 1])
+        
+        restrictions = None
+        if 'vehicle_types' in attributes:
+            restrictions = {'vehicle_types': np.asarray(attributes['vehicle_types'], dtype=np.uint16)}
+            for key in LIMIT_KEYS:
+                restrictions[key] = np.array(
+                    [np.inf if limit is None else limit for limit in attributes[key]],
+                    dtype=np.float32
+                )
+        
+        return cls(
+            segment_ids=np.array([s.encode('utf-8') for s in segment_ids], dtype=bytes)
+                if num_nodes else np.array([], dtype='S1'),
+            offsets=offsets,
+            targets=targets.astype(np.int32),
+            weights=weights,
+            max_speed=np.asarray(attributes['max_speed'], dtype=np.float32),
+            lanes=np.asarray(attributes['total_lanes'], dtype=np.int16),
+            road_class=road_class.astype(np.int16),
+            road_classes=road_classes,
+            name_codes=name_codes.astype(np.int32),
+            names=names,
+            coordinates=coordinates,
+            version=version,
+            geometry=geometry,
+            restrictions=restrictions
+        )
+    
+    @property
+    def num_nodes(self) -> int:
+        return len(self.offsets) - 1
+    
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+    
+    @property
+    def free_flow_minutes(self) -> np.ndarray:
+        """
+        Per-edge travel time (minutes) at the target segment's speed limit
+        
+        A lower bound on the routing cost of every edge, used for
+        heuristic preprocessing.
+        """
+        return self.get_precomputed(
+            'free_flow_minutes',
+            lambda: (self.weights / np.maximum(self.max_speed[self.targets], 1.0) * 60.0).astype(np.float32)
+        )
+    
+    def reversed_csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(offsets, sources, free-flow minutes) CSR over incoming edges"""
+        return self.get_precomputed(
+            'reversed_free_flow',
+            lambda: reverse_csr(self.offsets, self.targets, self.free_flow_minutes)
+        )
+    
+    def get_precomputed(self, key: str, build):
+        """Memoize a derived table on this graph (built at most once)"""
+        value = self.precomputed.get(key)
+        if value is None:
+            with self._lock:
+                value = self.precomputed.get(key)
+                if value is None:
+                    value = build()
+                    self.precomputed[key] = value
+        return value
+    
+    @property
+    def max_network_speed(self) -> float:
+        """Highest maximumAllowedSpeed in the network (km/h)"""
+        return float(self.max_speed.max()) if self.num_nodes else 0.0
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the graph arrays"""
+        return (self.geometry.nbytes if self.geometry else 0) + sum(
+            array.nbytes for array in (
+                self.segment_ids, self.offsets, self.targets, self.weights,
+                self.max_speed, self.lanes, self.road_class, self.name_codes,
+                self.start_lat, self.start_lon, self.end_lat, self.end_lon,
+                self.vehicle_types, self.max_height, self.max_width, self.max_weight
+            )
+        )
+    
+    def index_of(self, segment_id: str) -> Optional[int]:
+        """Integer node ID of a segment, or None if it is not in the graph"""
+        if self.num_nodes == 0:
+            return None
+        key = segment_id.encode('utf-8')
+        node = int(np.searchsorted(self.segment_ids, key))
+        if node < self.num_nodes and self.segment_ids[node] == key:
+            return node
+        return None
+    
+    def segment_id(self, node: int) -> str:
+        """Segment ID of an integer node"""
+        return self.segment_ids[node].decode('utf-8')
+    
+    def neighbors(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Outgoing (targets, weights) array slices of an integer node"""
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return self.targets[start:end], self.weights[start:end]
+    
+    def node_info(self, node: int) -> Dict:
+        """Attribute dict of a node in the legacy segment_info layout"""
+        return {
+            'id': self.segment_id(node),
+            'name': self.names[self.name_codes[node]],
+            'start_lat': _coordinate(self.start_lat[node]),
+            'start_lon': _coordinate(self.start_lon[node]),
+            'end_lat': _coordinate(self.end_lat[node]),
+            'end_lon': _coordinate(self.end_lon[node]),
+            'total_lanes': int(self.lanes[node]),
+            'max_speed': float(self.max_speed[node]),
+            'road_class': self.road_classes[self.road_class[node]]
+        }
+    
+    def nearest_node(self, lat: float, lon: float) -> Optional[int]:
+        """Segment with the closest start or end point to a coordinate (None without geometry)"""
+        distance = np.fmin(
+            haversine_km(self.start_lat, self.start_lon, lat, lon),
+            haversine_km(self.end_lat, self.end_lon, lat, lon)
+        )
+        if not len(distance) or np.isnan(distance).all():
+            return None
+        return int(np.nanargmin(distance))
+    
+    # Segment-id lookups for callers that do not work with node indices
+    
+    def __contains__(self, segment_id: str) -> bool:
+        return self.index_of(segment_id) is not None
+    
+    def get_neighbors(self, segment_id: str) -> List[Tuple[str, float]]:
+        """Get all neighboring segments and their distances"""
+        node = self.index_of(segment_id)
+        if node is None:
+            return []
+        targets, weights = self.neighbors(node)
+        return [(self.segment_id(t), float(w)) for t, w in zip(targets, weights)]
+    
+    def get_all_segments(self) -> List[str]:
+        """Get all segment IDs in the graph"""
+        return [s.decode('utf-8') for s in self.segment_ids]
+
+
+def _coordinate(value) -> Optional[float]:
+    """Python float for a coordinate array entry, None when unknown"""
+    return None if np.isnan(value) else float(value)
+
+
+def _intern(values: List[str]) -> Tuple[List[str], np.ndarray]:
+    """Map repeated strings to a table of unique values plus integer codes"""
+    table: Dict[str, int] = {}
+    codes = np.fromiter(
+        (table.setdefault(value, len(table)) for value in values),
+        dtype=np.int64,
+        count=len(values)
+    )
+    return list(table.keys()), codes
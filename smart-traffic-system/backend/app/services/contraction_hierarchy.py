@@ -0,0 +1,531 @@
+"""
+Customizable Contraction Hierarchies (CCH)
+Metric-independent preprocessing of the road graph plus fast re-customization
+with current edge weights, for lookup-speed route queries
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.compact_graph import CompactRoadGraph
+from app.services.graph_snapshot import claim_build, load_arrays, release_build, save_arrays
+from app.services.search_stats import SearchStats
+
+# Nested dissection stops splitting below this many nodes
+_LEAF_SIZE = 16
+
+
+def nested_dissection_order(graph: CompactRoadGraph) -> np.ndarray:
+    """
+    Metric-independent contraction order by recursive geometric bisection
+    
+    Each cell is split at the median of its longer coordinate axis; the
+    nodes on the cut (separator) are contracted after both halves, so the
+    hierarchy's top levels are the small separators of the road network.
+    
+    Returns:
+        Node IDs in contraction order (first = lowest rank)
+    """
+    num_nodes = graph.num_nodes
+    lat = _midpoint(graph.start_lat, graph.end_lat)
+    lon = _midpoint(graph.start_lon, graph.end_lon)
+    
+    offsets, neighbors = _undirected_csr(graph)
+    side = np.zeros(num_nodes, dtype=np.int8)
+    order: List[np.ndarray] = []
+    
+    def dissect(nodes: np.ndarray):
+        if len(nodes) <= _LEAF_SIZE:
+            degree = offsets[nodes + 1] - offsets[nodes]
+            order.append(nodes[np.argsort(degree, kind='stable')])
+            return
+        
+        coordinate = lat[nodes] if np.ptp(lat[nodes]) >= np.ptp(lon[nodes]) else lon[nodes]
+        ranked = nodes[np.argsort(coordinate, kind='stable')]
+        half = len(ranked) // 2
+        left, right = ranked[:half], ranked[half:]
+        
+        # Cut edges between the halves
+        side[right] = 2
+        counts = offsets[left + 1] - offsets[left]
+        starts = np.repeat(offsets[left], counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cut_targets = neighbors[starts + local]
+        crossing = side[cut_targets] == 2
+        side[right] = 0
+        cut_left = np.repeat(left, counts)[crossing]
+        cut_right = cut_targets[crossing]
+        
+        # Separator: greedy vertex cover of the cut, busiest endpoints first
+        separator = set()
+        if len(cut_left):
+            endpoints, cut_degree = np.unique(np.concatenate([cut_left, cut_right]), return_counts=True)
+            incident: Dict[int, List[int]] = {}
+            for a, b in zip(cut_left.tolist(), cut_right.tolist()):
+                incident.setdefault(a, []).append(b)
+                incident.setdefault(b, []).append(a)
+            for node in endpoints[np.argsort(-cut_degree, kind='stable')].tolist():
+                if node not in separator and any(other not in separator for other in incident[node]):
+                    separator.add(node)
+        separator_nodes = np.array(sorted(separator), dtype=np.int64)
+        
+        dissect(left[~np.isin(left, separator_nodes)])
+        dissect(right[~np.isin(right, separator_nodes)])
+        order.append(separator_nodes)
+    
+    if num_nodes:
+        dissect(np.arange(num_nodes))
+    return np.concatenate(order) if order else np.array([], dtype=np.int64)
+
+
+def _midpoint(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Segment midpoint coordinate; unlocated segments sit at the network centre"""
+    start = start.astype(np.float64)
+    end = end.astype(np.float64)
+    middle = np.where(np.isnan(start), end, np.where(np.isnan(end), start, (start + end) / 2.0))
+    known = ~np.isnan(middle)
+    middle[~known] = middle[known].mean() if known.any() else 0.0
+    return middle
+
+
+def _undirected_csr(graph: CompactRoadGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric, loop-free neighbour lists of the road graph"""
+    num_nodes = graph.num_nodes
+    sources = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(graph.offsets))
+    targets = graph.targets.astype(np.int64)
+    a = np.concatenate([sources, targets])
+    b = np.concatenate([targets, sources])
+    keep = a != b
+    keys = np.unique(a[keep] * num_nodes + b[keep])
+    a, b = keys // max(num_nodes, 1), keys % max(num_nodes, 1)
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(a, minlength=num_nodes), out=offsets[1:])
+    return offsets, b
+
+
+class ContractionHierarchy:
+    """
+    Metric-independent hierarchy: node ranks, the chordal supergraph
+    (original edges plus shortcuts) and its lower triangles
+    
+    Hierarchy edge e joins lower[e] (lower rank) and upper[e]; each carries
+    a weight per direction once customized. Triangles (v; x, y) with v
+    below x and y are grouped by elimination level so customization can
+    process each level as one vectorized batch.
+    """
+    
+    def __init__(
+        self,
+        rank: np.ndarray,
+        lower: np.ndarray,
+        upper: np.ndarray,
+        triangles: np.ndarray,
+        level_offsets: np.ndarray,
+        version: Optional[str] = None
+    ):
+        self.rank = rank                    # int32 per node
+        self.lower = lower                  # int32 per hierarchy edge
+        self.upper = upper                  # int32 per hierarchy edge
+        self.triangles = triangles          # int32 (t, 4): v, e_vx, e_vy, e_xy
+        self.level_offsets = level_offsets  # triangle ranges per level
+        self.version = version
+        
+        num_nodes = len(rank)
+        self._keys = lower.astype(np.int64) * num_nodes + upper
+        # Upward adjacency: edges are sorted by lower endpoint
+        self.up_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lower, minlength=num_nodes), out=self.up_offsets[1:])
+        self.upper_rank = rank[upper]
+        self._up_offsets_list = self.up_offsets.tolist()
+        
+        # Elimination tree: parent is the lowest-ranked upward neighbour
+        order = np.argsort(rank)
+        parent = np.full(num_nodes, -1, dtype=np.int64)
+        has_up = np.diff(self.up_offsets) > 0
+        if has_up.any():
+            lowest = np.minimum.reduceat(self.upper_rank, self.up_offsets[:-1][has_up])
+            parent[has_up] = order[lowest]
+        self._parent_list = parent.tolist()
+    
+    @property
+    def num_edges(self) -> int:
+        return len(self.lower)
+    
+    @classmethod
+    def build(cls, graph: CompactRoadGraph) -> 'ContractionHierarchy':
+        """Order nodes, contract them (adding fill-in shortcuts) and list triangles"""
+        num_nodes = graph.num_nodes
+        order = nested_dissection_order(graph)
+        rank = np.empty(num_nodes, dtype=np.int64)
+        rank[order] = np.arange(num_nodes)
+        
+        offsets, neighbors = _undirected_csr(graph)
+        # Only higher-ranked neighbours matter; contraction adds their clique
+        upward: List[set] = [set() for _ in range(num_nodes)]
+        for node in range(num_nodes):
+            for neighbor in neighbors[offsets[node]:offsets[node + 1]].tolist():
+                if rank[neighbor] > rank[node]:
+                    upward[node].add(neighbor)
+        
+        level = np.zeros(num_nodes, dtype=np.int64)
+        for node in order.tolist():
+            above = upward[node]
+            for x in above:
+                level[x] = max(level[x], level[node] + 1)
+                rank_x = rank[x]
+                for y in above:
+                    if rank[y] > rank_x:
+                        upward[x].add(y)
+        
+        lower_list, upper_list = [], []
+        for node in range(num_nodes):
+            for neighbor in upward[node]:
+                lower_list.append(node)
+                upper_list.append(neighbor)
+        lower = np.array(lower_list, dtype=np.int64)
+        upper = np.array(upper_list, dtype=np.int64)
+        sort = np.lexsort((upper, lower))
+        lower, upper = lower[sort], upper[sort]
+        keys = lower * num_nodes + upper
+        
+        # Lower triangles: every pair of upward neighbours of v is itself an edge
+        tri_v, tri_x, tri_y = [], [], []
+        for node in range(num_nodes):
+            above = sorted(upward[node], key=lambda n: rank[n])
+            for i, x in enumerate(above):
+                for y in above[i + 1:]:
+                    tri_v.append(node)
+                    tri_x.append(x)
+                    tri_y.append(y)
+        tri_v = np.array(tri_v, dtype=np.int64)
+        tri_x = np.array(tri_x, dtype=np.int64)
+        tri_y = np.array(tri_y, dtype=np.int64)
+        triangles = np.stack([
+            tri_v,
+            np.searchsorted(keys, tri_v * num_nodes + tri_x),
+            np.searchsorted(keys, tri_v * num_nodes + tri_y),
+            np.searchsorted(keys, tri_x * num_nodes + tri_y)
+        ], axis=1) if len(tri_v) else np.zeros((0, 4), dtype=np.int64)
+        
+        by_level = np.argsort(level[tri_v], kind='stable')
+        triangles = triangles[by_level]
+        triangle_levels = level[tri_v][by_level]
+        level_offsets = np.searchsorted(triangle_levels, np.arange(int(level.max(initial=0)) + 2))
+        
+        return cls(
+            rank=rank.astype(np.int32),
+            lower=lower.astype(np.int32),
+            upper=upper.astype(np.int32),
+            triangles=triangles.astype(np.int32),
+            level_offsets=level_offsets.astype(np.int64),
+            version=graph.version
+        )
+    
+    def ancestors(self, node: int) -> np.ndarray:
+        """Elimination-tree ancestors of a node, itself first (increasing rank)"""
+        chain = []
+        while node >= 0:
+            chain.append(node)
+            node = self._parent_list[node]
+        return np.array(chain, dtype=np.int64)
+    
+    def edge_index(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Hierarchy edge IDs of node pairs (either orientation)"""
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        a_lower = self.rank[a] < self.rank[b]
+        low = np.where(a_lower, a, b)
+        high = np.where(a_lower, b, a)
+        return np.searchsorted(self._keys, low * len(self.rank) + high)
+    
+    def customize(self, graph: CompactRoadGraph, edge_minutes: np.ndarray, metric: str = 'custom') -> 'CustomizedHierarchy':
+        """
+        Apply a metric: per original CSR edge travel time in minutes
+        
+        Runs the lower-triangle relaxation level by level; each level is a
+        handful of NumPy operations regardless of its size.
+        """
+        num_edges = self.num_edges
+        up = np.full(num_edges, np.inf)        # lower -> upper
+        down = np.full(num_edges, np.inf)      # upper -> lower
+        via_up = np.full(num_edges, -1, dtype=np.int32)
+        via_down = np.full(num_edges, -1, dtype=np.int32)
+        
+        sources = np.repeat(np.arange(graph.num_nodes, dtype=np.int64), np.diff(graph.offsets))
+        targets = graph.targets.astype(np.int64)
+        valid = sources != targets
+        sources, targets = sources[valid], targets[valid]
+        minutes = np.asarray(edge_minutes, dtype=np.float64)[valid]
+        edges = self.edge_index(sources, targets)
+        upward = self.rank[sources] < self.rank[targets]
+        np.minimum.at(up, edges[upward], minutes[upward])
+        np.minimum.at(down, edges[~upward], minutes[~upward])
+        
+        for level in range(len(self.level_offsets) - 1):
+            batch = self.triangles[self.level_offsets[level]:self.level_offsets[level + 1]]
+            if not len(batch):
+                continue
+            v, e_vx, e_vy, e_xy = batch[:, 0], batch[:, 1], batch[:, 2], batch[:, 3]
+            # x -> v -> y improves the upward weight of (x, y); y -> v -> x the downward one
+            _relax(up, via_up, e_xy, down[e_vx] + up[e_vy], v)
+            _relax(down, via_down, e_xy, down[e_vy] + up[e_vx], v)
+        
+        return CustomizedHierarchy(self, up, down, via_up, via_down, metric)
+    
+    def save(self, path: Path):
+        """Persist the metric-independent hierarchy as a compressed .npz, or as a memory-mappable snapshot directory"""
+        arrays = {
+            'rank': self.rank,
+            'lower': self.lower,
+            'upper': self.upper,
+            'triangles': self.triangles,
+            'level_offsets': self.level_offsets
+        }
+        if path.suffix != '.npz':
+            save_arrays(path, arrays, {'version': self.version})
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, **arrays, version=np.array(self.version or ''))
+    
+    @classmethod
+    def load(cls, path: Path) -> 'ContractionHierarchy':
+        """Load a hierarchy written by save() (snapshot directories are memory-mapped)"""
+        if path.suffix != '.npz':
+            arrays, meta = load_arrays(path)
+            return cls(version=meta.get('version'), **arrays)
+        with np.load(path) as data:
+            return cls(
+                rank=data['rank'],
+                lower=data['lower'],
+                upper=data['upper'],
+                triangles=data['triangles'],
+                level_offsets=data['level_offsets'],
+                version=str(data['version']) or None
+            )
+
+
+def _relax(weights: np.ndarray, via: np.ndarray, edges: np.ndarray, candidates: np.ndarray, middle: np.ndarray):
+    """Per target edge, keep the best candidate if it beats the current weight"""
+    order = np.lexsort((candidates, edges))
+    edges, candidates, middle = edges[order], candidates[order], middle[order]
+    first = np.ones(len(edges), dtype=bool)
+    first[1:] = edges[1:] != edges[:-1]
+    edges, candidates, middle = edges[first], candidates[first], middle[first]
+    better = candidates < weights[edges]
+    weights[edges[better]] = candidates[better]
+    via[edges[better]] = middle[better]
+
+
+class CustomizedHierarchy:
+    """A ContractionHierarchy with one metric applied, ready for queries"""
+    
+    def __init__(
+        self,
+        hierarchy: ContractionHierarchy,
+        up: np.ndarray,
+        down: np.ndarray,
+        via_up: np.ndarray,
+        via_down: np.ndarray,
+        metric: str
+    ):
+        self.hierarchy = hierarchy
+        self.up = up
+        self.down = down
+        self.via_up = via_up
+        self.via_down = via_down
+        self.metric = metric
+        self.customized_at = time.time()
+    
+    def query(
+        self,
+        source: int,
+        target: int,
+        stats: Optional[SearchStats] = None
+    ) -> Optional[Tuple[float, List[int], List[float]]]:
+        """
+        Bidirectional upward search plus shortcut unpacking
+        
+        Args:
+            source, target: Node IDs
+            stats: Counters to add the upward searches' work to
+        
+        Returns:
+            (total minutes, node path, per-arc minutes) or None if unreachable
+        """
+        if source == target:
+            return 0.0, [source], []
+        
+        ch = self.hierarchy
+        # Forward climbs lower->upper arcs, backward walks upper->lower arcs in reverse
+        forward_nodes, forward_distance, forward_parent = self._upward_search(source, self.up)
+        backward_nodes, backward_distance, backward_parent = self._upward_search(target, self.down)
+        if stats is not None:
+            up_offsets = self.hierarchy.up_offsets
+            scanned = np.concatenate([forward_nodes, backward_nodes])
+            stats.record_search(len(scanned), int((up_offsets[scanned + 1] - up_offsets[scanned]).sum()), 0)
+        
+        common, forward_idx, backward_idx = np.intersect1d(
+            forward_nodes, backward_nodes, assume_unique=True, return_indices=True
+        )
+        if not len(common):
+            return None
+        totals = forward_distance[forward_idx] + backward_distance[backward_idx]
+        best_idx = int(np.argmin(totals))
+        best = float(totals[best_idx])
+        if not np.isfinite(best):
+            return None
+        meeting = int(common[best_idx])
+        parent = (
+            dict(zip(forward_nodes.tolist(), forward_parent.tolist())),
+            dict(zip(backward_nodes.tolist(), backward_parent.tolist()))
+        )
+        
+        # Hierarchy arcs source -> meeting, then meeting -> target
+        arcs: List[Tuple[int, int]] = []
+        node = meeting
+        while node != source:
+            edge = parent[0][node]
+            arcs.append((int(ch.lower[edge]), node))
+            node = int(ch.lower[edge])
+        arcs.reverse()
+        node = meeting
+        while node != target:
+            edge = parent[1][node]
+            arcs.append((node, int(ch.lower[edge])))
+            node = int(ch.lower[edge])
+        
+        path, arc_minutes = [source], []
+        for a, b in arcs:
+            for x, y, minutes in self._unpack(a, b):
+                path.append(y)
+                arc_minutes.append(minutes)
+        return best, path, arc_minutes
+    
+    def _upward_search(self, root: int, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Distances from root to its elimination-tree ancestors
+        
+        In the chordal hierarchy every upward path stays on the ancestor
+        chain, so scanning it bottom-up (no priority queue) settles each
+        node before its arcs are relaxed.
+        
+        Returns:
+            (ancestor nodes by rank, distances, parent hierarchy edge or -1)
+        """
+        ch = self.hierarchy
+        nodes = ch.ancestors(root)
+        ranks = ch.rank[nodes]
+        distance = np.full(len(nodes), np.inf)
+        distance[0] = 0.0
+        parent_edge = np.full(len(nodes), -1, dtype=np.int64)
+        
+        up_offsets = ch._up_offsets_list
+        for i, node in enumerate(nodes.tolist()):
+            start, end = up_offsets[node], up_offsets[node + 1]
+            if start == end or distance[i] == np.inf:
+                continue
+            positions = np.searchsorted(ranks, ch.upper_rank[start:end])
+            candidates = distance[i] + weights[start:end]
+            better = candidates < distance[positions]
+            distance[positions[better]] = candidates[better]
+            parent_edge[positions[better]] = np.arange(start, end)[better]
+        return nodes, distance, parent_edge
+    
+    def _unpack(self, a: int, b: int) -> List[Tuple[int, int, float]]:
+        """Expand a hierarchy arc a -> b into original edges (a, b, minutes)"""
+        ch = self.hierarchy
+        result = []
+        stack = [(a, b)]
+        while stack:
+            x, y = stack.pop()
+            edge = int(ch.edge_index(np.array([x]), np.array([y]))[0])
+            upward = ch.rank[x] < ch.rank[y]
+            middle = int(self.via_up[edge] if upward else self.via_down[edge])
+            if middle < 0:
+                result.append((x, y, float(self.up[edge] if upward else self.down[edge])))
+            else:
+                # Process x -> middle first
+                stack.append((middle, y))
+                stack.append((x, middle))
+        return result
+
+
+_hierarchy_lock = threading.Lock()
+_customized: Dict[Tuple[Optional[str], str], CustomizedHierarchy] = {}
+
+
+def get_contraction_hierarchy(graph: CompactRoadGraph) -> ContractionHierarchy:
+    """
+    Metric-independent hierarchy for a graph version
+    
+    Memoized on the graph and persisted under ROUTING_CACHE_DIR (with
+    ROUTING_SHARED_GRAPH as a snapshot every worker memory-maps).
+    
+    Raises:
+        SnapshotPending: Another worker is still building the shared
+            hierarchy after ROUTING_REQUEST_TIMEOUT seconds
+    """
+    def load_or_build() -> ContractionHierarchy:
+        suffix = '' if settings.ROUTING_SHARED_GRAPH else '.npz'
+        path = Path(settings.ROUTING_CACHE_DIR) / f"cch_{graph.version}{suffix}"
+        # A shared snapshot is built by one worker while the others wait (at most a request timeout) to load it
+        claimed = bool(suffix == '' and graph.version) and claim_build(path)
+        if graph.version and path.exists():
+            try:
+                hierarchy = ContractionHierarchy.load(path)
+                if len(hierarchy.rank) == graph.num_nodes:
+                    return hierarchy
+            except Exception as e:
+                print(f"⚠️ Warning: Could not load contraction hierarchy {path}: {e}")
+        
+        try:
+            print(f"🏗️  Contracting road graph {graph.version} ({graph.num_nodes} segments)...")
+            hierarchy = ContractionHierarchy.build(graph)
+            if graph.version:
+                try:
+                    hierarchy.save(path)
+                except OSError as e:
+                    print(f"⚠️ Warning: Could not persist contraction hierarchy: {e}")
+        finally:
+            if claimed:
+                release_build(path)
+        return hierarchy
+    
+    return graph.get_precomputed('cch', load_or_build)
+
+
+def get_customized_hierarchy(
+    graph: CompactRoadGraph,
+    metric: str,
+    edge_minutes: Callable[[], np.ndarray],
+    max_age: float = settings.ROUTING_CH_CUSTOMIZE_INTERVAL
+) -> CustomizedHierarchy:
+    """
+    Hierarchy customized with a named metric, re-customized when older than max_age
+    
+    Args:
+        graph: Road graph
+        metric: Metric name ('free_flow', 'baseline', 'predicted', ...)
+        edge_minutes: Builds the per-edge weights when (re)customization is due
+        max_age: Seconds a customization stays valid
+    """
+    key = (graph.version, metric)
+    customized = _customized.get(key)
+    if customized is not None and time.time() - customized.customized_at < max_age:
+        return customized
+    
+    hierarchy = get_contraction_hierarchy(graph)
+    with _hierarchy_lock:
+        customized = _customized.get(key)
+        if customized is None or time.time() - customized.customized_at >= max_age:
+            customized = hierarchy.customize(graph, edge_minutes(), metric)
+            # Drop customizations of superseded graph versions
+            for stale in [k for k in _customized if k[0] != graph.version]:
+                del _customized[stale]
+            _customized[key] = customized
+    return customized
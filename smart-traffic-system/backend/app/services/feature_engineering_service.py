@@ -8,7 +8,7 @@ import numpy as np
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from app.models.traffic import TrafficFlowObserved, RoadSegment
 
@@ -302,7 +302,10 @@ class FeatureEngineeringService:
         if result and result[0]:
             return float(result[0])
         
-        # Default baseline based on hour
+        return self._default_baseline_speed(hour)
+    
+    def _default_baseline_speed(self, hour: int) -> float:
+        """Default baseline based on hour"""
         if hour in [7, 8, 17, 18]:
             return 15.0  # Rush hour
         elif hour >= 22 or hour <= 6:
@@ -310,6 +313,72 @@ class FeatureEngineeringService:
         else:
             return 25.0  # Normal
     
+    def get_baseline_speeds(self, hour: int, day_of_week: int) -> Dict[str, float]:
+        """
+        Baseline speed of every segment for an hour and day of week
+        
+        Same average as _get_baseline_speed, in one grouped query
+        
+        Returns:
+            Dict mapping segment_id to baseline speed (segments without data omitted)
+        """
+        query = text("""
+            SELECT RefRoadSegment, AVG(AverageVehicleSpeed) as baseline_speed
+            FROM TrafficFlowObserved
+            WHERE DATEPART(HOUR, DateObserved) = :hour
+            AND DATEPART(WEEKDAY, DateObserved) = :day_of_week
+            GROUP BY RefRoadSegment
+        """)
+        
+        try:
+            result = self.db.execute(
+                query,
+                {'hour': hour, 'day_of_week': day_of_week + 1}
+            )
+            return {row[0]: float(row[1]) for row in result if row[0] and row[1]}
+        except Exception as e:
+            print(f"⚠️ Warning: Could not fetch baseline speeds: {e}")
+            return {}
+    
+    def get_bucket_speeds(
+        self,
+        days: int = 28,
+        bucket_minutes: int = 5
+    ) -> Tuple[List[str], List[int], List[float]]:
+        """
+        Average speed per segment and time-of-day bucket over recent history
+        
+        Args:
+            days: Days of history to aggregate
+            bucket_minutes: Bucket width in minutes
+        
+        Returns:
+            (segment_ids, buckets, speeds) as parallel lists
+        """
+        query = text(f"""
+            SELECT RefRoadSegment, bucket, AVG(speed) as average_speed
+            FROM (
+                SELECT 
+                    RefRoadSegment,
+                    (DATEPART(HOUR, DateObserved) * 60 + DATEPART(MINUTE, DateObserved)) / {int(bucket_minutes)} as bucket,
+                    AverageVehicleSpeed as speed
+                FROM TrafficFlowObserved
+                WHERE DateObserved >= DATEADD(day, -:days, GETDATE())
+                AND AverageVehicleSpeed IS NOT NULL
+            ) t
+            GROUP BY RefRoadSegment, bucket
+        """)
+        
+        segment_ids, buckets, speeds = [], [], []
+        try:
+            for row in self.db.execute(query, {'days': days}):
+                segment_ids.append(row[0])
+                buckets.append(int(row[1]))
+                speeds.append(float(row[2]))
+        except Exception as e:
+            print(f"⚠️ Warning: Could not fetch historical speed profiles: {e}")
+        return segment_ids, buckets, speeds
+    
     def _get_baseline_features(
         self,
         segment_info: Dict,
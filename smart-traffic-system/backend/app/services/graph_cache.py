@@ -0,0 +1,245 @@
+"""
+Road Graph Cache
+Process-wide CompactRoadGraph shared across routing requests, rebuilt only
+when RoadSegment data changes
+"""
+
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.traffic import RoadSegment
+from app.services.compact_graph import CompactRoadGraph
+from app.services.road_graph import segment_record, build_road_graph
+from app.services.graph_snapshot import (
+    SnapshotPending,
+    claim_build,
+    load_graph,
+    load_profiles,
+    prune_graph_versions,
+    read_meta,
+    release_build,
+    save_graph,
+    snapshot_path
+)
+from app.services.travel_time_profiles import set_travel_time_profiles
+
+
+class RoadGraphCache:
+    """
+    Holds one CompactRoadGraph per process
+    
+    Staleness is detected with a cheap COUNT/MAX(dateModified) probe on
+    RoadSegment. When only dateModified moved, just the modified rows are
+    re-read and merged into the cached records; deletions force a full reload.
+    
+    With ROUTING_SHARED_GRAPH, the graph of each version is built by one
+    worker process, written as a snapshot (see graph_snapshot) and
+    memory-mapped by every worker including the builder, so N workers
+    hold one copy and new workers attach instead of rebuilding. While
+    another worker builds it, the previous graph keeps serving; only a
+    worker without any graph waits, for at most ROUTING_REQUEST_TIMEOUT.
+    Requests arriving during a refresh in this process also get the
+    previous graph. Files of superseded versions are pruned from
+    ROUTING_CACHE_DIR (see prune_graph_versions).
+    
+    With ROUTING_GRAPH_SNAPSHOT, the process starts from a snapshot built
+    offline (ml-pipeline/scripts/build_graph_snapshot.py) instead of
+    reading and parsing RoadSegment. A snapshot built from the database
+    records its fingerprint, so the usual probe still catches later
+    changes; one built from a file has none and is kept as is.
+    """
+    
+    def __init__(self, check_interval: float = settings.ROUTING_GRAPH_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._graph: Optional[CompactRoadGraph] = None
+        self._records: Dict[str, Dict] = {}
+        self._fingerprint: Optional[Tuple[int, Optional[datetime]]] = None
+        self._last_check = 0.0
+        self._pinned = False
+        self.rebuild_count = 0
+    
+    @property
+    def version(self) -> Optional[str]:
+        """Version stamp of the cached graph (None before first build)"""
+        return self._graph.version if self._graph else None
+    
+    @property
+    def fingerprint(self) -> Optional[Tuple[int, Optional[datetime]]]:
+        """RoadSegment row count and latest dateModified the graph was built from"""
+        return self._fingerprint
+    
+    def get_graph(self, db: Session) -> CompactRoadGraph:
+        """
+        Get the shared road graph, refreshing it if RoadSegment changed
+        
+        Args:
+            db: Database session used for the staleness probe and reloads
+        
+        Returns:
+            Current CompactRoadGraph
+        """
+        graph = self._graph
+        if graph is not None and (self._pinned or time.monotonic() - self._last_check < self.check_interval):
+            return graph
+        
+        if not self._lock.acquire(blocking=graph is None):
+            # Another request is refreshing: keep serving the current graph meanwhile
+            return graph
+        try:
+            # Another request may have refreshed while we waited for the lock
+            if self._graph is not None and time.monotonic() - self._last_check < self.check_interval:
+                return self._graph
+            
+            fingerprint = self._read_fingerprint(db)
+            if self._graph is None or fingerprint != self._fingerprint:
+                version = self.version
+                self._refresh(db, fingerprint)
+                if self.version != version:
+                    prune_graph_versions(self.version)
+            self._last_check = time.monotonic()
+            return self._graph
+        finally:
+            self._lock.release()
+    
+    def invalidate(self):
+        """Force a full reload on the next get_graph call"""
+        with self._lock:
+            self._graph = None
+            self._records = {}
+            self._fingerprint = None
+            self._pinned = False
+    
+    def load_snapshot(self, path: Path, verify: bool = settings.ROUTING_GRAPH_SNAPSHOT_VERIFY) -> bool:
+        """
+        Use an offline-built graph snapshot (and its travel time profiles)
+        
+        Args:
+            path: Snapshot directory written by build_graph_snapshot.py
+            verify: Check the snapshot checksum first
+        
+        Returns:
+            True if loaded; on failure the graph is built from RoadSegment as usual
+        """
+        started = time.perf_counter()
+        try:
+            graph = load_graph(path, verify=verify)
+            profiles = load_profiles(path, graph)
+            fingerprint = read_meta(path).get('fingerprint')
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Warning: Could not load graph snapshot {path}: {e}")
+            return False
+        
+        with self._lock:
+            self._graph = graph
+            self._records = {}
+            self._pinned = fingerprint is None
+            self._fingerprint = None if fingerprint is None else (
+                fingerprint[0],
+                datetime.fromisoformat(fingerprint[1]) if fingerprint[1] else None
+            )
+            self._last_check = time.monotonic()
+        if profiles is not None:
+            set_travel_time_profiles(profiles)
+        print(
+            f"🗺️  Road graph loaded from snapshot: {graph.num_nodes} segments "
+            f"(version {graph.version}, {(time.perf_counter() - started) * 1000:.0f} ms)"
+        )
+        return True
+    
+    def _read_fingerprint(self, db: Session) -> Tuple[int, Optional[datetime]]:
+        """Row count and latest dateModified of RoadSegment"""
+        count, max_modified = db.query(
+            func.count(RoadSegment.id),
+            func.max(RoadSegment.dateModified)
+        ).one()
+        return int(count or 0), max_modified
+    
+    def _refresh(self, db: Session, fingerprint: Tuple[int, Optional[datetime]]):
+        """Attach the shared snapshot of the new version, or rebuild the graph"""
+        if not settings.ROUTING_SHARED_GRAPH:
+            self._rebuild(db, fingerprint)
+            return
+        
+        path = snapshot_path(self._make_version(fingerprint))
+        try:
+            # Only a process without a graph has to wait for another's build
+            claimed = claim_build(path, timeout=settings.ROUTING_REQUEST_TIMEOUT if self._graph is None else 0.0)
+        except SnapshotPending:
+            if self._graph is None:
+                raise
+            print(f"🗺️  Road graph {path.name} is being built by another worker, serving version {self.version}")
+            return
+        if claimed:
+            try:
+                self._rebuild(db, fingerprint)
+                save_graph(self._graph, path)
+            except OSError as e:
+                print(f"⚠️ Warning: Could not write graph snapshot {path}: {e}")
+                return
+            finally:
+                release_build(path)
+        try:
+            graph = load_graph(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Warning: Could not attach graph snapshot {path}: {e}")
+            if self._fingerprint != fingerprint:
+                self._rebuild(db, fingerprint)
+            return
+        
+        # Records are only needed for incremental patches, which the builder makes
+        if self._fingerprint != fingerprint:
+            self._records = {}
+            self._fingerprint = fingerprint
+        self._graph = graph
+        print(f"🗺️  Road graph attached: {graph.num_nodes} segments (version {graph.version}, shared)")
+    
+    def _rebuild(self, db: Session, fingerprint: Tuple[int, Optional[datetime]]):
+        """Patch or reload the cached records, then rebuild the graph"""
+        count, max_modified = fingerprint
+        previous = self._fingerprint
+        
+        patched = False
+        if self._records and previous is not None and previous[1] is not None and count >= len(self._records):
+            # Incremental: only rows touched since the last watermark
+            changed = db.query(RoadSegment).filter(RoadSegment.dateModified > previous[1]).all()
+            for segment in changed:
+                self._records[segment.id] = segment_record(segment)
+            patched = len(self._records) == count
+        
+        if not patched:
+            self._records = {
+                segment.id: segment_record(segment)
+                for segment in db.query(RoadSegment).all()
+            }
+        
+        self._fingerprint = fingerprint
+        self._graph = build_road_graph(self._records, version=self._make_version(fingerprint))
+        self.rebuild_count += 1
+        print(
+            f"🗺️  Road graph {'patched' if patched else 'built'}: "
+            f"{len(self._records)} segments (version {self._graph.version})"
+        )
+    
+    @staticmethod
+    def _make_version(fingerprint: Tuple[int, Optional[datetime]]) -> str:
+        """Stable version stamp derived from the RoadSegment fingerprint"""
+        count, max_modified = fingerprint
+        stamp = f"{count}|{max_modified.isoformat() if max_modified else ''}"
+        return hashlib.sha1(stamp.encode('utf-8')).hexdigest()[:12]
+
+
+# Singleton instance
+_graph_cache = RoadGraphCache()
+
+
+def get_graph_cache() -> RoadGraphCache:
+    """Get the process-wide road graph cache"""
+    return _graph_cache
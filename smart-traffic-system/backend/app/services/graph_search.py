@@ -0,0 +1,132 @@
+"""
+Graph Search Primitives
+One-to-all and one-to-many shortest paths over CSR arrays
+"""
+
+import heapq
+from typing import Tuple, Optional
+
+import numpy as np
+
+# SciPy's compiled Dijkstra is much faster; fall back to pure Python without it
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as _csgraph_dijkstra
+    SCIPY_AVAILABLE = True
+except ImportError:
+    csr_matrix = None
+    _csgraph_dijkstra = None
+    SCIPY_AVAILABLE = False
+
+# csgraph treats explicit zeros as missing edges
+_MIN_EDGE_WEIGHT = 1e-9
+
+
+def reverse_csr(
+    offsets: np.ndarray,
+    targets: np.ndarray,
+    weights: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Transpose a CSR graph (incoming edges become outgoing)
+    
+    Returns:
+        (offsets, targets, weights) of the reversed graph
+    """
+    num_nodes = len(offsets) - 1
+    sources = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(offsets))
+    order = np.argsort(targets, kind='stable')
+    reversed_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(targets, minlength=num_nodes), out=reversed_offsets[1:])
+    return reversed_offsets, sources[order].astype(np.int32), weights[order]
+
+
+def one_to_all(
+    offsets: np.ndarray,
+    targets: np.ndarray,
+    weights: np.ndarray,
+    source: int,
+    limit: float = np.inf,
+    matrix=None
+) -> np.ndarray:
+    """
+    Dijkstra distances from one node to every node
+    
+    Args:
+        offsets, targets, weights: CSR graph with non-negative weights
+        source: Source node ID
+        limit: Stop exploring beyond this distance
+        matrix: Optional prebuilt SciPy matrix (see to_scipy_matrix)
+    
+    Returns:
+        float64 distance array, np.inf where unreachable (or beyond limit)
+    """
+    num_nodes = len(offsets) - 1
+    if SCIPY_AVAILABLE:
+        if matrix is None:
+            matrix = to_scipy_matrix(offsets, targets, weights)
+        return _csgraph_dijkstra(matrix, directed=True, indices=source, limit=limit)
+    
+    distances = np.full(num_nodes, np.inf)
+    distances[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        start, end = offsets[node], offsets[node + 1]
+        for neighbor, weight in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+            candidate = distance + weight
+            if candidate < distances[neighbor] and candidate <= limit:
+                distances[neighbor] = candidate
+                heapq.heappush(heap, (candidate, neighbor))
+    return distances
+
+
+def one_to_many(
+    offsets: np.ndarray,
+    targets: np.ndarray,
+    weights: np.ndarray,
+    sources: np.ndarray,
+    columns: Optional[np.ndarray] = None,
+    matrix=None,
+    chunk_size: int = 32
+) -> np.ndarray:
+    """
+    Dijkstra distances from several sources
+    
+    Args:
+        offsets, targets, weights: CSR graph with non-negative weights
+        sources: Source node IDs
+        columns: Only keep distances to these nodes (default: all nodes)
+        matrix: Optional prebuilt SciPy matrix (see to_scipy_matrix)
+        chunk_size: Sources per SciPy call (bounds the full-width intermediate)
+    
+    Returns:
+        float64 array (len(sources), len(columns)), np.inf where unreachable
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    num_columns = len(offsets) - 1 if columns is None else len(columns)
+    result = np.full((len(sources), num_columns), np.inf)
+    if SCIPY_AVAILABLE and matrix is None:
+        matrix = to_scipy_matrix(offsets, targets, weights)
+    
+    for start in range(0, len(sources), chunk_size):
+        chunk = sources[start:start + chunk_size]
+        if SCIPY_AVAILABLE:
+            distances = np.atleast_2d(_csgraph_dijkstra(matrix, directed=True, indices=chunk))
+        else:
+            distances = np.vstack([one_to_all(offsets, targets, weights, int(source)) for source in chunk])
+        result[start:start + len(chunk)] = distances if columns is None else distances[:, columns]
+    return result
+
+
+def to_scipy_matrix(offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray) -> Optional[object]:
+    """SciPy CSR matrix view of the graph for repeated searches (None without SciPy)"""
+    if not SCIPY_AVAILABLE:
+        return None
+    num_nodes = len(offsets) - 1
+    return csr_matrix(
+        (np.maximum(weights.astype(np.float64), _MIN_EDGE_WEIGHT), targets, offsets),
+        shape=(num_nodes, num_nodes)
+    )
@@ -0,0 +1,276 @@
+"""
+Road Graph Snapshots
+Compiled graph arrays and derived routing tables written once per graph
+version as uncompressed .npy files and memory-mapped read-only, so all
+worker processes on a host share one copy through the page cache
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.compact_graph import CompactRoadGraph, COORDINATE_KEYS, LIMIT_KEYS
+from app.services.segment_geometry import SegmentGeometry
+from app.services.travel_time_profiles import TravelTimeProfiles
+
+SNAPSHOT_FORMAT = 1
+
+GRAPH_ARRAYS = (
+    'segment_ids', 'offsets', 'targets', 'weights',
+    'max_speed', 'lanes', 'road_class', 'name_codes'
+) + COORDINATE_KEYS + ('vehicle_types',) + LIMIT_KEYS
+GEOMETRY_ARRAYS = ('start', 'end', 'line_offsets', 'line_coords')
+PROFILE_ARRAYS = ('rows', 'pace')
+
+
+class SnapshotPending(RuntimeError):
+    """A snapshot or precomputation this request needs is still being built elsewhere"""
+
+
+def array_checksum(path: Path) -> str:
+    """SHA-256 over the names and bytes of a snapshot's .npy files"""
+    digest = hashlib.sha256()
+    for file in sorted(path.glob('*.npy')):
+        digest.update(file.name.encode('utf-8'))
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def save_arrays(path: Path, arrays: Dict[str, np.ndarray], meta: Optional[Dict] = None):
+    """
+    Write arrays as .npy files plus meta.json into a directory
+    
+    The files are staged in a temporary sibling directory that is renamed
+    into place, so readers never see a partial snapshot. If another
+    process wins the rename, its copy is kept. meta.json records the
+    checksum of the arrays (see array_checksum).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{path.name}.", dir=path.parent))
+    try:
+        for name, array in arrays.items():
+            np.save(staging / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+        meta = {**(meta or {}), 'checksum': array_checksum(staging)}
+        (staging / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
+        try:
+            os.rename(staging, path)
+        except OSError:
+            if not path.exists():
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def load_arrays(path: Path, mmap: bool = True, verify: bool = False) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Arrays and metadata written by save_arrays
+    
+    With mmap the arrays are read-only views of the files: pages are
+    loaded on first touch and shared with every other process mapping
+    the same snapshot.
+    
+    Raises:
+        ValueError: verify is set and the arrays do not match the recorded checksum
+    """
+    meta = read_meta(path)
+    if verify and meta.get('checksum') != array_checksum(path):
+        raise ValueError(f"Snapshot {path} does not match its checksum")
+    arrays = {
+        file.stem: np.asarray(np.load(file, mmap_mode='r' if mmap else None, allow_pickle=False))
+        for file in path.glob('*.npy')
+    }
+    return arrays, meta
+
+
+def read_meta(path: Path) -> Dict:
+    """meta.json of a snapshot"""
+    return json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+
+
+def snapshot_path(version: str) -> Path:
+    """Directory of the snapshot of a graph version"""
+    return Path(settings.ROUTING_CACHE_DIR) / f"graph_{version}"
+
+
+def prune_snapshots(pattern: str, keep: Iterable[Path], min_age: float = 0.0) -> int:
+    """
+    Delete snapshots in ROUTING_CACHE_DIR matching a glob pattern
+    
+    Processes that memory-mapped a deleted snapshot keep reading it until
+    they drop it; only new loads need the snapshots in `keep`. Files
+    modified less than `min_age` seconds ago are left alone, since another
+    process may have just written them.
+    
+    Returns:
+        Number of snapshots deleted
+    """
+    keep = {Path(path) for path in keep}
+    deleted = 0
+    for path in Path(settings.ROUTING_CACHE_DIR).glob(pattern):
+        if path in keep or path.name.endswith('.lock'):
+            continue
+        try:
+            if time.time() - path.stat().st_mtime < min_age:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+def prune_graph_versions(version: str, min_age: float = settings.ROUTING_SHARED_GRAPH_WAIT) -> int:
+    """
+    Delete graph snapshots, landmark tables and hierarchies of other graph versions
+    
+    Only names carrying a RoadGraphCache version stamp are considered, so
+    an offline snapshot (ROUTING_GRAPH_SNAPSHOT, graph_snapshot) is kept.
+    Files younger than `min_age` seconds may belong to a worker that has
+    not seen the new version yet and are left alone.
+    """
+    cache_dir = Path(settings.ROUTING_CACHE_DIR)
+    keep = [Path(settings.ROUTING_GRAPH_SNAPSHOT)] if settings.ROUTING_GRAPH_SNAPSHOT else []
+    deleted = 0
+    for prefix in ('graph_', 'landmarks_', 'cch_'):
+        current = list(cache_dir.glob(f"{prefix}{version}*"))
+        deleted += prune_snapshots(f"{prefix}{'[0-9a-f]' * 12}*", keep + current, min_age)
+    return deleted
+
+
+def save_graph(
+    graph: CompactRoadGraph,
+    path: Path,
+    profiles: Optional[TravelTimeProfiles] = None,
+    meta: Optional[Dict] = None
+):
+    """
+    Write a graph's arrays, geometry and string tables as a snapshot
+    
+    Args:
+        graph: Road graph
+        path: Snapshot directory
+        profiles: Travel time profiles of the graph to store alongside it
+        meta: Extra metadata (e.g. the RoadSegment fingerprint it was built from)
+    """
+    arrays = {name: getattr(graph, name) for name in GRAPH_ARRAYS}
+    if graph.geometry is not None:
+        arrays.update({f'geometry_{name}': getattr(graph.geometry, name) for name in GEOMETRY_ARRAYS})
+    if profiles is not None:
+        arrays.update({f'profile_{name}': getattr(profiles, name) for name in PROFILE_ARRAYS})
+    save_arrays(path, arrays, {
+        **(meta or {}),
+        'format': SNAPSHOT_FORMAT,
+        'version': graph.version,
+        'num_nodes': graph.num_nodes,
+        'num_edges': graph.num_edges,
+        'road_classes': graph.road_classes,
+        'names': graph.names,
+        'observed_segments': profiles.observed_segments if profiles is not None else None
+    })
+
+
+def load_graph(path: Path, mmap: bool = True, verify: bool = False) -> CompactRoadGraph:
+    """
+    Graph from a snapshot written by save_graph
+    
+    Raises:
+        ValueError: Snapshot of another format, with inconsistent arrays
+            or (with verify) not matching its checksum
+    """
+    arrays, meta = load_arrays(path, mmap, verify)
+    if meta.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported graph snapshot format {meta.get('format')} in {path}")
+    if len(arrays['offsets']) != meta['num_nodes'] + 1 or len(arrays['targets']) != meta['num_edges']:
+        raise ValueError(f"Graph snapshot {path} does not match its metadata")
+    
+    geometry = None
+    if 'geometry_start' in arrays:
+        geometry = SegmentGeometry(*(arrays[f'geometry_{name}'] for name in GEOMETRY_ARRAYS))
+    return CompactRoadGraph(
+        segment_ids=arrays['segment_ids'],
+        offsets=arrays['offsets'],
+        targets=arrays['targets'],
+        weights=arrays['weights'],
+        max_speed=arrays['max_speed'],
+        lanes=arrays['lanes'],
+        road_class=arrays['road_class'],
+        road_classes=meta['road_classes'],
+        name_codes=arrays['name_codes'],
+        names=meta['names'],
+        coordinates={key: arrays[key] for key in COORDINATE_KEYS},
+        version=meta['version'],
+        geometry=geometry,
+        restrictions={key: arrays[key] for key in ('vehicle_types',) + LIMIT_KEYS}
+    )
+
+
+def load_profiles(path: Path, graph: CompactRoadGraph, mmap: bool = True) -> Optional[TravelTimeProfiles]:
+    """Travel time profiles stored with a graph snapshot (None if it has none)"""
+    arrays, meta = load_arrays(path, mmap)
+    if 'profile_pace' not in arrays:
+        return None
+    if meta.get('version') != graph.version or len(arrays['profile_rows']) != graph.num_nodes:
+        raise ValueError(f"Profiles in {path} do not belong to graph version {graph.version}")
+    return TravelTimeProfiles(graph, arrays['profile_rows'], arrays['profile_pace'], meta.get('observed_segments') or 0)
+
+
+def claim_build(
+    path: Path,
+    wait: float = settings.ROUTING_SHARED_GRAPH_WAIT,
+    timeout: float = settings.ROUTING_REQUEST_TIMEOUT
+) -> bool:
+    """
+    Decide whether this process builds a snapshot or waits for another's
+    
+    The first process to create `<path>.lock` builds. The others poll
+    until the snapshot appears, for at most `timeout` seconds, so a
+    request never outlives its own deadline waiting. A lock released or
+    older than `wait` seconds (e.g. the builder crashed) is taken over.
+    
+    Returns:
+        True if the caller should build (and then call release_build),
+        False once the snapshot exists
+    
+    Raises:
+        SnapshotPending: Another process still holds the lock after `timeout` seconds
+    """
+    lock = path.with_name(path.name + '.lock')
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while not path.exists():
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            if time.time() - lock.stat().st_mtime > wait:
+                lock.unlink()
+                continue
+        except FileNotFoundError:
+            continue
+        if time.monotonic() >= deadline:
+            raise SnapshotPending(f"{path.name} is still being built by another worker, retry shortly")
+        time.sleep(0.2)
+    return False
+
+
+def release_build(path: Path):
+    """Drop the lock taken by claim_build"""
+    try:
+        path.with_name(path.name + '.lock').unlink()
+    except FileNotFoundError:
+        pass
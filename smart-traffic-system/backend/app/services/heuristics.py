@@ -0,0 +1,83 @@
+"""
+Routing Heuristics
+Admissible A* lower bounds on remaining travel time (minutes)
+"""
+
+import numpy as np
+
+from app.services.compact_graph import CompactRoadGraph
+from app.services.spatial_index import haversine_km
+
+
+class ZeroHeuristic:
+    """No estimate (plain Dijkstra)"""
+    
+    def __call__(self, nodes: np.ndarray) -> np.ndarray:
+        return np.zeros(len(nodes), dtype=np.float64)
+
+
+def segment_chord_km(graph: CompactRoadGraph) -> np.ndarray:
+    """Great-circle distance (km) between each segment's endpoints (0 if unknown)"""
+    def build() -> np.ndarray:
+        chord = haversine_km(
+            graph.start_lat.astype(np.float64), graph.start_lon.astype(np.float64),
+            graph.end_lat.astype(np.float64), graph.end_lon.astype(np.float64)
+        )
+        return np.where(np.isnan(chord), 0.0, chord)
+    
+    return graph.get_precomputed('segment_chord_km', build)
+
+
+class GeoHeuristic:
+    """
+    Straight-line travel time to the goal at the network's top speed
+    
+    An edge u -> v costs u's length, so a route from a segment to the goal
+    still drives the whole segment, at least as far as its endpoints are
+    apart, and then at least the great-circle distance from one of its
+    endpoints to one of the goal's. No edge is cheaper than its length at
+    the highest maximumAllowedSpeed in the network, so the estimate never
+    overshoots.
+    
+    Counting the segment itself also keeps the estimate consistent (along
+    any edge it drops by at most the edge's cost), which searches that
+    never reopen settled nodes rely on. The closest-endpoint distance
+    alone is not: a long two-way segment whose far end lies near the goal
+    looks closer than the short segment leading into it.
+    
+    With reverse, `goal` is the route's origin instead and the estimate
+    bounds the cost from it to each segment, which drives the origin (for
+    D* Lite). Segments with unknown coordinates get 0.
+    """
+    
+    def __init__(self, graph: CompactRoadGraph, goal: int, reverse: bool = False):
+        self.graph = graph
+        self.goal = goal
+        self.max_speed = max(graph.max_network_speed, 1.0)
+        self.goal_lat = np.array([graph.start_lat[goal], graph.end_lat[goal]], dtype=np.float64)
+        self.goal_lon = np.array([graph.start_lon[goal], graph.end_lon[goal]], dtype=np.float64)
+        self.chord = segment_chord_km(graph)
+        self.reverse = reverse
+    
+    def __call__(self, nodes: np.ndarray) -> np.ndarray:
+        """Lower bounds (minutes) for an array of node IDs"""
+        graph = self.graph
+        # (k, 2 node endpoints, 1) against (2 goal endpoints,) in one broadcast call
+        node_lat = np.stack([graph.start_lat[nodes], graph.end_lat[nodes]], axis=-1)[..., None]
+        node_lon = np.stack([graph.start_lon[nodes], graph.end_lon[nodes]], axis=-1)[..., None]
+        distance = haversine_km(node_lat, node_lon, self.goal_lat, self.goal_lon)
+        best = np.where(np.isnan(distance), np.inf, distance).reshape(len(nodes), 4).min(axis=1, initial=np.inf)
+        best[~np.isfinite(best)] = 0.0
+        driven = self.chord[self.goal] if self.reverse else self.chord[nodes]
+        best = np.where(nodes == self.goal, 0.0, best + driven)
+        return best / self.max_speed * 60.0
+
+
+class MaxHeuristic:
+    """Pointwise maximum of several admissible heuristics (still admissible)"""
+    
+    def __init__(self, *heuristics):
+        self.heuristics = heuristics
+    
+    def __call__(self, nodes: np.ndarray) -> np.ndarray:
+        return np.maximum.reduce([heuristic(nodes) for heuristic in self.heuristics])
@@ -0,0 +1,505 @@
+"""
+Incident Interval Index
+CityWork zones and RoadAccidents indexed by segment and time interval, so
+route costs can use the incidents active at each segment's arrival time
+"""
+
+import bisect
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.city_work import CityWork
+from app.models.road_accident import RoadAccident
+from app.services.compact_graph import CompactRoadGraph
+from app.services.road_graph import parse_geojson_coordinates
+from app.services.spatial_index import SegmentGrid
+from app.services.vehicle_profiles import (
+    ALL_VEHICLE_TYPES,
+    VehicleProfile,
+    incident_blocks,
+    parse_limit,
+    vehicle_type_mask,
+    vehicle_type_names
+)
+
+ACTIVE_WORK_STATES = ('open', 'authorized', 'planned')
+ACTIVE_ACCIDENT_STATES = ('onGoing',)
+
+
+def incident_penalty(incidents: List[Dict]) -> float:
+    """Cost multiplier for the incidents active on a segment"""
+    penalty = 1.0
+    for incident in incidents:
+        if incident['type'] == 'accident':
+            # Severe penalty for accidents
+            penalty *= (1.5 + incident.get('severity', 1) * 0.1)
+        elif incident['type'] == 'construction':
+            # Moderate penalty for construction
+            penalty *= 1.3
+    return penalty
+
+
+def _impacted_segments(road_impacted: Optional[str]) -> List[str]:
+    """Segment IDs in CityWork.roadImpacted (JSON array or a single ID)"""
+    if not road_impacted:
+        return []
+    try:
+        value = json.loads(road_impacted)
+    except (json.JSONDecodeError, TypeError):
+        value = road_impacted
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if item is not None and str(item).strip()]
+
+
+def _geometry_lines(geojson_text: Optional[str]) -> List[List[Tuple[float, float]]]:
+    """
+    Parts of a GeoJSON geometry as (lon, lat) lines
+    
+    A Point is a one-position line, polygon rings are closed lines. Empty
+    if the text is missing or cannot be parsed.
+    """
+    if not geojson_text:
+        return []
+    try:
+        coordinates = json.loads(geojson_text)['coordinates']
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return []
+    
+    lines = []
+    stack = [coordinates]
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, (list, tuple)) or not item:
+            continue
+        if isinstance(item[0], (int, float)):
+            lines.append([(float(item[0]), float(item[1]))])
+        elif isinstance(item[0], (list, tuple)) and item[0] and isinstance(item[0][0], (int, float)):
+            lines.append([(float(position[0]), float(position[1])) for position in item])
+        else:
+            stack.extend(reversed(item))
+    return lines
+
+
+def work_record(work: CityWork) -> Optional[Dict]:
+    """
+    Snapshot of a CityWork row as an incident (None if it does not affect routing)
+    
+    roadImpacted is free-form JSON that does not always hold segment IDs,
+    so the record also keeps the location geometry to match against
+    segments when the IDs are unknown to the graph.
+    """
+    segments = _impacted_segments(work.roadImpacted)
+    lines = _geometry_lines(work.location)
+    if work.workState not in ACTIVE_WORK_STATES or not (segments or lines) or not work.startDate or not work.endDate:
+        return None
+    return {
+        'segments': segments,
+        'lines': lines,
+        'start': work.startDate,
+        'end': work.endDate,
+        'incident': {
+            'type': 'construction',
+            'id': work.id,
+            'start': work.startDate,
+            'end': work.endDate,
+            'state': work.workState,
+            **_work_restrictions(work)
+        }
+    }
+
+
+def _work_restrictions(work: CityWork) -> Dict:
+    """Vehicle types and tonnage still allowed through a work zone (only the restricting ones)"""
+    restrictions = {}
+    allowed = vehicle_type_mask(work.allowedVehicle)
+    if allowed != ALL_VEHICLE_TYPES:
+        restrictions['allowed_vehicles'] = vehicle_type_names(allowed)
+    tonnage = parse_limit(work.maxAuthorizedTonnage)
+    if tonnage is not None:
+        restrictions['max_tonnage'] = tonnage
+    return restrictions
+
+
+def accident_record(accident: RoadAccident) -> Optional[Dict]:
+    """
+    Snapshot of a RoadAccident row as an incident (None if it does not affect routing)
+    
+    RoadAccident has no segment reference, so the record keeps its location
+    and is snapped to the nearest segment (see IncidentIndexCache). It is
+    active from accidentDate for ROUTING_ACCIDENT_CLEARANCE_MIN minutes.
+    """
+    positions = parse_geojson_coordinates(accident.location)
+    if accident.status not in ACTIVE_ACCIDENT_STATES or not positions or not accident.accidentDate:
+        return None
+    severity = 1
+    if accident.totalInjured:
+        severity += 1
+    if accident.totalDeadPeopleWithin24Hours:
+        severity += 2
+    end = accident.accidentDate + timedelta(minutes=settings.ROUTING_ACCIDENT_CLEARANCE_MIN)
+    return {
+        'point': positions[0],     # (lon, lat)
+        'start': accident.accidentDate,
+        'end': end,
+        'incident': {
+            'type': 'accident',
+            'id': accident.id,
+            'start': accident.accidentDate,
+            'end': end,
+            'state': accident.status,
+            'severity': severity
+        }
+    }
+
+
+class IncidentIndex:
+    """
+    Incidents of one refresh, as piecewise-constant state per segment
+    
+    Each segment's incident start/end times split the timeline into
+    elementary intervals; for each one the active incidents and their
+    combined penalty are precomputed, so a point-in-time query is one
+    binary search. Intervals are half-open, [start, end).
+    """
+    
+    def __init__(
+        self,
+        graph: CompactRoadGraph,
+        intervals: Dict[str, List[Tuple[float, float, Dict]]],
+        version: str
+    ):
+        self.graph = graph
+        self.version = version
+        self._times: Dict[str, List[float]] = {}
+        self._states: Dict[str, List[Tuple[float, Tuple[Dict, ...]]]] = {}
+        breakpoints = set()
+        
+        for segment_id, spans in intervals.items():
+            times = sorted({start for start, _, _ in spans} | {end for _, end, _ in spans})
+            states = []
+            for t in times[:-1]:
+                active = tuple(incident for start, end, incident in spans if start <= t < end)
+                states.append((incident_penalty(list(active)), active))
+            self._times[segment_id] = times
+            self._states[segment_id] = states
+            breakpoints.update(times)
+        
+        # Penalty arrays only change at these instants
+        self._breakpoints = sorted(breakpoints)
+        self._nodes = {
+            segment_id: node for segment_id in intervals
+            for node in [graph.index_of(segment_id)] if node is not None
+        }
+        self._node_set = set(self._nodes.values())
+        self._arrays: 'OrderedDict[int, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _state(self, segment_id: str, at: datetime) -> Optional[Tuple[float, Tuple[Dict, ...]]]:
+        return self._state_at(segment_id, at.timestamp())
+    
+    def _state_at(self, segment_id: str, timestamp: float) -> Optional[Tuple[float, Tuple[Dict, ...]]]:
+        times = self._times.get(segment_id)
+        if times is None:
+            return None
+        i = bisect.bisect_right(times, timestamp) - 1
+        if i < 0 or i >= len(times) - 1:
+            return None
+        return self._states[segment_id][i]
+    
+    def active(self, segment_id: str, at: datetime) -> List[Dict]:
+        """Incidents on a segment at a time"""
+        state = self._state(segment_id, at)
+        return list(state[1]) if state else []
+    
+    def penalty(self, segment_id: str, at: datetime) -> float:
+        """Cost multiplier of a segment at a time (1.0 without incidents)"""
+        state = self._state(segment_id, at)
+        return state[0] if state else 1.0
+    
+    def active_map(self, at: datetime) -> Dict[str, List[Dict]]:
+        """Segment ID -> incidents active at a time"""
+        result = {}
+        for segment_id in self._times:
+            incidents = self.active(segment_id, at)
+            if incidents:
+                result[segment_id] = incidents
+        return result
+    
+    def penalty_array(self, at: datetime) -> np.ndarray:
+        """Per-node multipliers at a time (shared, do not modify)"""
+        epoch = bisect.bisect_right(self._breakpoints, at.timestamp())
+        with self._lock:
+            penalty = self._arrays.get(epoch)
+            if penalty is not None:
+                self._arrays.move_to_end(epoch)
+                return penalty
+        
+        penalty = np.ones(self.graph.num_nodes)
+        for segment_id, node in self._nodes.items():
+            penalty[node] = self.penalty(segment_id, at)
+        with self._lock:
+            self._arrays[epoch] = penalty
+            while len(self._arrays) > 8:
+                self._arrays.popitem(last=False)
+        return penalty
+    
+    def closed_nodes(self, profile: VehicleProfile, at: datetime) -> List[int]:
+        """Nodes whose incidents active at a time exclude a vehicle (work zone vehicle/tonnage limits)"""
+        return [
+            node for segment_id, node in self._nodes.items()
+            if any(incident_blocks(incident, profile) for incident in self.active(segment_id, at))
+        ]
+    
+    def penalty_matrix(self, nodes: np.ndarray, timestamps: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Multipliers of nodes (rows) at many times (columns, Unix seconds)
+        
+        Returns None when none of the nodes has incidents, which is the
+        common case and lets callers skip the penalty term.
+        """
+        segments = [(row, self.graph.segment_id(node)) for row, node in enumerate(nodes.tolist())
+                    if node in self._node_set]
+        if not segments:
+            return None
+        penalty = np.ones((len(nodes), len(timestamps)))
+        stamps = timestamps.tolist()
+        for row, segment_id in segments:
+            for column, timestamp in enumerate(stamps):
+                state = self._state_at(segment_id, timestamp)
+                if state:
+                    penalty[row, column] = state[0]
+        return penalty
+    
+    def __len__(self) -> int:
+        return len(self._times)
+
+
+class IncidentIndexCache:
+    """
+    Holds the incident index for the current road graph
+    
+    Only rows that can still matter are loaded: work zones that ended at
+    most ROUTING_INCIDENT_LOOKBACK_HOURS ago, and accidents whose
+    clearance window ended within that time. Staleness is probed with
+    COUNT/MAX(dateModified) over those rows at most every
+    ROUTING_INCIDENT_CHECK_INTERVAL seconds. When dateModified moved, the
+    modified rows are re-read and merged into the cached records, and
+    records that left the window are dropped; if the cached records then
+    no longer match the row count (deleted rows, rows without
+    dateModified), the table is reloaded.
+    
+    Incidents are matched to segments once per row and graph: accidents
+    snap to the nearest segment LineString within
+    ROUTING_ACCIDENT_MATCH_RADIUS_M, and work zones whose roadImpacted IDs
+    are not in the graph take every segment within
+    ROUTING_WORK_MATCH_RADIUS_M of their location. Only new or modified
+    rows are matched on a refresh.
+    """
+    
+    def __init__(self, check_interval: float = settings.ROUTING_INCIDENT_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index: Optional[IncidentIndex] = None
+        self._records: Dict[Tuple[str, str], Optional[Dict]] = {}
+        self._expiry: Dict[Tuple[str, str], datetime] = {}
+        self._fingerprints: Dict[str, Tuple[int, Optional[datetime]]] = {}
+        self._matches: Dict[Tuple[str, str], List[str]] = {}
+        self._matched_graph: Optional[CompactRoadGraph] = None
+        self._last_check = 0.0
+        self.rebuild_count = 0
+    
+    def get_index(self, db: Session, graph: CompactRoadGraph) -> IncidentIndex:
+        """
+        Get the incident index, refreshing it if incidents or the graph changed
+        
+        Args:
+            db: Database session used for the staleness probe and reloads
+            graph: Current road graph (accidents are matched to its segments)
+        
+        Returns:
+            Current IncidentIndex
+        """
+        index = self._index
+        if (index is not None and index.graph is graph
+                and time.monotonic() - self._last_check < self.check_interval):
+            return index
+        
+        with self._lock:
+            index = self._index
+            if (index is not None and index.graph is graph
+                    and time.monotonic() - self._last_check < self.check_interval):
+                return index
+            
+            cutoff = datetime.now() - timedelta(hours=settings.ROUTING_INCIDENT_LOOKBACK_HOURS)
+            tables = (
+                ('work', CityWork, work_record, CityWork.endDate, cutoff),
+                ('accident', RoadAccident, accident_record, RoadAccident.accidentDate,
+                 cutoff - timedelta(minutes=settings.ROUTING_ACCIDENT_CLEARANCE_MIN))
+            )
+            changed = False
+            try:
+                for name, model, to_record, expiry_column, table_cutoff in tables:
+                    changed |= self._refresh_table(db, name, model, to_record, expiry_column, table_cutoff)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not refresh incidents: {e}")
+            
+            if index is None or changed or index.graph is not graph:
+                self._index = self._build(graph)
+                self.rebuild_count += 1
+            self._last_check = time.monotonic()
+            return self._index
+    
+    def invalidate(self):
+        """Force a full reload on the next get_index call"""
+        with self._lock:
+            self._index = None
+            self._records = {}
+            self._expiry = {}
+            self._fingerprints = {}
+            self._matches = {}
+    
+    def _refresh_table(self, db: Session, name: str, model, to_record, expiry_column, cutoff: datetime) -> bool:
+        """
+        Patch or reload one table's records; True if anything changed
+        
+        Args:
+            expiry_column: Column a row is dropped by once it is before cutoff
+            cutoff: Oldest expiry_column value still loaded
+        """
+        in_window = expiry_column >= cutoff
+        count, max_modified = db.query(func.count(model.id), func.max(model.dateModified)).filter(in_window).one()
+        fingerprint = (int(count or 0), max_modified)
+        previous = self._fingerprints.get(name)
+        if fingerprint == previous:
+            return False
+        
+        for key in [key for key in self._records if key[0] == name and self._expiry[key] < cutoff]:
+            self._forget(key)
+        
+        patched = previous is not None and previous[1] is not None
+        if patched:
+            # Incremental: only rows touched since the last watermark
+            self._merge(name, db.query(model).filter(in_window, model.dateModified > previous[1]).all(),
+                        to_record, expiry_column)
+            patched = sum(key[0] == name for key in self._records) == fingerprint[0]
+        if not patched:
+            for key in [key for key in self._records if key[0] == name]:
+                self._forget(key)
+            self._merge(name, db.query(model).filter(in_window).all(), to_record, expiry_column)
+        
+        self._fingerprints[name] = fingerprint
+        return True
+    
+    def _merge(self, name: str, rows: List, to_record, expiry_column):
+        for row in rows:
+            key = (name, row.id)
+            self._records[key] = to_record(row)
+            self._expiry[key] = getattr(row, expiry_column.key)
+            self._matches.pop(key, None)
+    
+    def _forget(self, key: Tuple[str, str]):
+        del self._records[key]
+        del self._expiry[key]
+        self._matches.pop(key, None)
+    
+    def _build(self, graph: CompactRoadGraph) -> IncidentIndex:
+        """Index the cached records against a graph"""
+        if self._matched_graph is not graph:
+            self._matches = {}
+            self._matched_graph = graph
+        
+        intervals: Dict[str, List[Tuple[float, float, Dict]]] = {}
+        unmatched = 0
+        for key, record in self._records.items():
+            if record is None:
+                continue
+            segments = self._matches.get(key)
+            if segments is None:
+                segments = _match_segments(graph, record)
+                self._matches[key] = segments
+                unmatched += not segments
+            span = (record['start'].timestamp(), record['end'].timestamp())
+            if span[1] <= span[0]:
+                continue
+            for segment_id in segments:
+                intervals.setdefault(segment_id, []).append(span + (record['incident'],))
+        
+        if unmatched:
+            print(f"⚠️ Warning: {unmatched} incidents could not be matched to a road segment")
+        
+        stamp = f"{sorted(self._fingerprints.items(), key=str)}|{graph.version}"
+        return IncidentIndex(graph, intervals, hashlib.sha1(stamp.encode('utf-8')).hexdigest()[:12])
+
+
+def segment_grid(graph: CompactRoadGraph) -> SegmentGrid:
+    """
+    Grid over the graph's segment LineStrings (memoized on the graph)
+    
+    Segments without a LineString are indexed as the straight line from
+    their start to their end point.
+    """
+    def build() -> SegmentGrid:
+        n = graph.num_nodes
+        endpoints = np.stack([graph.start_lon, graph.start_lat, graph.end_lon, graph.end_lat], axis=1).reshape(-1, 2)
+        cell_size_m = max(settings.ROUTING_ACCIDENT_MATCH_RADIUS_M, settings.ROUTING_WORK_MATCH_RADIUS_M)
+        geometry = graph.geometry
+        if geometry is None:
+            return SegmentGrid(np.arange(0, 2 * n + 1, 2), endpoints, cell_size_m)
+        
+        counts = np.diff(geometry.line_offsets)
+        has_line = counts >= 2
+        lengths = np.where(has_line, counts, 2)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        coords = np.empty((offsets[-1], 2), dtype=np.float64)
+        
+        fallback = np.nonzero(~has_line)[0]
+        coords[offsets[fallback]] = endpoints[2 * fallback]
+        coords[offsets[fallback] + 1] = endpoints[2 * fallback + 1]
+        lined = np.nonzero(has_line)[0]
+        steps = np.arange(counts[lined].sum()) - np.repeat(np.cumsum(counts[lined]) - counts[lined], counts[lined])
+        coords[np.repeat(offsets[lined], counts[lined]) + steps] = geometry.line_coords[
+            np.repeat(geometry.line_offsets[lined], counts[lined]) + steps
+        ]
+        return SegmentGrid(offsets, coords, cell_size_m)
+    
+    return graph.get_precomputed('segment_grid', build)
+
+
+def _match_segments(graph: CompactRoadGraph, record: Dict) -> List[str]:
+    """Segment IDs an incident record applies to on a graph"""
+    if 'point' in record:
+        lon, lat = record['point']
+        node = segment_grid(graph).nearest(lat, lon, settings.ROUTING_ACCIDENT_MATCH_RADIUS_M)
+        return [] if node is None else [graph.segment_id(node)]
+    
+    segments = [segment_id for segment_id in record['segments'] if graph.index_of(segment_id) is not None]
+    if segments or not record['lines']:
+        return segments
+    grid = segment_grid(graph)
+    nodes = set()
+    for line in record['lines']:
+        nodes.update(grid.along(line, settings.ROUTING_WORK_MATCH_RADIUS_M).tolist())
+    return [graph.segment_id(node) for node in sorted(nodes)]
+
+
+# Singleton instance
+_incident_cache = IncidentIndexCache()
+
+
+def get_incident_cache() -> IncidentIndexCache:
+    """Get the process-wide incident index cache"""
+    return _incident_cache
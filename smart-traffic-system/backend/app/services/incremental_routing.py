@@ -0,0 +1,328 @@
+"""
+Incremental Rerouting
+D* Lite planners kept per route handle, so a reroute after incidents appear
+only repairs the part of the search the changed edges affect
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.compact_graph import CompactRoadGraph
+from app.services.heuristics import GeoHeuristic
+from app.services.vehicle_profiles import VehicleProfile
+
+INF = float('inf')
+
+
+class DStarLite:
+    """
+    D* Lite over static edge minutes with sparse per-node incident multipliers
+    
+    The search runs backward from the goal (g is the time to the goal), so
+    the vehicle can move along the route without invalidating it. Edge
+    u -> v costs base_minutes[edge] * penalties.get(v, 1.0), the same
+    target-segment multiplier as SmartRoutingService._incident_penalty.
+    When penalties change, only the sources of edges into the affected
+    segments are updated and the queue repairs the values that depend on
+    them.
+    """
+    
+    def __init__(
+        self,
+        graph: CompactRoadGraph,
+        base_minutes: np.ndarray,
+        start: int,
+        goal: int,
+        penalties: Optional[Dict[int, float]] = None
+    ):
+        self.graph = graph
+        self.base_minutes = base_minutes
+        self.penalties: Dict[int, float] = dict(penalties or {})
+        self.start = start
+        self.goal = goal
+        
+        self.g: Dict[int, float] = {}
+        self.rhs: Dict[int, float] = {goal: 0.0}
+        self.km = 0.0
+        self._open: Dict[int, Tuple[float, float]] = {}
+        self._heap: List[Tuple[Tuple[float, float], int]] = []
+        self._estimate = GeoHeuristic(graph, start, reverse=True)
+        self._estimates: Dict[int, float] = {}
+        self.expanded = 0  # nodes expanded by the last compute()
+        
+        self._push(goal)
+    
+    @property
+    def state_size(self) -> int:
+        """Nodes with retained search state"""
+        return len(self.rhs)
+    
+    def _h(self, node: int) -> float:
+        """Lower bound (minutes) from the current start to a node"""
+        value = self._estimates.get(node)
+        if value is None:
+            value = float(self._estimate(np.array([node]))[0])
+            self._estimates[node] = value
+        return value
+    
+    def _key(self, node: int) -> Tuple[float, float]:
+        best = min(self.g.get(node, INF), self.rhs.get(node, INF))
+        return (best + self._h(node) + self.km, best)
+    
+    def _push(self, node: int):
+        key = self._key(node)
+        self._open[node] = key
+        heapq.heappush(self._heap, (key, node))
+    
+    def _top_key(self) -> Tuple[float, float]:
+        # Entries are removed lazily; the live key of a node is the one in _open
+        while self._heap and self._open.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else (INF, INF)
+    
+    def _edge_costs(self, edges: np.ndarray, heads: np.ndarray) -> List[float]:
+        minutes = self.base_minutes[edges].tolist()
+        if not self.penalties:
+            return minutes
+        return [cost * self.penalties.get(head, 1.0) for cost, head in zip(minutes, heads.tolist())]
+    
+    def _update_vertex(self, node: int):
+        if node != self.goal:
+            graph = self.graph
+            edges = np.arange(graph.offsets[node], graph.offsets[node + 1])
+            heads = graph.targets[edges]
+            best = INF
+            for cost, head in zip(self._edge_costs(edges, heads), heads.tolist()):
+                best = min(best, cost + self.g.get(head, INF))
+            if best == INF:
+                self.rhs.pop(node, None)
+            else:
+                self.rhs[node] = best
+        
+        if self.g.get(node, INF) != self.rhs.get(node, INF):
+            self._push(node)
+        else:
+            self._open.pop(node, None)
+    
+    def _predecessors(self, node: int) -> List[int]:
+        reversed_offsets, sources, _ = self.graph.reversed_csr()
+        return sources[reversed_offsets[node]:reversed_offsets[node + 1]].tolist()
+    
+    def compute(self) -> bool:
+        """
+        Repair g values until the start's value is final
+        
+        Returns:
+            True if the goal is reachable from the start
+        """
+        self.expanded = 0
+        while True:
+            top = self._top_key()
+            start_value = self.rhs.get(self.start, INF)
+            if not (top < self._key(self.start) or start_value != self.g.get(self.start, INF)):
+                break
+            if top == (INF, INF):
+                break
+            
+            key, node = heapq.heappop(self._heap)
+            current = self._key(node)
+            if key < current:
+                self._push(node)
+                continue
+            
+            del self._open[node]
+            self.expanded += 1
+            rhs = self.rhs.get(node, INF)
+            if self.g.get(node, INF) > rhs:
+                self.g[node] = rhs
+            else:
+                self.g.pop(node, None)
+                self._update_vertex(node)
+            for predecessor in self._predecessors(node):
+                self._update_vertex(predecessor)
+        
+        return self.g.get(self.start, INF) < INF
+    
+    def move(self, start: int):
+        """Shift the start to the vehicle's current segment"""
+        if start == self.start:
+            return
+        self.km += self._h(start)
+        self.start = start
+        self._estimate = GeoHeuristic(self.graph, start, reverse=True)
+        self._estimates = {}
+    
+    def set_penalties(self, penalties: Dict[int, float]) -> int:
+        """
+        Replace the incident multipliers
+        
+        Returns:
+            Number of edges whose cost changed
+        """
+        changed = [
+            node for node in set(self.penalties) | set(penalties)
+            if self.penalties.get(node, 1.0) != penalties.get(node, 1.0)
+        ]
+        self.penalties = dict(penalties)
+        
+        updated = 0
+        for node in changed:
+            predecessors = self._predecessors(node)
+            updated += len(predecessors)
+            for predecessor in predecessors:
+                self._update_vertex(predecessor)
+        return updated
+    
+    def path(self) -> Optional[Tuple[List[int], List[float]]]:
+        """
+        Current route from start to goal
+        
+        Returns:
+            (node IDs, cumulative minutes at each node), or None if unreachable
+        """
+        graph = self.graph
+        node = self.start
+        if self.g.get(node, INF) == INF:
+            return None
+        
+        nodes, minutes = [node], [0.0]
+        while node != self.goal and len(nodes) <= graph.num_nodes:
+            edges = np.arange(graph.offsets[node], graph.offsets[node + 1])
+            heads = graph.targets[edges]
+            best, best_cost, best_head = INF, 0.0, None
+            for cost, head in zip(self._edge_costs(edges, heads), heads.tolist()):
+                if cost + self.g.get(head, INF) < best:
+                    best, best_cost, best_head = cost + self.g.get(head, INF), cost, head
+            if best_head is None:
+                return None
+            node = best_head
+            nodes.append(node)
+            minutes.append(minutes[-1] + best_cost)
+        return nodes, minutes
+
+
+class RouteSession:
+    """A route handed out by /find-route, with its reroute planner once built"""
+    
+    def __init__(
+        self,
+        route_id: str,
+        origin: str,
+        destination: str,
+        path: List[str],
+        vehicle: Optional[VehicleProfile] = None
+    ):
+        self.route_id = route_id
+        self.origin = origin
+        self.destination = destination
+        self.path = path
+        self.vehicle = vehicle
+        self.planner: Optional[DStarLite] = None
+        self.graph_version: Optional[str] = None
+        self.cost_bucket: Optional[int] = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class RouteSessionStore:
+    """
+    Route handles with bounded retained state
+    
+    At most ROUTING_REROUTE_MAX_SESSIONS handles are kept (least recently
+    used evicted first) and unused handles expire after
+    ROUTING_REROUTE_SESSION_TTL seconds. Planners whose search state grows
+    past ROUTING_REROUTE_MAX_STATE_NODES are dropped after use and rebuilt
+    on the next reroute. Base edge minutes are shared by all planners on
+    the same graph version and departure bucket.
+    """
+    
+    def __init__(
+        self,
+        max_sessions: int = settings.ROUTING_REROUTE_MAX_SESSIONS,
+        ttl: float = settings.ROUTING_REROUTE_SESSION_TTL,
+        max_state_nodes: int = settings.ROUTING_REROUTE_MAX_STATE_NODES
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_state_nodes = max_state_nodes
+        self._lock = threading.Lock()
+        self._sessions: 'OrderedDict[str, RouteSession]' = OrderedDict()
+        self._base_minutes: 'OrderedDict[Tuple[Optional[str], int], np.ndarray]' = OrderedDict()
+    
+    def create(
+        self,
+        origin: str,
+        destination: str,
+        path: List[str],
+        vehicle: Optional[VehicleProfile] = None
+    ) -> str:
+        """Register a route (and the vehicle it was planned for) and return its handle"""
+        route_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            self._sessions[route_id] = RouteSession(route_id, origin, destination, path, vehicle)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return route_id
+    
+    def get(self, route_id: str) -> Optional[RouteSession]:
+        """Look up a live route handle (None if unknown or expired)"""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(route_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(route_id)
+            return session
+    
+    def release(self, session: RouteSession):
+        """Drop a planner that retains too much state"""
+        if session.planner is not None and session.planner.state_size > self.max_state_nodes:
+            session.planner = None
+    
+    def base_minutes(
+        self,
+        graph: CompactRoadGraph,
+        bucket: int,
+        build: Callable[[], np.ndarray]
+    ) -> np.ndarray:
+        """Edge minutes for a graph version and departure bucket (a few kept)"""
+        key = (graph.version, bucket)
+        with self._lock:
+            minutes = self._base_minutes.get(key)
+            if minutes is not None:
+                self._base_minutes.move_to_end(key)
+                return minutes
+        minutes = build()
+        with self._lock:
+            self._base_minutes[key] = minutes
+            while len(self._base_minutes) > 4:
+                self._base_minutes.popitem(last=False)
+        return minutes
+    
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            route_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[route_id]
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# Singleton instance
+_route_sessions = RouteSessionStore()
+
+
+def get_route_sessions() -> RouteSessionStore:
+    """Get the process-wide route handle store"""
+    return _route_sessions
@@ -0,0 +1,185 @@
+"""
+Landmark (ALT) Heuristic
+A*, Landmarks and Triangle inequality: precomputed free-flow distances to
+and from a few landmark segments give tight admissible lower bounds
+"""
+
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.compact_graph import CompactRoadGraph
+from app.services.graph_snapshot import claim_build, load_arrays, release_build, save_arrays
+from app.services.graph_search import one_to_all, to_scipy_matrix
+
+
+class LandmarkTables:
+    """
+    Free-flow travel times (minutes) between K landmarks and every node
+    
+    from_landmark[k, v] = d(L_k, v), to_landmark[k, v] = d(v, L_k);
+    np.inf where unreachable. Stored as float32, K x num_nodes each.
+    """
+    
+    def __init__(
+        self,
+        landmarks: np.ndarray,
+        from_landmark: np.ndarray,
+        to_landmark: np.ndarray,
+        version: Optional[str] = None
+    ):
+        self.landmarks = landmarks
+        self.from_landmark = from_landmark
+        self.to_landmark = to_landmark
+        self.version = version
+    
+    @classmethod
+    def build(cls, graph: CompactRoadGraph, num_landmarks: int) -> 'LandmarkTables':
+        """
+        Select landmarks by farthest-point sampling and compute their tables
+        
+        Each new landmark is the node whose free-flow distance to the
+        nearest already chosen landmark is largest, which spreads
+        landmarks over the network's periphery.
+        """
+        num_nodes = graph.num_nodes
+        num_landmarks = max(1, min(num_landmarks, num_nodes))
+        
+        forward = (graph.offsets, graph.targets, graph.free_flow_minutes)
+        backward = graph.reversed_csr()
+        forward_matrix = to_scipy_matrix(*forward)
+        backward_matrix = to_scipy_matrix(*backward)
+        
+        # Seed with the node farthest from an arbitrary start
+        seed_distances = one_to_all(*forward, source=0, matrix=forward_matrix)
+        candidate = int(np.argmax(np.where(np.isfinite(seed_distances), seed_distances, -1.0)))
+        
+        landmarks, from_rows, to_rows = [], [], []
+        nearest = np.full(num_nodes, np.inf)
+        for _ in range(num_landmarks):
+            landmarks.append(candidate)
+            from_row = one_to_all(*forward, source=candidate, matrix=forward_matrix)
+            to_row = one_to_all(*backward, source=candidate, matrix=backward_matrix)
+            from_rows.append(from_row.astype(np.float32))
+            to_rows.append(to_row.astype(np.float32))
+            
+            nearest = np.minimum(nearest, np.minimum(from_row, to_row))
+            spread = np.where(np.isfinite(nearest), nearest, -1.0)
+            spread[landmarks] = -1.0
+            candidate = int(np.argmax(spread))
+            if spread[candidate] <= 0:
+                break
+        
+        return cls(
+            landmarks=np.array(landmarks, dtype=np.int32),
+            from_landmark=np.vstack(from_rows),
+            to_landmark=np.vstack(to_rows),
+            version=graph.version
+        )
+    
+    def save(self, path: Path):
+        """Persist tables as a compressed .npz, or as a memory-mappable snapshot directory"""
+        arrays = {
+            'landmarks': self.landmarks,
+            'from_landmark': self.from_landmark,
+            'to_landmark': self.to_landmark
+        }
+        if path.suffix != '.npz':
+            save_arrays(path, arrays, {'version': self.version})
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, **arrays, version=np.array(self.version or ''))
+    
+    @classmethod
+    def load(cls, path: Path) -> 'LandmarkTables':
+        """Load tables written by save() (snapshot directories are memory-mapped)"""
+        if path.suffix != '.npz':
+            arrays, meta = load_arrays(path)
+            return cls(version=meta.get('version'), **arrays)
+        with np.load(path) as data:
+            return cls(
+                landmarks=data['landmarks'],
+                from_landmark=data['from_landmark'],
+                to_landmark=data['to_landmark'],
+                version=str(data['version']) or None
+            )
+    
+    def heuristic(self, goal: int) -> 'ALTHeuristic':
+        """A* heuristic towards a goal node"""
+        return ALTHeuristic(self, goal)
+
+
+class ALTHeuristic:
+    """
+    Triangle-inequality lower bound on travel time to a fixed goal
+    
+    For every landmark L: d(v, t) >= d(v, L) - d(t, L) and
+    d(v, t) >= d(L, t) - d(L, v); the heuristic is the best such bound.
+    """
+    
+    def __init__(self, tables: LandmarkTables, goal: int):
+        self.tables = tables
+        self.to_goal = tables.to_landmark[:, goal][:, None]
+        self.from_goal = tables.from_landmark[:, goal][:, None]
+    
+    def __call__(self, nodes: np.ndarray) -> np.ndarray:
+        """Lower bounds (minutes) for an array of node IDs"""
+        with np.errstate(invalid='ignore'):
+            bounds = np.concatenate([
+                self.tables.to_landmark[:, nodes] - self.to_goal,
+                self.from_goal - self.tables.from_landmark[:, nodes]
+            ])
+        # inf - inf (landmark unreachable from both) carries no information
+        bounds[np.isnan(bounds)] = 0.0
+        return np.maximum(bounds.max(axis=0), 0.0).astype(np.float64)
+
+
+_build_lock = threading.Lock()
+
+
+def get_landmark_tables(
+    graph: CompactRoadGraph,
+    num_landmarks: int = settings.ROUTING_ALT_LANDMARKS
+) -> LandmarkTables:
+    """
+    Landmark tables for a graph version
+    
+    Kept on the graph in memory and persisted under ROUTING_CACHE_DIR keyed
+    by graph version, so they are only recomputed when the graph changes
+    (with ROUTING_SHARED_GRAPH as a snapshot every worker memory-maps).
+    
+    Raises:
+        SnapshotPending: Another worker is still building the shared tables
+    """
+    def load_or_build() -> LandmarkTables:
+        suffix = '' if settings.ROUTING_SHARED_GRAPH else '.npz'
+        path = Path(settings.ROUTING_CACHE_DIR) / f"landmarks_{graph.version}_{num_landmarks}{suffix}"
+        # A shared snapshot is built by one worker; the others do not wait for it
+        claimed = bool(suffix == '' and graph.version) and claim_build(path, timeout=0.0)
+        if graph.version and path.exists():
+            try:
+                tables = LandmarkTables.load(path)
+                if tables.from_landmark.shape[1] == graph.num_nodes:
+                    return tables
+            except Exception as e:
+                print(f"⚠️ Warning: Could not load landmark tables {path}: {e}")
+        
+        try:
+            with _build_lock:
+                print(f"🧭 Building {num_landmarks} ALT landmarks for graph {graph.version}...")
+                tables = LandmarkTables.build(graph, num_landmarks)
+            
+            if graph.version:
+                try:
+                    tables.save(path)
+                except OSError as e:
+                    print(f"⚠️ Warning: Could not persist landmark tables: {e}")
+        finally:
+            if claimed:
+                release_build(path)
+        return tables
+    
+    return graph.get_precomputed(f'alt_{num_landmarks}', load_or_build)
@@ -0,0 +1,96 @@
+"""
+Predicted Speed Cache
+Whole-network ML speed predictions for the 'predicted' static metric,
+refreshed on a background thread so no request runs the model for every
+road segment
+"""
+
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.graph_snapshot import SnapshotPending
+
+# Predicts every segment and publishes the result with PredictedSpeeds.put
+PredictionRefresh = Callable[[], None]
+
+
+class PredictedSpeeds:
+    """
+    Latest per-segment predicted speed and congestion factor
+    
+    Readers get the last arrays computed for their graph version. When
+    those are older than max_age, or missing, one refresh starts on a
+    daemon thread and readers keep getting the previous arrays until it
+    finishes. Before the first refresh of a graph version completes,
+    readers get SnapshotPending (503 with Retry-After) instead of waiting.
+    """
+    
+    def __init__(self, max_age: float = settings.ROUTING_CH_CUSTOMIZE_INTERVAL):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # (graph version, computed at, speed, congestion factor)
+        self._speeds: Optional[Tuple[Optional[str], float, np.ndarray, np.ndarray]] = None
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0
+        self.failures = 0
+    
+    def get(self, graph_version: Optional[str], refresh: PredictionRefresh) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Speed (km/h) and congestion factor per segment of a graph version
+        
+        Raises:
+            SnapshotPending: No prediction for this graph version has
+                finished yet (a refresh is running)
+        """
+        with self._lock:
+            speeds = self._speeds
+            current = speeds is not None and speeds[0] == graph_version
+            if not current or time.time() - speeds[1] >= self.max_age:
+                self._start(refresh)
+        if not current:
+            raise SnapshotPending("Predicted travel times are still being computed, retry shortly")
+        return speeds[2], speeds[3]
+    
+    def refresh_async(self, refresh: PredictionRefresh):
+        """Start a refresh now (e.g. at startup) unless one is already running"""
+        with self._lock:
+            self._start(refresh)
+    
+    def _start(self, refresh: PredictionRefresh):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(refresh,),
+            name='predicted-speeds',
+            daemon=True
+        )
+        self._thread.start()
+    
+    def put(self, graph_version: Optional[str], computed_at: float, speed: np.ndarray, congestion_factor: np.ndarray):
+        """Publish a whole-network prediction made at computed_at (epoch seconds)"""
+        with self._lock:
+            self._speeds = (graph_version, computed_at, speed, congestion_factor)
+            self.refreshes += 1
+        print(f"🔮 Predicted speeds refreshed for {len(speed)} segments ({time.time() - computed_at:.2f}s)")
+    
+    def _run(self, refresh: PredictionRefresh):
+        try:
+            refresh()
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            print(f"⚠️ Warning: Could not refresh predicted speeds: {e}")
+
+
+# Singleton instance
+_predicted_speeds = PredictedSpeeds()
+
+
+def get_predicted_speeds() -> PredictedSpeeds:
+    """Get the process-wide predicted speed cache"""
+    return _predicted_speeds
@@ -0,0 +1,144 @@
+"""
+Profile Search
+Earliest arrival from one origin for a whole range of departure times in a
+single time-dependent search, with one arrival time per departure per label
+"""
+
+import heapq
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.services.compact_graph import CompactRoadGraph
+from app.services.search_stats import SearchStats
+
+
+class ProfileResult:
+    """Arrival times at the target per departure, and the route of each departure"""
+    
+    def __init__(
+        self,
+        departures: np.ndarray,
+        labels: Dict[int, np.ndarray],
+        parents: Dict[int, np.ndarray],
+        source: int,
+        target: int
+    ):
+        self.departures = departures            # minutes after the window start
+        self.arrival = labels[target]           # minutes after the window start
+        self._labels = labels
+        self._parents = parents
+        self._source = source
+        self._target = target
+    
+    @property
+    def travel_minutes(self) -> np.ndarray:
+        return self.arrival - self.departures
+    
+    def path(self, departure: int) -> List[int]:
+        """Node sequence of the route for one departure (index into departures)"""
+        nodes = [self._target]
+        while nodes[-1] != self._source:
+            nodes.append(int(self._parents[nodes[-1]][departure]))
+        return nodes[::-1]
+    
+    def elapsed(self, departure: int, nodes: List[int]) -> List[float]:
+        """Minutes from that departure until each node of a route is reached"""
+        start = self.departures[departure]
+        return [float(self._labels[node][departure] - start) for node in nodes]
+
+
+def profile_search(
+    graph: CompactRoadGraph,
+    source: int,
+    target: int,
+    departures: np.ndarray,
+    edge_costs: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    estimate,
+    stats: Optional[SearchStats] = None,
+    allowed: Optional[np.ndarray] = None
+) -> Optional[ProfileResult]:
+    """
+    Earliest arrival at target for every departure time in one search
+    
+    Every label is a vector of arrival times, one per departure, and one
+    edge relaxation evaluates the edge's travel time function at all of
+    them (edge_costs(edges, arrival_minutes) -> (len(edges), departures)
+    matrix). The search is label-correcting: a node is scanned again when
+    any component of its label improves, keyed by its shortest travel time
+    (arrival minus departure) plus the consistent estimate. Keys never
+    decrease along edges, so once the smallest key reaches the target's
+    longest travel time no component of the target can improve and the
+    search stops: it covers the nodes within the slowest departure's
+    travel time, not within the whole window.
+    
+    Args:
+        graph: Road graph
+        source: Origin node
+        target: Destination node
+        departures: Departure times in minutes after a reference instant
+        edge_costs: Travel time matrix of edges entered at arrival minutes
+        estimate: Lower bound on the minutes from nodes to target
+        stats: Search counters to add to
+        allowed: Boolean per CSR edge of the edges that may be taken (None = all)
+    
+    Returns:
+        ProfileResult, or None when the target is unreachable
+    """
+    offsets, targets = graph.offsets, graph.targets
+    departures = np.asarray(departures, dtype=np.float64)
+    labels: Dict[int, np.ndarray] = {source: departures.copy()}
+    parents: Dict[int, np.ndarray] = {source: np.full(len(departures), -1, dtype=np.int64)}
+    queued: Dict[int, float] = {}
+    
+    def key(node: int) -> float:
+        return float((labels[node] - departures).min() + estimate(np.array([node]))[0])
+    
+    queued[source] = key(source)
+    open_set = [(queued[source], source)]
+    scanned, relaxed, pushes = 0, 0, 1
+    
+    while open_set:
+        current_key, current = heapq.heappop(open_set)
+        if queued.get(current) != current_key:
+            continue
+        if target in labels and current_key >= (labels[target] - departures).max():
+            break
+        del queued[current]
+        scanned += 1
+        
+        edges = np.arange(offsets[current], offsets[current + 1])
+        if allowed is not None:
+            edges = edges[allowed[edges]]
+        if not len(edges):
+            continue
+        current_label = labels[current]
+        arrivals = current_label[None, :] + edge_costs(edges, current_label)
+        neighbors = targets[edges].tolist()
+        estimates = estimate(targets[edges]).tolist()
+        relaxed += len(neighbors)
+        
+        for neighbor, arrival, neighbor_estimate in zip(neighbors, arrivals, estimates):
+            label = labels.get(neighbor)
+            if label is None:
+                labels[neighbor] = arrival
+                parents[neighbor] = np.full(len(departures), current, dtype=np.int64)
+            else:
+                better = arrival < label
+                if not better.any():
+                    continue
+                label[better] = arrival[better]
+                parents[neighbor][better] = current
+            
+            neighbor_key = float((labels[neighbor] - departures).min() + neighbor_estimate)
+            if neighbor_key < queued.get(neighbor, float('inf')):
+                queued[neighbor] = neighbor_key
+                heapq.heappush(open_set, (neighbor_key, neighbor))
+                pushes += 1
+    
+    if stats is not None:
+        stats.record_search(scanned, relaxed, pushes)
+    
+    if target not in labels or not np.isfinite(labels[target]).all():
+        return None
+    return ProfileResult(departures, labels, parents, source, target)
@@ -0,0 +1,208 @@
+"""
+Road Graph
+Construction of the compiled road graph from RoadSegment rows
+"""
+
+import json
+import math
+from typing import Dict, List, Tuple, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.traffic import RoadSegment
+from app.services.compact_graph import CompactRoadGraph
+from app.services.segment_geometry import SegmentGeometry
+from app.services.spatial_index import SpatialGrid, haversine_km
+from app.services.vehicle_profiles import ALL_VEHICLE_TYPES, parse_limit, vehicle_type_mask
+
+
+# Unit (north, east) vectors for the RoadSegment.roadDirection enum
+ROAD_DIRECTION_VECTORS = {
+    'N': (1.0, 0.0),
+    'S': (-1.0, 0.0),
+    'E': (0.0, 1.0),
+    'W': (0.0, -1.0)
+}
+
+
+def parse_geojson_coordinates(geojson_text: Optional[str]) -> List[Tuple[float, float]]:
+    """
+    Flatten a GeoJSON geometry into a list of (lon, lat) positions
+    
+    Returns an empty list if the text is missing or cannot be parsed.
+    """
+    if not geojson_text:
+        return []
+    try:
+        geometry = json.loads(geojson_text)
+        coordinates = geometry['coordinates']
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return []
+    
+    positions = []
+    stack = [coordinates]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (list, tuple)) and item and isinstance(item[0], (int, float)):
+            positions.append((float(item[0]), float(item[1])))
+        elif isinstance(item, (list, tuple)):
+            stack.extend(reversed(item))
+    return positions
+
+
+def _is_oneway(category_text: Optional[str]) -> bool:
+    """Whether the RoadSegment.category JSON array contains 'oneway'"""
+    if not category_text:
+        return False
+    try:
+        category = json.loads(category_text)
+    except (json.JSONDecodeError, TypeError):
+        category = [category_text]
+    if isinstance(category, str):
+        category = [category]
+    return any(str(value).strip().lower() == 'oneway' for value in category)
+
+
+def _orient(start, end, road_direction: Optional[str]):
+    """
+    Swap start/end when the geometry points against roadDirection
+    
+    roadDirection gives the heading of traffic (N/S/E/W); a segment digitised
+    the other way round is travelled from its endPoint to its startPoint.
+    """
+    vector = ROAD_DIRECTION_VECTORS.get((road_direction or '').strip().upper()[:1])
+    if vector is None or start is None or end is None:
+        return start, end
+    d_north = end[1] - start[1]
+    d_east = (end[0] - start[0]) * math.cos(math.radians(start[1]))
+    if d_north * vector[0] + d_east * vector[1] < 0:
+        return end, start
+    return start, end
+
+
+def segment_record(segment: RoadSegment) -> Dict:
+    """
+    Snapshot the RoadSegment columns used for graph construction
+    
+    Records are plain dicts so they outlive the SQLAlchemy session
+    they were loaded with and can be kept in the process-wide cache.
+    GeoJSON is parsed here, once per row load.
+    """
+    start_positions = parse_geojson_coordinates(segment.startPoint)
+    end_positions = parse_geojson_coordinates(segment.endPoint)
+    start_point = start_positions[0] if start_positions else None
+    end_point = end_positions[-1] if end_positions else None
+    start, end = _orient(start_point, end_point, segment.roadDirection)
+    
+    return {
+        'id': segment.id,
+        'name': segment.roadName or segment.name or f"Segment {segment.id}",
+        'length': float(segment.length) if segment.length else None,
+        'total_lanes': segment.totalLaneNumber or 2,
+        'max_speed': float(segment.maximumAllowedSpeed) if segment.maximumAllowedSpeed else 40.0,
+        'road_class': segment.roadClass or 'Secondary',
+        'start': start,     # (lon, lat) in travel direction
+        'end': end,
+        'start_point': start_point,     # (lon, lat) as stored
+        'end_point': end_point,
+        'line': parse_geojson_coordinates(segment.location),
+        'oneway': _is_oneway(segment.category),
+        'allowed_vehicles': vehicle_type_mask(segment.allowedVehicleType),
+        'max_height': parse_limit(segment.maximumAllowedHeight),    # m
+        'max_width': parse_limit(segment.maximumAllowedWidth),      # m
+        'max_weight': parse_limit(segment.maximumAllowedWeight),    # t
+        'date_modified': segment.dateModified
+    }
+
+
+def build_road_graph(
+    records: Dict[str, Dict],
+    version: Optional[str] = None,
+    tolerance_m: float = settings.ROUTING_CONNECT_TOLERANCE_M
+) -> CompactRoadGraph:
+    """
+    Build compact road network graph from segment records
+    
+    Segment A connects to segment B when a point where A can be left lies
+    within `tolerance_m` of a point where B can be entered. One-way segments
+    are entered at their start and left at their end; two-way segments can
+    be entered and left at either end.
+    
+    Args:
+        records: Segment records keyed by segment ID (see segment_record)
+        version: Version stamp of the RoadSegment data the graph is built from
+        tolerance_m: Snapping distance between endpoints in meters
+    
+    Returns:
+        CompactRoadGraph
+    """
+    # Node IDs are positions in the sorted segment ID list
+    segment_ids = sorted(records.keys())
+    ordered = [records[segment_id] for segment_id in segment_ids]
+    
+    attributes = {
+        'name': [record['name'] for record in ordered],
+        'max_speed': [record['max_speed'] for record in ordered],
+        'total_lanes': [record['total_lanes'] for record in ordered],
+        'road_class': [record['road_class'] for record in ordered],
+        'start': [record['start'] for record in ordered],
+        'end': [record['end'] for record in ordered],
+        'vehicle_types': [record.get('allowed_vehicles', ALL_VEHICLE_TYPES) for record in ordered],
+        'max_height': [record.get('max_height') for record in ordered],
+        'max_width': [record.get('max_width') for record in ordered],
+        'max_weight': [record.get('max_weight') for record in ordered]
+    }
+    
+    # Entry/exit points per traversable direction
+    entry_nodes, entry_points, exit_nodes, exit_points = [], [], [], []
+    unlocated = 0
+    for node, record in enumerate(ordered):
+        start, end = record['start'], record['end']
+        if start is None or end is None:
+            unlocated += 1
+            continue
+        entry_nodes.append(node)
+        entry_points.append(start)
+        exit_nodes.append(node)
+        exit_points.append(end)
+        if not record['oneway']:
+            entry_nodes.append(node)
+            entry_points.append(end)
+            exit_nodes.append(node)
+            exit_points.append(start)
+    
+    if unlocated:
+        print(f"⚠️ Warning: {unlocated} road segments have no start/end geometry and are left unconnected")
+    
+    # Use segment length as distance (fallback: straight line between endpoints, then 1.5 km)
+    lengths_km = np.full(len(ordered), 1.5)
+    for node, record in enumerate(ordered):
+        if record['length']:
+            lengths_km[node] = record['length'] / 1000.0
+        elif record['start'] is not None and record['end'] is not None:
+            lengths_km[node] = float(haversine_km(
+                record['start'][1], record['start'][0], record['end'][1], record['end'][0]
+            )) or 1.5
+    
+    sources = targets = np.array([], dtype=np.int64)
+    if entry_points:
+        entry_xy = np.array(entry_points, dtype=np.float64)
+        exit_xy = np.array(exit_points, dtype=np.float64)
+        grid = SpatialGrid(entry_xy[:, 1], entry_xy[:, 0], cell_size_m=max(tolerance_m, 1.0))
+        exit_idx, entry_idx = grid.query_pairs(exit_xy[:, 1], exit_xy[:, 0], tolerance_m)
+        
+        sources = np.asarray(exit_nodes, dtype=np.int64)[exit_idx]
+        targets = np.asarray(entry_nodes, dtype=np.int64)[entry_idx]
+        
+        # No self loops (a two-way segment's own ends are not a connection)
+        distinct = sources != targets
+        sources, targets = sources[distinct], targets[distinct]
+    
+    weights = lengths_km[sources]
+    
+    return CompactRoadGraph.from_edges(
+        segment_ids, sources, targets, weights, attributes,
+        version=version,
+        geometry=SegmentGeometry.from_records(ordered)
+    )
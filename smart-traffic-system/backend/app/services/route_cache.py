@@ -0,0 +1,111 @@
+"""
+Route Result Cache
+Process-wide LRU cache of computed routes, keyed so that a new road graph
+version or incident set never serves a stale route
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+def shift_route_times(result: Dict, departure_time: datetime) -> Dict:
+    """Move a route's departure and arrival timestamps to a new departure time"""
+    delta = departure_time - datetime.fromisoformat(result['departure_time'])
+    result['departure_time'] = departure_time.isoformat()
+    result['estimated_arrival_time'] = (
+        datetime.fromisoformat(result['estimated_arrival_time']) + delta
+    ).isoformat()
+    for segment in result['segments']:
+        segment['arrival_time'] = (datetime.fromisoformat(segment['arrival_time']) + delta).isoformat()
+    return result
+
+
+class RouteCache:
+    """
+    LRU cache of route results with per-entry TTL
+    
+    Keys carry the graph version and incident version, and entries from
+    any other version are dropped as soon as a new one is seen, so changes
+    invalidate the cache without explicit calls. Values are deep-copied in
+    and out because callers decorate the returned dicts.
+    """
+    
+    def __init__(self, max_entries: int = settings.ROUTING_ROUTE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple, Tuple[float, Dict]]' = OrderedDict()
+        self._versions: Optional[Tuple[Optional[str], str]] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Tuple, graph_version: Optional[str], incidents_version: str) -> Optional[Dict]:
+        """Cached result for a key, or None (counted as a miss)"""
+        key = key + (graph_version, incidents_version)
+        with self._lock:
+            self._check_versions(graph_version, incidents_version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+    
+    def put(self, key: Tuple, graph_version: Optional[str], incidents_version: str, result: Dict, ttl: float):
+        """Store a result for ttl seconds"""
+        key = key + (graph_version, incidents_version)
+        with self._lock:
+            self._check_versions(graph_version, incidents_version)
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'graph_version': self._versions[0] if self._versions else None,
+                'incident_version': self._versions[1] if self._versions else None
+            }
+    
+    def _check_versions(self, graph_version: Optional[str], incidents_version: str):
+        if self._versions != (graph_version, incidents_version):
+            if self._versions is not None and self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self._versions = (graph_version, incidents_version)
+
+
+# Singleton instance
+_route_cache = RouteCache()
+
+
+def get_route_cache() -> RouteCache:
+    """Get the process-wide route result cache"""
+    return _route_cache
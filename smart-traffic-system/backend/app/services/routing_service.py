@@ -5,50 +5,39 @@ A* algorithm with ML-predicted traffic weights and incident avoidance
 
 import heapq
 import math
-from typing import Dict, List, Tuple, Optional, Set
+import time
+import numpy as np
+from typing import Callable, Dict, List, Tuple, Optional, Set
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 
+from app.core.config import settings
+from app.core.database import SessionLocal
 from app.services.traffic_prediction_service import TrafficPredictionService
 from app.services.feature_engineering_service import FeatureEngineeringService
-from app.models.traffic import RoadSegment
-from app.models.road_accident import RoadAccident
-from app.models.city_work import CityWork
-
-
-class RoadGraph:
-    """
-    Represents the road network as a directed graph
-    """
-    
-    def __init__(self):
-        self.adjacency_list: Dict[str, List[Tuple[str, float]]] = {}
-        self.segment_info: Dict[str, Dict] = {}
-    
-    def add_segment(self, segment_id: str, info: Dict):
-        """Add a road segment to the graph"""
-        if segment_id not in self.adjacency_list:
-            self.adjacency_list[segment_id] = []
-        self.segment_info[segment_id] = info
-    
-    def add_connection(self, from_segment: str, to_segment: str, distance: float):
-        """Add a directed edge between segments"""
-        if from_segment not in self.adjacency_list:
-            self.adjacency_list[from_segment] = []
-        
-        # Check if connection already exists
-        existing = [conn for conn in self.adjacency_list[from_segment] if conn[0] == to_segment]
-        if not existing:
-            self.adjacency_list[from_segment].append((to_segment, distance))
-    
-    def get_neighbors(self, segment_id: str) -> List[Tuple[str, float]]:
-        """Get all neighboring segments and their distances"""
-        return self.adjacency_list.get(segment_id, [])
-    
-    def get_all_segments(self) -> List[str]:
-        """Get all segment IDs in the graph"""
-        return list(self.adjacency_list.keys())
+from app.services.compact_graph import CompactRoadGraph
+from app.services.heuristics import GeoHeuristic, ZeroHeuristic, MaxHeuristic
+from app.services.landmarks import get_landmark_tables
+from app.services.contraction_hierarchy import get_customized_hierarchy
+from app.services.alternative_routes import EdgeCostCache, find_alternatives
+from app.services.bidirectional_search import bidirectional_td_search
+from app.services.profile_search import profile_search
+from app.services.graph_search import one_to_all, one_to_many
+from app.services.travel_time_profiles import (
+    TravelTimeProfiles,
+    get_travel_time_profiles,
+    minute_of_day,
+    BUCKET_MINUTES,
+    BUCKETS_PER_DAY
+)
+from app.services.graph_cache import get_graph_cache
+from app.services.graph_snapshot import SnapshotPending
+from app.services.incremental_routing import DStarLite, get_route_sessions
+from app.services.route_cache import get_route_cache, shift_route_times
+from app.services.incident_index import get_incident_cache, incident_penalty
+from app.services.predicted_speeds import get_predicted_speeds
+from app.services.search_stats import SearchStats, get_search_metrics
+from app.services.vehicle_profiles import VehicleProfile, edge_access, node_access
 
 
 class SmartRoutingService:
@@ -60,144 +49,31 @@ class SmartRoutingService:
         self.db = db
         self.prediction_service = TrafficPredictionService()
         self.feature_service = FeatureEngineeringService(db)
-        self.graph = self._build_graph()
-    
-    def _build_graph(self) -> RoadGraph:
-        """
-        Build road network graph from database
-        
-        Creates connections based on:
-        1. Road segments in database
-        2. Geographic proximity (end point close to start point)
-        3. Manual connection definitions
-        """
-        graph = RoadGraph()
-        
-        # Get all road segments from database
-        segments = self.db.query(RoadSegment).all()
-        
-        for segment in segments:
-            info = {
-                'id': segment.id,
-                'name': segment.roadName or segment.name or f"Segment {segment.id}",
-                'start_lat': None,  # Will parse from startPoint GeoJSON
-                'start_lon': None,
-                'end_lat': None,    # Will parse from endPoint GeoJSON
-                'end_lon': None,
-                'total_lanes': segment.totalLaneNumber or 2,
-                'max_speed': float(segment.maximumAllowedSpeed) if segment.maximumAllowedSpeed else 40.0,
-                'road_class': segment.roadClass or 'Secondary'
-            }
-            graph.add_segment(segment.id, info)
-        
-        # Build connections between segments
-        # For simplicity, assume sequential connections (segment_001 -> segment_002 -> segment_003, etc.)
-        all_segments = segments
-        segment_ids = [seg.id for seg in all_segments]
-        segment_ids.sort()  # Sort to ensure order
-        
-        # Connect sequential segments
-        for i in range(len(segment_ids) - 1):
-            current_id = segment_ids[i]
-            next_id = segment_ids[i + 1]
-            
-            # Get segment info
-            current_seg = next(seg for seg in all_segments if seg.id == current_id)
-            next_seg = next(seg for seg in all_segments if seg.id == next_id)
-            
-            # Use segment length as distance (default 1.5 km if not available)
-            # Convert Decimal to float to avoid TypeError in arithmetic
-            distance = float(current_seg.length) / 1000.0 if current_seg.length else 1.5
-            
-            # Bidirectional connection
-            graph.add_connection(current_id, next_id, distance)
-            graph.add_connection(next_id, current_id, distance)
-        
-        return graph
-    
-    def _is_connected(self, seg1: RoadSegment, seg2: RoadSegment, threshold_km: float = 0.1) -> bool:
-        """
-        Check if two segments are connected
-        (seg1's end point is close to seg2's start point)
-        """
-        if not all([
-            seg1.EndPointLatitude, seg1.EndPointLongitude,
-            seg2.StartPointLatitude, seg2.StartPointLongitude
-        ]):
-            return False
-        
-        distance = self._calculate_distance(
-            seg1.EndPointLatitude, seg1.EndPointLongitude,
-            seg2.StartPointLatitude, seg2.StartPointLongitude
-        )
-        
-        return distance <= threshold_km
-    
-    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """
-        Calculate distance between two points using Haversine formula
-        Returns distance in kilometers
-        """
-        R = 6371  # Earth's radius in km
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(delta_lat / 2) ** 2 +
-             math.cos(lat1_rad) * math.cos(lat2_rad) *
-             math.sin(delta_lon / 2) ** 2)
-        c = 2 * math.asin(math.sqrt(a))
-        
-        return R * c
+        # Shared per-process graph; only rebuilt when RoadSegment.dateModified moves
+        self.graph: CompactRoadGraph = get_graph_cache().get_graph(db)
+        # Construction zones and accidents by segment and time interval
+        self.incident_index = get_incident_cache().get_index(db, self.graph)
+        # Counters of the current search (replaced by find_optimal_route)
+        self.search_stats = SearchStats()
+        # Vehicle of the current request and the CSR edges it may take (None = all)
+        self.vehicle: Optional[VehicleProfile] = None
+        self.allowed_edges: Optional[np.ndarray] = None
     
-    def _get_active_incidents(self) -> Dict[str, List[Dict]]:
+    def _get_active_incidents(self, at_time: Optional[datetime] = None) -> Dict[str, List[Dict]]:
         """
         Get active accidents and construction zones
         Returns dict mapping segment_id to list of incidents
-        """
-        incidents = {}
-        
-        # Note: RoadAccident table does not have a column that references RoadSegment
-        # Skipping accident queries for now - can be added if schema is updated
-        
-        # Get active construction zones
-        try:
-            query = text("""
-                SELECT 
-                    roadImpacted,
-                    startDate,
-                    endDate,
-                    workState
-                FROM CityWork
-                WHERE workState IN ('open', 'authorized', 'planned')
-                AND GETDATE() BETWEEN startDate AND endDate
-                AND roadImpacted IS NOT NULL
-            """)
-            
-            result = self.db.execute(query)
-            for row in result:
-                segment_id = row[0]
-                if segment_id not in incidents:
-                    incidents[segment_id] = []
-                incidents[segment_id].append({
-                    'type': 'construction',
-                    'start': row[1],
-                    'end': row[2],
-                    'state': row[3]
-                })
-        except Exception as e:
-            print(f"⚠️ Warning: Could not fetch construction zones: {e}")
         
-        return incidents
+        Read from the incident interval index, so no query runs per call.
+        """
+        return self.incident_index.active_map(at_time or datetime.now())
     
     def _calculate_segment_cost(
         self,
         segment_id: str,
         distance: float,
         arrival_time: datetime,
-        incidents: Dict[str, List[Dict]]
+        predictions: Optional[Dict[Tuple[int, int, int], Optional[Tuple[float, float]]]] = None
     ) -> float:
         """
         Calculate cost (travel time) for a segment
@@ -212,95 +88,289 @@ class SmartRoutingService:
             segment_id: Road segment ID
             distance: Distance in km
             arrival_time: Expected ARRIVAL time at this segment (not departure!)
-            incidents: Active incidents map
-            
+            predictions: Search-wide prediction cache (see _prefetch_predictions)
+        
         Returns:
             Cost in minutes
         """
         segment_info = self.graph.segment_info.get(segment_id)
         if not segment_info:
             return float('inf')
+        self.search_stats.cost_evaluations += 1
         
         # 🎯 CRITICAL: Get ML prediction for ARRIVAL TIME (when you'll reach this segment)
         # This predicts traffic conditions at the time you'll actually be there!
-        features = self.feature_service.engineer_features(segment_id, arrival_time)
+        if predictions is None:
+            predictions = {}
+        node = self.graph.index_of(segment_id)
+        key = (node, arrival_time.hour, arrival_time.weekday())
+        if key not in predictions:
+            self._prefetch_predictions([(node, arrival_time)], predictions)
+        prediction = predictions[key]
         
-        if features and self.prediction_service.is_ready():
+        if prediction is not None:
             # Use ML prediction for FUTURE traffic at arrival time
-            prediction = self.prediction_service.predict(features, model_type='ensemble')
-            predicted_speed = float(prediction.get('predicted_speed', segment_info['max_speed']))
-            congestion_prob = float(prediction.get('congestion_probability', 0.5))
+            predicted_speed, congestion_prob = prediction
         else:
             # Fallback to max speed with some congestion
             predicted_speed = float(segment_info['max_speed']) * 0.7
             congestion_prob = 0.3
         
+        # Never faster than the speed limit (keeps A* lower bounds admissible)
+        predicted_speed = min(predicted_speed, float(segment_info['max_speed']))
+        
         # Base travel time in minutes (using PREDICTED speed at arrival time)
         base_time = (distance / max(predicted_speed, 5.0)) * 60.0
         
         # Congestion factor (1.0 to 3.0)
         congestion_factor = 1.0 + (congestion_prob * 2.0)
         
-        # Incident penalty
-        incident_penalty = 1.0
-        if segment_id in incidents:
-            for incident in incidents[segment_id]:
-                if incident['type'] == 'accident':
-                    # Severe penalty for accidents
-                    severity = incident.get('severity', 1)
-                    incident_penalty *= (1.5 + severity * 0.1)
-                elif incident['type'] == 'construction':
-                    # Moderate penalty for construction
-                    incident_penalty *= 1.3
+        # Incident penalty for the incidents active at arrival time
+        penalty = self.incident_index.penalty(segment_id, arrival_time)
         
         # Final cost
-        cost = base_time * congestion_factor * incident_penalty
+        cost = base_time * congestion_factor * penalty
         
         return cost
     
+    def _prefetch_predictions(
+        self,
+        requests: List[Tuple[int, datetime]],
+        predictions: Dict[Tuple[int, int, int], Optional[Tuple[float, float]]]
+    ):
+        """
+        Predict (speed, congestion probability) for many segments with one model call
+        
+        Engineered features depend on the target time only through its hour
+        and weekday, so results are cached per (node, hour, weekday); None
+        marks segments without features (cost falls back to the speed limit).
+        
+        Args:
+            requests: (node, arrival time) pairs
+            predictions: Cache to fill
+        """
+        pending: Dict[Tuple[int, int, int], datetime] = {}
+        for node, arrival_time in requests:
+            key = (node, arrival_time.hour, arrival_time.weekday())
+            if key not in predictions and key not in pending:
+                pending[key] = arrival_time
+        
+        stats = self.search_stats
+        started = time.perf_counter()
+        keys, features_list = [], []
+        for key, arrival_time in pending.items():
+            features = self.feature_service.engineer_features(self.graph.segment_id(key[0]), arrival_time)
+            if features and self.prediction_service.is_ready():
+                keys.append(key)
+                features_list.append(features)
+            else:
+                predictions[key] = None
+        stats.feature_time_ms += (time.perf_counter() - started) * 1000.0
+        
+        started = time.perf_counter()
+        results = self.prediction_service.predict_batch(features_list, model_type='ensemble')
+        if features_list:
+            stats.model_calls += 1
+            stats.predictions += len(features_list)
+            stats.model_time_ms += (time.perf_counter() - started) * 1000.0
+        for key, prediction in zip(keys, results):
+            max_speed = float(self.graph.max_speed[key[0]])
+            predictions[key] = (
+                float(prediction.get('predicted_speed', max_speed)),
+                float(prediction.get('congestion_probability', 0.5))
+            )
+    
+    def _incident_penalty(self, segment_id: str, incidents: Dict[str, List[Dict]]) -> float:
+        """Cost multiplier for active incidents on a segment"""
+        return incident_penalty(incidents.get(segment_id, []))
+    
+    def _incident_penalties(self, at_time: datetime) -> np.ndarray:
+        """Per-node incident multipliers at a time (1.0 where no incident)"""
+        return self.incident_index.penalty_array(at_time)
+    
+    def _use_vehicle(self, vehicle: Optional[VehicleProfile], at_time: datetime):
+        """
+        Restrict the following searches to the edges a vehicle may take
+        
+        Segment type, height, width and weight restrictions are compiled
+        with the graph (see vehicle_profiles.edge_access); work zones whose
+        allowedVehicle/maxAuthorizedTonnage exclude the vehicle at
+        `at_time` are closed on top.
+        """
+        self.vehicle = vehicle
+        self.allowed_edges = None
+        if vehicle is None:
+            return
+        allowed = edge_access(self.graph, vehicle)
+        closed = self.incident_index.closed_nodes(vehicle, at_time)
+        if closed:
+            open_nodes = np.ones(self.graph.num_nodes, dtype=bool)
+            open_nodes[closed] = False
+            allowed = open_nodes[self.graph.targets] if allowed is None else allowed & open_nodes[self.graph.targets]
+        self.allowed_edges = allowed
+    
+    def _out_edges(self, node: int) -> np.ndarray:
+        """CSR edges leaving a node that the current vehicle may take"""
+        edges = np.arange(self.graph.offsets[node], self.graph.offsets[node + 1])
+        if self.allowed_edges is not None:
+            edges = edges[self.allowed_edges[edges]]
+        return edges
+    
+    def _blocked_nodes(self, at_time: datetime) -> List[int]:
+        """Segments the current vehicle may not enter at a time"""
+        if self.vehicle is None:
+            return []
+        allowed = node_access(self.graph, self.vehicle)
+        blocked = [] if allowed is None else np.nonzero(~allowed)[0].tolist()
+        return blocked + self.incident_index.closed_nodes(self.vehicle, at_time)
+    
+    def _travel_time_profiles(self) -> TravelTimeProfiles:
+        """Historical time-of-day profiles for the current graph"""
+        return get_travel_time_profiles(
+            self.graph,
+            lambda: self.feature_service.get_bucket_speeds(
+                days=settings.ROUTING_PROFILE_HISTORY_DAYS,
+                bucket_minutes=BUCKET_MINUTES
+            ),
+            lambda: np.repeat(
+                [self.feature_service._default_baseline_speed(hour) for hour in range(24)],
+                BUCKETS_PER_DAY // 24
+            )
+        )
+    
+    def _edge_minutes(self, metric: str, at_time: datetime) -> np.ndarray:
+        """
+        Travel time (minutes) of every graph edge under a static metric
+        
+        Edge cost follows _calculate_segment_cost (edge length at the target
+        segment's speed, times congestion and incident penalties), with the
+        speed taken from:
+        - 'free_flow': maximumAllowedSpeed
+        - 'baseline': historical average for the hour and weekday
+        - 'predicted': the last whole-network prediction, refreshed in the
+          background every ROUTING_CH_CUSTOMIZE_INTERVAL seconds (see
+          PredictedSpeeds); incident penalties still apply at `at_time`
+        
+        Raises:
+            SnapshotPending: 'predicted' before the first prediction of
+                this graph version has finished
+        """
+        graph = self.graph
+        speed = graph.max_speed.astype(np.float64)
+        congestion_factor = np.ones(graph.num_nodes)
+        
+        if metric == 'baseline':
+            speed[:] = self.feature_service._default_baseline_speed(at_time.hour)
+            baseline = self.feature_service.get_baseline_speeds(at_time.hour, at_time.weekday())
+            for segment_id, baseline_speed in baseline.items():
+                node = graph.index_of(segment_id)
+                if node is not None:
+                    speed[node] = baseline_speed
+        elif metric == 'predicted':
+            speed, congestion_factor = get_predicted_speeds().get(graph.version, _predict_all_segments)
+        
+        return self._static_edge_minutes(speed, congestion_factor, at_time)
+    
+    def _static_edge_minutes(self, speed: np.ndarray, congestion_factor: np.ndarray, at_time: datetime) -> np.ndarray:
+        """Edge minutes from per-segment speed and congestion factor, with incident penalties at at_time"""
+        graph = self.graph
+        max_speed = graph.max_speed.astype(np.float64)
+        penalty = self._incident_penalties(at_time)
+        
+        node_factor = 60.0 / np.maximum(np.minimum(speed, max_speed), 5.0) * congestion_factor * penalty
+        return graph.weights.astype(np.float64) * node_factor[graph.targets]
+    
+    def _predicted_speeds(self, at_time: datetime) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ML speed and congestion factor of every segment at `at_time`
+        
+        One model batch over the whole network: far too slow for a request,
+        so only the PredictedSpeeds refresh thread calls this.
+        """
+        graph = self.graph
+        max_speed = graph.max_speed.astype(np.float64)
+        speed = max_speed.copy()
+        congestion_factor = np.ones(graph.num_nodes)
+        
+        predictions: Dict[Tuple[int, int, int], Optional[Tuple[float, float]]] = {}
+        self._prefetch_predictions([(node, at_time) for node in range(graph.num_nodes)], predictions)
+        for (node, _, _), prediction in predictions.items():
+            if prediction is not None:
+                speed[node], congestion_prob = prediction
+            else:
+                speed[node] = max_speed[node] * 0.7
+                congestion_prob = 0.3
+            congestion_factor[node] = 1.0 + (congestion_prob * 2.0)
+        return speed, congestion_factor
+    
     def _heuristic(self, segment_id: str, goal_id: str) -> float:
         """
         A* heuristic function - estimated time to goal
         Returns estimated time in minutes
         
-        Since we don't have lat/lon coordinates, use sequential segment distance
-        as heuristic (assuming segments are roughly sequential)
+        Great-circle distance between the segments' endpoints driven at the
+        network's top speed, so it never overestimates (see GeoHeuristic)
         """
-        seg1 = self.graph.segment_info.get(segment_id)
-        seg2 = self.graph.segment_info.get(goal_id)
+        node = self.graph.index_of(segment_id)
+        goal = self.graph.index_of(goal_id)
         
-        if not seg1 or not seg2:
+        if node is None or goal is None:
             return 0
         
-        # Extract segment numbers (e.g., "segment_001" -> 1)
-        try:
-            num1 = int(segment_id.split('_')[-1])
-            num2 = int(goal_id.split('_')[-1])
-            
-            # Estimate: each segment is ~1.5 km, average speed 30 km/h
-            segment_distance = abs(num2 - num1)
-            estimated_km = segment_distance * 1.5
-            estimated_time = (estimated_km / 30.0) * 60.0  # minutes
-            
-            return estimated_time
-        except (ValueError, IndexError):
-            # Fallback if segment naming doesn't follow pattern
-            return 0
+        return float(GeoHeuristic(self.graph, goal)(np.array([node]))[0])
+    
+    def _make_heuristic(self, goal_node: int, heuristic: str):
+        """
+        Build the A* heuristic for a goal
+        
+        Modes:
+        - 'geo': straight-line distance at top speed
+        - 'alt': landmark triangle bounds combined with 'geo' ('geo' alone
+          while another worker builds the shared landmark tables)
+        - 'none': plain Dijkstra
+        """
+        if heuristic == 'none':
+            return ZeroHeuristic()
+        geo = GeoHeuristic(self.graph, goal_node)
+        if heuristic == 'alt':
+            try:
+                return MaxHeuristic(get_landmark_tables(self.graph).heuristic(goal_node), geo)
+            except SnapshotPending:
+                return geo
+        return geo
     
     def find_optimal_route(
         self,
         origin: str,
         destination: str,
-        departure_time: Optional[datetime] = None
+        departure_time: Optional[datetime] = None,
+        heuristic: str = 'geo',
+        engine: str = 'astar',
+        bidirectional: bool = False,
+        vehicle: Optional[VehicleProfile] = None
     ) -> Dict:
         """
         Find optimal route using A* algorithm with ML predictions
         
+        Results are cached per origin, destination, engine, 5-minute
+        departure bucket and vehicle restrictions for as long as the road graph and the active
+        incident set stay the same (see RouteCache).
+        
+        The result's 'search_stats' holds the counters of this call (see
+        SearchStats), which are also added to the process-wide metrics.
+        
         Args:
             origin: Origin segment ID
             destination: Destination segment ID
             departure_time: Departure time (default: now)
-            
+            heuristic: A* heuristic - 'geo', 'alt' (landmarks) or 'none'
+            engine: 'astar' (ML predictions at arrival time), 'td' (historical
+                travel time profiles) or 'ch' (contraction hierarchy lookup)
+            bidirectional: For 'astar' and 'td', add a backward free-flow
+                search from the destination that bounds the forward search
+            vehicle: Only use segments this vehicle may enter (None: no
+                restrictions); 'ch' falls back to 'td' for restricted vehicles
+        
         Returns:
             Route information dict
         """
@@ -308,41 +378,128 @@ class SmartRoutingService:
             departure_time = datetime.now()
         
         # Check if origin and destination exist
-        if origin not in self.graph.adjacency_list:
+        origin_node = self.graph.index_of(origin)
+        if origin_node is None:
             return {
                 'success': False,
                 'error': f'Origin segment {origin} not found in road network'
             }
         
-        if destination not in self.graph.adjacency_list:
+        goal_node = self.graph.index_of(destination)
+        if goal_node is None:
             return {
                 'success': False,
                 'error': f'Destination segment {destination} not found in road network'
             }
         
-        # Get active incidents
-        incidents = self._get_active_incidents()
+        self._use_vehicle(vehicle, departure_time)
+        stats = self.search_stats = SearchStats(engine)
+        started = time.perf_counter()
+        with stats.count_queries(self.db):
+            result = self._find_route_cached(
+                origin, destination, origin_node, goal_node, departure_time, heuristic, engine, bidirectional
+            )
+        stats.total_time_ms = (time.perf_counter() - started) * 1000.0
+        get_search_metrics().observe(stats)
+        result['search_stats'] = stats.to_dict()
+        if result['success'] and vehicle is not None:
+            result['vehicle'] = vehicle.to_dict()
+        return result
+    
+    def _find_route_cached(
+        self,
+        origin: str,
+        destination: str,
+        origin_node: int,
+        goal_node: int,
+        departure_time: datetime,
+        heuristic: str,
+        engine: str,
+        bidirectional: bool
+    ) -> Dict:
+        """_find_route behind the route result cache"""
+        if not settings.ENABLE_CACHE:
+            return self._find_route(origin_node, goal_node, departure_time, heuristic, engine, bidirectional)
+        
+        # Every heuristic/bidirectional variant returns the optimal route, so only the engine is keyed
+        cache = get_route_cache()
+        key = (
+            origin, destination, engine, int(departure_time.timestamp() // (BUCKET_MINUTES * 60)),
+            self.vehicle.key if self.vehicle else None
+        )
+        incidents_version = self.incident_index.version
+        cached = cache.get(key, self.graph.version, incidents_version)
+        if cached is not None:
+            self.search_stats.cache_hit = True
+            return shift_route_times(cached, departure_time)
+        
+        result = self._find_route(origin_node, goal_node, departure_time, heuristic, engine, bidirectional)
+        if result['success']:
+            cache.put(key, self.graph.version, incidents_version, result, self._route_cache_ttl(engine))
+        return result
+    
+    def _route_cache_ttl(self, engine: str) -> float:
+        """Seconds a cached route stays valid: the refresh interval of the engine's costs"""
+        if engine == 'td':
+            return settings.ROUTING_PROFILE_REFRESH_INTERVAL
+        if engine == 'ch':
+            return settings.ROUTING_CH_CUSTOMIZE_INTERVAL
+        return settings.CACHE_TTL
+    
+    def _find_route(
+        self,
+        origin_node: int,
+        goal_node: int,
+        departure_time: datetime,
+        heuristic: str,
+        engine: str,
+        bidirectional: bool
+    ) -> Dict:
+        """Route search for find_optimal_route, bypassing the route cache"""
+        if engine == 'ch':
+            if self.allowed_edges is None:
+                return self._find_route_ch(origin_node, goal_node, departure_time)
+            # Hierarchy shortcuts ignore vehicle restrictions, so search the profiles instead
+            result = self._find_route(origin_node, goal_node, departure_time, heuristic, 'td', bidirectional)
+            if result['success']:
+                result['explanation'] += ' (contraction hierarchy skipped: vehicle restrictions)'
+            return result
+        if bidirectional:
+            return self._find_route_bidirectional(origin_node, goal_node, departure_time, heuristic, engine)
+        if engine == 'td':
+            return self._find_route_td(origin_node, goal_node, departure_time, heuristic)
+        
+        # Vectorized lower bound, evaluated per expanded neighbor batch
+        estimate_remaining = self._make_heuristic(goal_node, heuristic)
         
-        # A* algorithm
-        # Priority queue: (f_cost, g_cost, segment_id)
-        open_set = [(0, 0, origin)]
-        came_from = {}
-        g_score = {origin: 0}
-        f_score = {origin: self._heuristic(origin, destination)}
-        closed_set: Set[str] = set()
+        # A* algorithm over integer node IDs
+        # Priority queue: (f_cost, g_cost, node)
+        open_set = [(0, 0, origin_node)]
+        came_from: Dict[int, int] = {}
+        g_score = {origin_node: 0}
+        closed_set: Set[int] = set()
         
         # ⭐ Track cumulative time to calculate arrival time at each segment
-        cumulative_time = {origin: 0}  # Minutes from departure
+        cumulative_time = {origin_node: 0}  # Minutes from departure
+        
+        # Predictions shared by the whole search, filled in batches
+        predictions: Dict[Tuple[int, int, int], Optional[Tuple[float, float]]] = {}
+        relaxed, pushes = 0, 1
         
         while open_set:
             # Get segment with lowest f_score
             current_f, current_g, current = heapq.heappop(open_set)
             
             # Goal reached
-            if current == destination:
-                path = self._reconstruct_path(came_from, current)
+            if current == goal_node:
+                self.search_stats.record_search(len(closed_set) + 1, relaxed, pushes)
+                path_nodes = self._reconstruct_path(came_from, current)
+                path = [self.graph.segment_id(node) for node in path_nodes]
                 return self._format_route_result(
-                    path, g_score, departure_time, incidents, cumulative_time
+                    path,
+                    {path[i]: g_score[node] for i, node in enumerate(path_nodes)},
+                    departure_time,
+                    {path[i]: cumulative_time[node] for i, node in enumerate(path_nodes)}
                 )
             
             # Skip if already processed
@@ -351,19 +508,41 @@ class SmartRoutingService:
             
             closed_set.add(current)
             
+            # 🎯 CRITICAL: Calculate ARRIVAL TIME at neighbor segment
+            # arrival_time = departure_time + time_to_reach_current + time_to_reach_neighbor
+            current_cumulative_minutes = cumulative_time.get(current, 0)
+            estimated_arrival_time = departure_time + timedelta(minutes=current_cumulative_minutes)
+            
             # Explore neighbors
-            for neighbor, distance in self.graph.get_neighbors(current):
+            edges = self._out_edges(current)
+            if not len(edges):
+                continue
+            neighbors, distances = self.graph.targets[edges], self.graph.weights[edges]
+            estimates = estimate_remaining(neighbors)
+            
+            # On a cache miss, predict these neighbors together with those of
+            # the next frontier nodes (likely the next expansions) in one model call
+            arrival_key = (estimated_arrival_time.hour, estimated_arrival_time.weekday())
+            batch = [(neighbor, estimated_arrival_time) for neighbor in neighbors.tolist()
+                     if neighbor not in closed_set and (neighbor, *arrival_key) not in predictions]
+            if batch:
+                for _, _, frontier in heapq.nsmallest(settings.ROUTING_BATCH_LOOKAHEAD, open_set):
+                    if frontier in closed_set:
+                        continue
+                    frontier_arrival = departure_time + timedelta(minutes=cumulative_time[frontier])
+                    frontier_neighbors = self.graph.targets[self._out_edges(frontier)]
+                    batch.extend((neighbor, frontier_arrival) for neighbor in frontier_neighbors.tolist()
+                                 if neighbor not in closed_set)
+                self._prefetch_predictions(batch, predictions)
+            
+            for neighbor, distance, estimate in zip(neighbors.tolist(), distances.tolist(), estimates.tolist()):
                 if neighbor in closed_set:
                     continue
-                
-                # 🎯 CRITICAL: Calculate ARRIVAL TIME at neighbor segment
-                # arrival_time = departure_time + time_to_reach_current + time_to_reach_neighbor
-                current_cumulative_minutes = cumulative_time.get(current, 0)
-                estimated_arrival_time = departure_time + timedelta(minutes=current_cumulative_minutes)
+                relaxed += 1
                 
                 # Calculate cost to neighbor using PREDICTED traffic at arrival time
                 segment_cost = self._calculate_segment_cost(
-                    neighbor, distance, estimated_arrival_time, incidents
+                    self.graph.segment_id(neighbor), distance, estimated_arrival_time, predictions
                 )
                 
                 tentative_g = g_score[current] + segment_cost
@@ -373,16 +552,214 @@ class SmartRoutingService:
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g
                     cumulative_time[neighbor] = current_cumulative_minutes + segment_cost
-                    f_score[neighbor] = tentative_g + self._heuristic(neighbor, destination)
-                    heapq.heappush(open_set, (f_score[neighbor], tentative_g, neighbor))
+                    heapq.heappush(open_set, (tentative_g + estimate, tentative_g, neighbor))
+                    pushes += 1
         
         # No path found
+        self.search_stats.record_search(len(closed_set), relaxed, pushes)
+        return {
+            'success': False,
+            'error': 'No route found between origin and destination'
+        }
+    
+    def _find_route_td(
+        self,
+        origin_node: int,
+        goal_node: int,
+        departure_time: datetime,
+        heuristic: str = 'geo'
+    ) -> Dict:
+        """
+        Time-dependent A* over precomputed travel time profiles
+        
+        Edge costs are interpolated from each segment's 5-minute profile at
+        the arrival time, so the search makes no database or model calls.
+        Incident multipliers are also taken at the arrival time. Profiles
+        are FIFO, so the first label settled for a node is its earliest
+        arrival.
+        """
+        profiles = self._travel_time_profiles()
+        estimate_remaining = self._make_heuristic(goal_node, heuristic)
+        targets = self.graph.targets
+        start_minute = minute_of_day(departure_time)
+        
+        # g_score is minutes since departure, i.e. the arrival time offset
+        open_set = [(0.0, 0.0, origin_node)]
+        came_from: Dict[int, int] = {}
+        g_score = {origin_node: 0.0}
+        closed_set: Set[int] = set()
+        relaxed, pushes = 0, 1
+        
+        while open_set:
+            current_f, current_g, current = heapq.heappop(open_set)
+            
+            if current == goal_node:
+                self.search_stats.record_search(len(closed_set) + 1, relaxed, pushes)
+                path_nodes = self._reconstruct_path(came_from, current)
+                path = [self.graph.segment_id(node) for node in path_nodes]
+                times = {path[i]: g_score[node] for i, node in enumerate(path_nodes)}
+                result = self._format_route_result(path, times, departure_time, times)
+                result['prediction_based'] = False
+                result['explanation'] = 'Route calculated using historical travel time profiles at arrival times'
+                return result
+            
+            if current in closed_set:
+                continue
+            closed_set.add(current)
+            
+            edges = self._out_edges(current)
+            if not len(edges):
+                continue
+            neighbors = targets[edges]
+            penalty = self._incident_penalties(departure_time + timedelta(minutes=current_g))
+            costs = profiles.travel_minutes(edges, start_minute + current_g, penalty)
+            self.search_stats.cost_evaluations += len(edges)
+            estimates = estimate_remaining(neighbors)
+            for neighbor, cost, estimate in zip(neighbors.tolist(), costs.tolist(), estimates.tolist()):
+                if neighbor in closed_set:
+                    continue
+                relaxed += 1
+                tentative_g = current_g + cost
+                if tentative_g < g_score.get(neighbor, float('inf')):
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    heapq.heappush(open_set, (tentative_g + estimate, tentative_g, neighbor))
+                    pushes += 1
+        
+        self.search_stats.record_search(len(closed_set), relaxed, pushes)
         return {
             'success': False,
             'error': 'No route found between origin and destination'
         }
     
-    def _reconstruct_path(self, came_from: Dict[str, str], current: str) -> List[str]:
+    def _find_route_bidirectional(
+        self,
+        origin_node: int,
+        goal_node: int,
+        departure_time: datetime,
+        heuristic: str = 'geo',
+        engine: str = 'astar'
+    ) -> Dict:
+        """
+        Time-dependent search bounded by a backward lower-bound search
+        
+        The forward search uses the engine's costs at arrival time; the
+        backward search from the destination runs on lower bounds of them
+        (the fastest profile pace for 'td', free-flow time for 'astar'),
+        which limits the forward search to the nodes that can still be on a
+        faster route (see bidirectional_td_search). Free-flow times are far
+        below predicted costs, so for 'astar' the backward search runs
+        alone to a bounded radius and the forward search batches
+        predictions over its frontier like the unidirectional one.
+        """
+        predictions: Dict[Tuple[int, int, int], Optional[Tuple[float, float]]] = {}
+        _, arrival_cost = self._edge_cost_functions(engine, departure_time, predictions)
+        
+        if engine == 'td':
+            profiles = self._travel_time_profiles()
+            start_minute = minute_of_day(departure_time)
+            lower_bounds = lambda horizon: profiles.min_travel_minutes(start_minute, horizon)
+            prefetch = None
+        else:
+            def prefetch(edges, elapsed, frontier):
+                # On a cache miss, predict the neighbours of the next frontier
+                # nodes in the same model call, as the unidirectional search does
+                arrival_time = departure_time + timedelta(minutes=elapsed)
+                batch = [(node, arrival_time) for node in self.graph.targets[edges].tolist()
+                         if (node, arrival_time.hour, arrival_time.weekday()) not in predictions]
+                if batch:
+                    for frontier_edges, frontier_elapsed in frontier():
+                        frontier_time = departure_time + timedelta(minutes=frontier_elapsed)
+                        batch.extend((node, frontier_time) for node in self.graph.targets[frontier_edges].tolist())
+                    self._prefetch_predictions(batch, predictions)
+            
+            lower_bounds = lambda horizon: self.graph.free_flow_minutes
+        
+        def path_costs(edges: np.ndarray, elapsed: float) -> List[float]:
+            arrival = [elapsed]
+            nodes = self.graph.targets[edges].tolist()
+            for i, edge in enumerate(edges.tolist()):
+                if engine == 'astar':
+                    # Predict the rest of the path in one call whenever the hour changes
+                    arrival_time = departure_time + timedelta(minutes=arrival[-1])
+                    if (nodes[i], arrival_time.hour, arrival_time.weekday()) not in predictions:
+                        self._prefetch_predictions([(node, arrival_time) for node in nodes[i:]], predictions)
+                arrival.append(arrival[-1] + float(arrival_cost(edges[i:i + 1], arrival[-1])[0]))
+            return arrival
+        
+        found = bidirectional_td_search(
+            self.graph,
+            origin_node,
+            goal_node,
+            arrival_cost,
+            path_costs,
+            lower_bounds,
+            self._make_heuristic(goal_node, heuristic),
+            stats=self.search_stats,
+            allowed=self.allowed_edges,
+            balanced=engine == 'td',
+            prefetch=prefetch
+        )
+        if found is None:
+            return {
+                'success': False,
+                'error': 'No route found between origin and destination'
+            }
+        
+        path = [self.graph.segment_id(node) for node in found.nodes]
+        times = dict(zip(path, found.arrival))
+        result = self._format_route_result(path, times, departure_time, times)
+        if engine == 'td':
+            result['prediction_based'] = False
+            result['explanation'] = 'Route calculated using historical travel time profiles at arrival times'
+        return result
+    
+    def _find_route_ch(
+        self,
+        origin_node: int,
+        goal_node: int,
+        departure_time: datetime
+    ) -> Dict:
+        """
+        Route lookup on the customized contraction hierarchy
+        
+        Uses static ROUTING_CH_METRIC weights, re-applied every
+        ROUTING_CH_CUSTOMIZE_INTERVAL seconds, instead of predictions at
+        each arrival time: a bidirectional upward search touches a few
+        hundred nodes even on large networks. The 'predicted' metric is
+        re-customized by the prediction refresh thread, so requests keep
+        using the last customization meanwhile.
+        """
+        metric = settings.ROUTING_CH_METRIC
+        hierarchy = get_customized_hierarchy(
+            self.graph,
+            metric,
+            lambda: self._edge_minutes(metric, datetime.now()),
+            max_age=math.inf if metric == 'predicted' else settings.ROUTING_CH_CUSTOMIZE_INTERVAL
+        )
+        
+        found = hierarchy.query(origin_node, goal_node, stats=self.search_stats)
+        if found is None:
+            return {
+                'success': False,
+                'error': 'No route found between origin and destination'
+            }
+        
+        total_time, path_nodes, arc_minutes = found
+        path = [self.graph.segment_id(node) for node in path_nodes]
+        cumulative = np.concatenate([[0.0], np.cumsum(arc_minutes)]).tolist()
+        
+        result = self._format_route_result(
+            path,
+            {path[-1]: total_time},
+            departure_time,
+            dict(zip(path, cumulative))
+        )
+        result['prediction_based'] = metric == 'predicted'
+        result['explanation'] = f'Route looked up on the contraction hierarchy ({metric} travel times)'
+        return result
+    
+    def _reconstruct_path(self, came_from: Dict[int, int], current: int) -> List[int]:
         """Reconstruct path from came_from map"""
         path = [current]
         while current in came_from:
@@ -396,7 +773,6 @@ class SmartRoutingService:
         path: List[str],
         g_score: Dict[str, float],
         departure_time: datetime,
-        incidents: Dict[str, List[Dict]],
         cumulative_time: Dict[str, float]
     ) -> Dict:
         """Format route result with detailed information"""
@@ -421,13 +797,13 @@ class SmartRoutingService:
             
             total_distance += distance
             
-            # Get incidents on this segment
-            segment_incidents = incidents.get(segment_id, [])
-            
             # ⭐ Calculate arrival time at this segment
             segment_arrival_time = departure_time + timedelta(minutes=cumulative_time.get(segment_id, 0))
             
-            segments_info.append({
+            # Get incidents on this segment when it is reached
+            segment_incidents = self.incident_index.active(segment_id, segment_arrival_time)
+            
+            segment_entry = {
                 'segment_id': segment_id,
                 'name': segment['name'],
                 'distance_km': round(distance, 2),
@@ -435,7 +811,17 @@ class SmartRoutingService:
                 'arrival_time': segment_arrival_time.isoformat(),
                 'has_incident': len(segment_incidents) > 0,
                 'incidents': segment_incidents
-            })
+            }
+            
+            # Coordinates from the parsed geometry store (no per-segment queries)
+            geometry = self.graph.geometry
+            if geometry is not None:
+                node = self.graph.index_of(segment_id)
+                segment_entry['start_coordinates'] = geometry.start_coordinates(node)  # [lon, lat]
+                segment_entry['end_coordinates'] = geometry.end_coordinates(node)
+                segment_entry['coordinates'] = geometry.line(node)
+            
+            segments_info.append(segment_entry)
         
         total_time = g_score.get(path[-1], 0)
         estimated_arrival = departure_time + timedelta(minutes=total_time)
@@ -450,6 +836,7 @@ class SmartRoutingService:
             'estimated_arrival_time': estimated_arrival.isoformat(),
             'incidents_avoided': sum(1 for seg in segments_info if seg['has_incident']),
             'prediction_based': True,  # ⭐ Flag indicating this uses predictive routing
+            'graph_version': self.graph.version,
             'explanation': 'Route calculated using AI-predicted traffic at arrival times for each segment'
         }
     
@@ -458,26 +845,748 @@ class SmartRoutingService:
         origin: str,
         destination: str,
         departure_time: Optional[datetime] = None,
-        num_routes: int = 3
+        num_routes: int = 3,
+        heuristic: str = 'geo',
+        engine: str = 'astar',
+        vehicle: Optional[VehicleProfile] = None
     ) -> List[Dict]:
         """
         Find multiple alternative routes
         
-        Strategy: Remove segments from optimal path and find new routes
+        Strategy: penalty method - after each route its edges get more
+        expensive and the search repeats; routes sharing more than
+        ROUTING_ALT_MAX_OVERLAP of their length with an accepted route are
+        skipped. All searches share one lazily filled edge cost cache, and
+        accepted routes are re-timed with costs at their real arrival times.
+        
+        Args:
+            origin: Origin segment ID
+            destination: Destination segment ID
+            departure_time: Departure time (default: now)
+            num_routes: Number of routes wanted (the first is the optimum)
+            heuristic: A* heuristic - 'geo', 'alt' or 'none'
+            engine: Cost model - 'astar' (ML predictions), 'td' (profiles) or 'ch' (CH metric)
+            vehicle: Only use segments this vehicle may enter (None: no restrictions)
+        
+        Returns:
+            Route dicts sorted by estimated time, each with 'overlap' and 'diversity_score'
         """
-        routes = []
+        if departure_time is None:
+            departure_time = datetime.now()
+        
+        origin_node = self.graph.index_of(origin)
+        goal_node = self.graph.index_of(destination)
+        if origin_node is None or goal_node is None:
+            return []
         
-        # Find first optimal route
-        route1 = self.find_optimal_route(origin, destination, departure_time)
-        if route1['success']:
-            routes.append(route1)
+        self._use_vehicle(vehicle, departure_time)
+        departure_cost, arrival_cost = self._edge_cost_functions(engine, departure_time)
+        if self.allowed_edges is not None:
+            allowed, unrestricted_cost = self.allowed_edges, departure_cost
+            
+            def departure_cost(edges: np.ndarray) -> np.ndarray:
+                # Edges the vehicle may not take cost inf, so they are never relaxed
+                costs = np.full(len(edges), np.inf)
+                usable = allowed[edges]
+                if usable.any():
+                    costs[usable] = unrestricted_cost(edges[usable])
+                return costs
+        edge_costs = EdgeCostCache(self.graph.num_edges, departure_cost)
         
-        # TODO: Implement k-shortest paths algorithm for true alternatives
-        # For now, return just the optimal route
+        candidates = find_alternatives(
+            self.graph,
+            origin_node,
+            goal_node,
+            edge_costs,
+            self._make_heuristic(goal_node, heuristic),
+            num_routes=num_routes
+        )
         
+        routes = []
+        for candidate in candidates:
+            path = [self.graph.segment_id(node) for node in candidate.nodes]
+            cumulative = [0.0]
+            for edge in candidate.edges:
+                cumulative.append(cumulative[-1] + float(arrival_cost(np.array([edge]), cumulative[-1])[0]))
+            
+            route = self._format_route_result(
+                path,
+                {path[-1]: cumulative[-1]},
+                departure_time,
+                dict(zip(path, cumulative))
+            )
+            route['overlap'] = round(candidate.overlap, 3)
+            route['diversity_score'] = round(1.0 - candidate.overlap, 3)
+            if vehicle is not None:
+                route['vehicle'] = vehicle.to_dict()
+            routes.append(route)
+        
+        routes.sort(key=lambda route: route['estimated_time_min'])
         return routes
+    
+    def compute_travel_time_matrix(
+        self,
+        origins: List[str],
+        destinations: List[str],
+        departure_time: Optional[datetime] = None,
+        departure_times: Optional[List[datetime]] = None,
+        engine: str = 'td',
+        vehicle: Optional[VehicleProfile] = None
+    ) -> Dict:
+        """
+        Travel times (minutes) from every origin to every destination
+        
+        One multi-source Dijkstra per group of origins sharing edge costs:
+        - 'td': travel time profiles frozen at the origin's 5-minute
+          departure bucket (origins in the same bucket share one search)
+        - 'ch': the contraction hierarchy metric (ROUTING_CH_METRIC)
+        
+        Args:
+            origins: Origin segment IDs
+            destinations: Destination segment IDs
+            departure_time: Departure time for all origins (default: now)
+            departure_times: Per-origin departure times (overrides departure_time)
+            engine: 'td' or 'ch'
+            vehicle: Only use segments this vehicle may enter (None: no restrictions)
+        
+        Returns:
+            Dict with 'durations' (len(origins) x len(destinations) array, np.inf if unreachable)
+        """
+        graph = self.graph
+        unknown = [segment_id for segment_id in list(origins) + list(destinations)
+                   if graph.index_of(segment_id) is None]
+        if unknown:
+            return {
+                'success': False,
+                'error': f'Segments not found in road network: {", ".join(sorted(set(unknown)))}'
+            }
+        
+        if departure_times is None:
+            departure_times = [departure_time or datetime.now()] * len(origins)
+        origin_nodes = np.array([graph.index_of(segment_id) for segment_id in origins], dtype=np.int64)
+        destination_nodes = np.array([graph.index_of(segment_id) for segment_id in destinations], dtype=np.int64)
+        edges = np.arange(graph.num_edges)
+        self._use_vehicle(vehicle, min(departure_times))
+        
+        # Group origins by the edge costs they search with
+        groups: Dict[int, List[int]] = {}
+        group_times: Dict[int, datetime] = {}
+        if engine == 'ch':
+            minutes = self._edge_minutes(settings.ROUTING_CH_METRIC, departure_times[0])
+            groups[0] = list(range(len(origins)))
+        else:
+            profiles = self._travel_time_profiles()
+            for i, when in enumerate(departure_times):
+                bucket = int(minute_of_day(when) // BUCKET_MINUTES)
+                groups.setdefault(bucket, []).append(i)
+                group_times.setdefault(bucket, when)
+        
+        durations = np.full((len(origins), len(destinations)), np.inf)
+        for bucket, rows in groups.items():
+            if engine != 'ch':
+                penalty = self._incident_penalties(group_times[bucket])
+                minutes = profiles.travel_minutes(edges, bucket * BUCKET_MINUTES, penalty)
+            durations[rows] = one_to_many(
+                graph.offsets,
+                graph.targets,
+                minutes if self.allowed_edges is None else np.where(self.allowed_edges, minutes, np.inf),
+                origin_nodes[rows],
+                columns=destination_nodes
+            )
+        
+        return {
+            'success': True,
+            'durations': durations,
+            'departure_times': [when.isoformat() for when in departure_times],
+            'engine': engine,
+            'graph_version': graph.version
+        }
+    
+    def find_routes_from(
+        self,
+        origin: str,
+        destinations: List[str],
+        departure_times: List[datetime],
+        vehicle: Optional[VehicleProfile] = None
+    ) -> List[Dict]:
+        """
+        Routes from one origin to many destinations with one time-dependent search
+        
+        Meant for trips sharing an origin and a 5-minute departure bucket:
+        a single Dijkstra over travel time profiles departs at the earliest
+        of their departure times and runs until every destination is
+        settled, and each route is then moved to its own departure time,
+        as cached /find-route results are (see shift_route_times).
+        
+        Args:
+            origin: Origin segment ID
+            destinations: Destination segment ID per trip
+            departure_times: Departure time per trip
+            vehicle: Only use segments this vehicle may enter (None: no restrictions)
+        
+        Returns:
+            One route dict (or {'success': False, 'error': ...}) per trip
+        """
+        graph = self.graph
+        origin_node = graph.index_of(origin)
+        if origin_node is None:
+            error = {'success': False, 'error': f'Origin segment {origin} not found in road network'}
+            return [dict(error) for _ in destinations]
+        
+        goal_nodes = [graph.index_of(destination) for destination in destinations]
+        departure_time = min(departure_times)
+        self._use_vehicle(vehicle, departure_time)
+        elapsed, came_from = self._td_search_many(
+            origin_node,
+            departure_time,
+            {node for node in goal_nodes if node is not None}
+        )
+        
+        results = []
+        for destination, goal_node, when in zip(destinations, goal_nodes, departure_times):
+            if goal_node is None:
+                results.append({
+                    'success': False,
+                    'error': f'Destination segment {destination} not found in road network'
+                })
+                continue
+            if goal_node not in elapsed:
+                results.append({
+                    'success': False,
+                    'error': 'No route found between origin and destination'
+                })
+                continue
+            path_nodes = self._reconstruct_path(came_from, goal_node)
+            path = [graph.segment_id(node) for node in path_nodes]
+            times = {path[i]: elapsed[node] for i, node in enumerate(path_nodes)}
+            result = self._format_route_result(path, times, departure_time, times)
+            result['prediction_based'] = False
+            result['explanation'] = 'Route calculated using historical travel time profiles at arrival times'
+            if vehicle is not None:
+                result['vehicle'] = vehicle.to_dict()
+            results.append(shift_route_times(result, when))
+        return results
+    
+    def _td_search_many(
+        self,
+        origin_node: int,
+        departure_time: datetime,
+        goals: Set[int]
+    ) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """
+        Time-dependent Dijkstra over travel time profiles, stopping once all goals are settled
+        
+        Returns:
+            (minutes from departure per settled node, parent per reached node)
+        """
+        profiles = self._travel_time_profiles()
+        start_minute = minute_of_day(departure_time)
+        targets = self.graph.targets
+        remaining = set(goals)
+        remaining.discard(origin_node)
+        
+        best = {origin_node: 0.0}
+        came_from: Dict[int, int] = {}
+        settled: Dict[int, float] = {}
+        heap = [(0.0, origin_node)]
+        relaxed, pushes = 0, 1
+        while heap and remaining:
+            elapsed, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = elapsed
+            remaining.discard(node)
+            
+            edges = self._out_edges(node)
+            if not len(edges):
+                continue
+            penalty = self._incident_penalties(departure_time + timedelta(minutes=elapsed))
+            costs = profiles.travel_minutes(edges, start_minute + elapsed, penalty)
+            self.search_stats.cost_evaluations += len(edges)
+            for neighbor, cost in zip(targets[edges].tolist(), costs.tolist()):
+                if neighbor in settled:
+                    continue
+                relaxed += 1
+                arrival = elapsed + cost
+                if arrival < best.get(neighbor, float('inf')):
+                    best[neighbor] = arrival
+                    came_from[neighbor] = node
+                    heapq.heappush(heap, (arrival, neighbor))
+                    pushes += 1
+        
+        settled.setdefault(origin_node, 0.0)
+        self.search_stats.record_search(len(settled), relaxed, pushes)
+        return settled, came_from
+    
+    def compute_isochrone(
+        self,
+        origin: Optional[str],
+        budgets: List[float],
+        departure_time: Optional[datetime] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        engine: str = 'td',
+        include_geometry: bool = False,
+        vehicle: Optional[VehicleProfile] = None
+    ) -> Dict:
+        """
+        Segments reachable from an origin within each travel time budget
+        
+        One search bounded by the largest budget; smaller budgets are
+        prefixes of its settle order.
+        
+        Args:
+            origin: Origin segment ID (or None to snap latitude/longitude)
+            budgets: Travel time budgets in minutes, e.g. [10, 20, 30]
+            departure_time: Departure time (default: now)
+            latitude, longitude: Origin coordinate when no segment is given
+            engine: 'td' (time-dependent profiles) or 'ch' (contraction hierarchy metric)
+            include_geometry: Add a GeoJSON MultiLineString per budget
+            vehicle: Only use segments this vehicle may enter (None: no restrictions)
+        
+        Returns:
+            Dict with one entry per budget in 'isochrones'
+        """
+        if departure_time is None:
+            departure_time = datetime.now()
+        
+        graph = self.graph
+        if origin is not None:
+            origin_node = graph.index_of(origin)
+        elif latitude is not None and longitude is not None:
+            origin_node = graph.nearest_node(latitude, longitude)
+        else:
+            origin_node = None
+        if origin_node is None:
+            return {
+                'success': False,
+                'error': 'Origin segment not found in road network'
+            }
+        
+        budgets = sorted(set(float(budget) for budget in budgets))
+        limit = budgets[-1]
+        self._use_vehicle(vehicle, departure_time)
+        
+        if engine == 'ch':
+            minutes = self._edge_minutes(settings.ROUTING_CH_METRIC, departure_time)
+            if self.allowed_edges is not None:
+                minutes = np.where(self.allowed_edges, minutes, np.inf)
+            times = one_to_all(graph.offsets, graph.targets, minutes, origin_node, limit=limit)
+            reached = np.nonzero(times <= limit)[0]
+            arrival = times[reached]
+        else:
+            reached, arrival = self._bounded_td_search(origin_node, departure_time, limit)
+        
+        order = np.argsort(arrival, kind='stable')
+        reached, arrival = reached[order], arrival[order]
+        
+        isochrones = []
+        for budget in budgets:
+            nodes = reached[:np.searchsorted(arrival, budget, side='right')]
+            band = {
+                'budget_min': budget,
+                'segment_ids': [graph.segment_id(node) for node in nodes.tolist()]
+            }
+            if include_geometry:
+                band['geometry'] = self._segments_geometry(nodes)
+            isochrones.append(band)
+        
+        return {
+            'success': True,
+            'origin': graph.segment_id(origin_node),
+            'departure_time': departure_time.isoformat(),
+            'isochrones': isochrones,
+            'segments_settled': len(reached),
+            'engine': engine,
+            'graph_version': graph.version
+        }
+    
+    def find_best_departure(
+        self,
+        origin: str,
+        destination: str,
+        window_start: datetime,
+        window_end: datetime,
+        step_minutes: float = BUCKET_MINUTES,
+        heuristic: str = 'geo',
+        vehicle: Optional[VehicleProfile] = None
+    ) -> Dict:
+        """
+        Arrival time function over a departure window and its best departure
+        
+        One profile search over the travel time profiles evaluates every
+        departure step_minutes apart at once (see profile_search), instead
+        of one time-dependent search per departure; like engine 'td' it
+        makes no database or model calls per segment.
+        
+        Args:
+            origin: Origin segment ID
+            destination: Destination segment ID
+            window_start: Earliest departure
+            window_end: Latest departure
+            step_minutes: Spacing of the evaluated departures
+            heuristic: 'geo', 'alt' (landmarks) or 'none'
+            vehicle: Only use segments this vehicle may enter (None: no restrictions)
+        
+        Returns:
+            Dict with 'departures' (departure, arrival, travel time per
+            step) and the route of the departure with the shortest travel time
+        """
+        origin_node = self.graph.index_of(origin)
+        if origin_node is None:
+            return {
+                'success': False,
+                'error': f'Origin segment {origin} not found in road network'
+            }
+        goal_node = self.graph.index_of(destination)
+        if goal_node is None:
+            return {
+                'success': False,
+                'error': f'Destination segment {destination} not found in road network'
+            }
+        
+        window_minutes = (window_end - window_start).total_seconds() / 60.0
+        if window_minutes < 0 or step_minutes <= 0:
+            return {
+                'success': False,
+                'error': 'Departure window must end after it starts'
+            }
+        departures = np.arange(int(window_minutes // step_minutes) + 1) * float(step_minutes)
+        if len(departures) > settings.ROUTING_PROFILE_MAX_DEPARTURES:
+            return {
+                'success': False,
+                'error': f'Too many departures (max {settings.ROUTING_PROFILE_MAX_DEPARTURES}), increase step_minutes'
+            }
+        
+        self._use_vehicle(vehicle, window_start)
+        stats = self.search_stats = SearchStats('profile')
+        started = time.perf_counter()
+        profiles = self._travel_time_profiles()
+        start_minute = minute_of_day(window_start)
+        start_timestamp = window_start.timestamp()
+        
+        def edge_costs(edges: np.ndarray, arrival: np.ndarray) -> np.ndarray:
+            stats.cost_evaluations += len(edges) * len(arrival)
+            penalty = self.incident_index.penalty_matrix(self.graph.targets[edges], start_timestamp + arrival * 60.0)
+            return profiles.travel_minutes_many(edges, start_minute + arrival, penalty)
+        
+        found = profile_search(
+            self.graph,
+            origin_node,
+            goal_node,
+            departures,
+            edge_costs,
+            self._make_heuristic(goal_node, heuristic),
+            stats=stats,
+            allowed=self.allowed_edges
+        )
+        stats.total_time_ms = (time.perf_counter() - started) * 1000.0
+        get_search_metrics().observe(stats)
+        if found is None:
+            return {
+                'success': False,
+                'error': 'No route found between origin and destination'
+            }
+        
+        travel = found.travel_minutes
+        best = int(np.argmin(travel))
+        departure_time = window_start + timedelta(minutes=float(departures[best]))
+        path_nodes = found.path(best)
+        path = [self.graph.segment_id(node) for node in path_nodes]
+        times = dict(zip(path, found.elapsed(best, path_nodes)))
+        
+        result = self._format_route_result(path, times, departure_time, times)
+        result['prediction_based'] = False
+        result['explanation'] = 'Departure with the shortest travel time on historical travel time profiles'
+        result['departures'] = [
+            {
+                'departure_time': (window_start + timedelta(minutes=float(departure))).isoformat(),
+                'arrival_time': (window_start + timedelta(minutes=float(arrival))).isoformat(),
+                'travel_time_min': round(float(minutes), 1)
+            }
+            for departure, arrival, minutes in zip(departures, found.arrival, travel)
+        ]
+        result['search_stats'] = stats.to_dict()
+        return result
+    
+    def track_route(
+        self,
+        origin: str,
+        destination: str,
+        path: List[str],
+        vehicle: Optional[VehicleProfile] = None
+    ) -> str:
+        """Register a found route (and the vehicle it was planned for) for /reroute and return its handle"""
+        return get_route_sessions().create(origin, destination, path, vehicle)
+    
+    def reroute(
+        self,
+        route_id: str,
+        current_segment: str,
+        departure_time: Optional[datetime] = None
+    ) -> Dict:
+        """
+        Recompute a tracked route from the vehicle's current segment
+        
+        The first reroute of a handle builds a D* Lite planner towards the
+        destination over travel time profiles frozen at that departure
+        bucket. Later reroutes move its start to the current segment and
+        only push the incident multipliers that changed since the last
+        call, so the repair touches the few segments whose time to the
+        destination actually changed. The planner is rebuilt when the road
+        graph version changes.
+        
+        Args:
+            route_id: Handle returned with the original route
+            current_segment: Segment the vehicle is on
+            departure_time: Time at the current segment (default: now)
+        
+        Returns:
+            Route information dict with 'route_changed' and search counters
+        """
+        if departure_time is None:
+            departure_time = datetime.now()
+        
+        sessions = get_route_sessions()
+        session = sessions.get(route_id)
+        if session is None:
+            return {
+                'success': False,
+                'error': f'Route {route_id} not found or expired'
+            }
+        
+        graph = self.graph
+        current_node = graph.index_of(current_segment)
+        goal_node = graph.index_of(session.destination)
+        if current_node is None or goal_node is None:
+            return {
+                'success': False,
+                'error': f'Segment {current_segment if current_node is None else session.destination} not found in road network'
+            }
+        
+        incidents = self._get_active_incidents(departure_time)
+        penalties = {}
+        for segment_id in incidents:
+            node = graph.index_of(segment_id)
+            if node is not None:
+                penalties[node] = self._incident_penalty(segment_id, incidents)
+        self._use_vehicle(session.vehicle, departure_time)
+        for node in self._blocked_nodes(departure_time):
+            penalties[node] = float('inf')
+        
+        with session.lock:
+            planner = session.planner
+            incremental = planner is not None and session.graph_version == graph.version
+            edges_updated = 0
+            if incremental:
+                planner.move(current_node)
+                edges_updated = planner.set_penalties(penalties)
+            else:
+                bucket = int(minute_of_day(departure_time) // BUCKET_MINUTES)
+                base_minutes = sessions.base_minutes(
+                    graph,
+                    bucket,
+                    lambda: self._travel_time_profiles().travel_minutes(
+                        np.arange(graph.num_edges), bucket * BUCKET_MINUTES
+                    )
+                )
+                planner = DStarLite(graph, base_minutes, current_node, goal_node, penalties)
+                session.planner = planner
+                session.graph_version = graph.version
+                session.cost_bucket = bucket
+            
+            planner.compute()
+            found = planner.path()
+            expanded, state_size = planner.expanded, planner.state_size
+            sessions.release(session)
+            
+            if found is None:
+                return {
+                    'success': False,
+                    'error': 'No route found between current segment and destination'
+                }
+            
+            path_nodes, minutes = found
+            path = [graph.segment_id(node) for node in path_nodes]
+            previous = session.path[session.path.index(current_segment):] if current_segment in session.path else []
+            session.path = path
+        
+        result = self._format_route_result(
+            path,
+            {path[-1]: minutes[-1]},
+            departure_time,
+            dict(zip(path, minutes))
+        )
+        result['route_id'] = route_id
+        result['route_changed'] = path != previous
+        result['incremental'] = incremental
+        result['edges_updated'] = edges_updated
+        result['nodes_expanded'] = expanded
+        result['state_size'] = state_size
+        result['prediction_based'] = False
+        result['explanation'] = 'Route recalculated from the current segment using historical travel time profiles'
+        return result
+    
+    def _bounded_td_search(
+        self,
+        origin_node: int,
+        departure_time: datetime,
+        limit: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Time-dependent Dijkstra over travel time profiles, stopping at `limit` minutes
+        
+        Returns:
+            (settled nodes, minutes from departure to reach each)
+        """
+        profiles = self._travel_time_profiles()
+        start_minute = minute_of_day(departure_time)
+        targets = self.graph.targets
+        
+        best = {origin_node: 0.0}
+        settled: Dict[int, float] = {}
+        heap = [(0.0, origin_node)]
+        while heap:
+            elapsed, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = elapsed
+            
+            edges = self._out_edges(node)
+            if not len(edges):
+                continue
+            penalty = self._incident_penalties(departure_time + timedelta(minutes=elapsed))
+            costs = profiles.travel_minutes(edges, start_minute + elapsed, penalty)
+            for neighbor, cost in zip(targets[edges].tolist(), costs.tolist()):
+                arrival = elapsed + cost
+                if arrival <= limit and arrival < best.get(neighbor, float('inf')):
+                    best[neighbor] = arrival
+                    heapq.heappush(heap, (arrival, neighbor))
+        
+        return (
+            np.fromiter(settled.keys(), dtype=np.int64, count=len(settled)),
+            np.fromiter(settled.values(), dtype=np.float64, count=len(settled))
+        )
+    
+    def _segments_geometry(self, nodes: np.ndarray) -> Dict:
+        """GeoJSON MultiLineString of segments (location LineString, else start to end point)"""
+        graph = self.graph
+        lines = []
+        for node in nodes.tolist():
+            if graph.geometry is not None:
+                line = graph.geometry.line(node)
+                if len(line) >= 2:
+                    lines.append([[round(lon, 6), round(lat, 6)] for lon, lat in line])
+                    continue
+            points = [
+                [round(float(graph.start_lon[node]), 6), round(float(graph.start_lat[node]), 6)],
+                [round(float(graph.end_lon[node]), 6), round(float(graph.end_lat[node]), 6)]
+            ]
+            if not any(math.isnan(value) for point in points for value in point):
+                lines.append(points)
+        return {'type': 'MultiLineString', 'coordinates': lines}
+    
+    def _edge_cost_functions(
+        self,
+        engine: str,
+        departure_time: datetime,
+        predictions: Optional[Dict[Tuple[int, int, int], Optional[Tuple[float, float]]]] = None
+    ) -> Tuple[Callable[[np.ndarray], np.ndarray], Callable[[np.ndarray, float], np.ndarray]]:
+        """
+        Edge cost model of a search engine, in two forms
+        
+        Args:
+            engine: 'astar', 'td' or 'ch'
+            departure_time: Departure time
+            predictions: Prediction cache to share with the caller ('astar' only)
+        
+        Returns:
+            (cost of an edge array when entered at departure time,
+             cost of an edge array entered a number of minutes after departure)
+        """
+        graph = self.graph
+        
+        if engine == 'td':
+            profiles = self._travel_time_profiles()
+            start_minute = minute_of_day(departure_time)
+            
+            def profile_cost(edges: np.ndarray, elapsed: float) -> np.ndarray:
+                self.search_stats.cost_evaluations += len(edges)
+                penalty = self._incident_penalties(departure_time + timedelta(minutes=elapsed))
+                return profiles.travel_minutes(edges, start_minute + elapsed, penalty)
+            
+            return (
+                lambda edges: profile_cost(edges, 0.0),
+                profile_cost
+            )
+        
+        if engine == 'ch':
+            minutes = self._edge_minutes(settings.ROUTING_CH_METRIC, departure_time)
+            return (
+                lambda edges: minutes[edges],
+                lambda edges, elapsed: minutes[edges]
+            )
+        
+        if predictions is None:
+            predictions = {}
+        
+        def arrival_cost(edges: np.ndarray, elapsed: float) -> np.ndarray:
+            arrival_time = departure_time + timedelta(minutes=elapsed)
+            neighbors = graph.targets[edges].tolist()
+            self._prefetch_predictions([(neighbor, arrival_time) for neighbor in neighbors], predictions)
+            return np.array([
+                self._calculate_segment_cost(
+                    graph.segment_id(neighbor), distance, arrival_time, predictions
+                )
+                for neighbor, distance in zip(neighbors, graph.weights[edges].tolist())
+            ])
+        
+        def departure_cost(edges: np.ndarray) -> np.ndarray:
+            # Costs are all taken at departure time, so the next hop can be
+            # predicted in the same model call
+            nodes = graph.targets[edges]
+            next_edges = np.concatenate([np.arange(graph.offsets[node], graph.offsets[node + 1]) for node in nodes])
+            batch = np.unique(np.concatenate([nodes, graph.targets[next_edges.astype(np.int64)]]))
+            self._prefetch_predictions([(int(node), departure_time) for node in batch], predictions)
+            return arrival_cost(edges, 0.0)
+        
+        return departure_cost, arrival_cost
 
 
 def get_routing_service(db: Session) -> SmartRoutingService:
     """Factory function to get routing service instance"""
     return SmartRoutingService(db)
+
+
+def _predict_all_segments():
+    """
+    Predict every segment of the current graph now (PredictedSpeeds refresh)
+    
+    Runs on the refresh thread with its own session. When the contraction
+    hierarchy serves the 'predicted' metric it is re-customized here too,
+    after the new speeds are published and off the request path.
+    """
+    db = SessionLocal()
+    try:
+        service = get_routing_service(db)
+        at_time = datetime.now()
+        speed, congestion_factor = service._predicted_speeds(at_time)
+        get_predicted_speeds().put(service.graph.version, at_time.timestamp(), speed, congestion_factor)
+        if settings.ROUTING_CH_METRIC == 'predicted':
+            try:
+                get_customized_hierarchy(
+                    service.graph,
+                    'predicted',
+                    lambda: service._static_edge_minutes(speed, congestion_factor, at_time),
+                    max_age=0
+                )
+            except SnapshotPending:
+                # Hierarchy still being built elsewhere: requests customize from these speeds
+                pass
+    finally:
+        db.close()
+
+
+def start_predicted_speeds():
+    """Compute the 'predicted' metric in the background (e.g. at startup)"""
+    get_predicted_speeds().refresh_async(_predict_all_segments)
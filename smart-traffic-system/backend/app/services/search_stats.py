@@ -0,0 +1,146 @@
+"""
+Search Statistics
+Per-request routing search counters and process-wide histograms of them
+"""
+
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+TIME_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+
+
+class SearchStats:
+    """
+    Work done by one route search
+    
+    nodes_settled, edges_relaxed and heap_pushes sum over every search
+    direction; cost_evaluations counts edge costs computed (ML cost calls
+    or profile lookups). db_queries counts statements executed on the
+    service's session while the search ran, including feature engineering.
+    """
+    
+    FIELDS = (
+        'nodes_settled', 'edges_relaxed', 'heap_pushes', 'cost_evaluations',
+        'db_queries', 'model_calls', 'predictions',
+        'feature_time_ms', 'model_time_ms', 'total_time_ms'
+    )
+    
+    def __init__(self, engine: Optional[str] = None):
+        self.engine = engine
+        self.cache_hit = False
+        self.nodes_settled = 0
+        self.edges_relaxed = 0
+        self.heap_pushes = 0
+        self.cost_evaluations = 0
+        self.db_queries = 0
+        self.model_calls = 0
+        self.predictions = 0
+        self.feature_time_ms = 0.0
+        self.model_time_ms = 0.0
+        self.total_time_ms = 0.0
+    
+    def record_search(self, settled: int, relaxed: int, pushes: int):
+        """Add the counters of one finished search"""
+        self.nodes_settled += settled
+        self.edges_relaxed += relaxed
+        self.heap_pushes += pushes
+    
+    @contextmanager
+    def count_queries(self, db: Session):
+        """Count statements executed on a session inside the block"""
+        def on_execute(orm_execute_state):
+            self.db_queries += 1
+        
+        event.listen(db, 'do_orm_execute', on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(db, 'do_orm_execute', on_execute)
+    
+    def to_dict(self) -> Dict:
+        result = {'engine': self.engine, 'cache_hit': self.cache_hit}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            result[field] = round(value, 3) if isinstance(value, float) else value
+        return result
+
+
+class SearchMetrics:
+    """
+    Histograms of SearchStats fields per engine
+    
+    Buckets are cumulative (Prometheus-style "le" upper bounds): counters
+    use powers of ten, times use TIME_BUCKETS_MS.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: Dict[str, Dict] = {}
+    
+    def observe(self, stats: SearchStats):
+        """Add one finished request"""
+        with self._lock:
+            engine = self._engines.get(stats.engine)
+            if engine is None:
+                engine = self._engines[stats.engine] = {
+                    'requests': 0,
+                    'cache_hits': 0,
+                    'fields': {
+                        field: {'counts': [0] * (len(_buckets(field)) + 1), 'sum': 0.0}
+                        for field in SearchStats.FIELDS
+                    }
+                }
+            engine['requests'] += 1
+            engine['cache_hits'] += stats.cache_hit
+            for field, histogram in engine['fields'].items():
+                value = getattr(stats, field)
+                histogram['counts'][bisect_left(_buckets(field), value)] += 1
+                histogram['sum'] += value
+    
+    def snapshot(self) -> Dict:
+        """Histograms with cumulative bucket counts, per engine"""
+        with self._lock:
+            result = {}
+            for name, engine in self._engines.items():
+                fields = {}
+                for field, histogram in engine['fields'].items():
+                    bounds = [str(bound) for bound in _buckets(field)] + ['+Inf']
+                    cumulative, buckets = 0, {}
+                    for bound, count in zip(bounds, histogram['counts']):
+                        cumulative += count
+                        buckets[bound] = cumulative
+                    fields[field] = {
+                        'buckets': buckets,
+                        'sum': round(histogram['sum'], 3),
+                        'count': engine['requests'],
+                        'mean': round(histogram['sum'] / engine['requests'], 3)
+                    }
+                result[name] = {
+                    'requests': engine['requests'],
+                    'cache_hits': engine['cache_hits'],
+                    'fields': fields
+                }
+            return result
+    
+    def reset(self):
+        with self._lock:
+            self._engines = {}
+
+
+def _buckets(field: str) -> Tuple:
+    return TIME_BUCKETS_MS if field.endswith('_ms') else COUNT_BUCKETS
+
+
+# Singleton instance
+_search_metrics = SearchMetrics()
+
+
+def get_search_metrics() -> SearchMetrics:
+    """Get the process-wide search metrics"""
+    return _search_metrics
@@ -0,0 +1,75 @@
+"""
+Segment Geometry Store
+RoadSegment start/end points and location LineStrings parsed once per graph
+build and kept as flat coordinate arrays indexed by node ID
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class SegmentGeometry:
+    """
+    Segment coordinates as they are stored in RoadSegment, in [lon, lat] order
+    
+    start and end are (num_nodes, 2) float64 arrays (NaN where unknown).
+    The LineString of node i is line_coords[line_offsets[i]:line_offsets[i + 1]].
+    Unlike the graph's start/end arrays these are not re-oriented to the
+    direction of travel, so responses show the geometry as digitised.
+    """
+    
+    def __init__(
+        self,
+        start: np.ndarray,
+        end: np.ndarray,
+        line_offsets: np.ndarray,
+        line_coords: np.ndarray
+    ):
+        self.start = start
+        self.end = end
+        self.line_offsets = line_offsets
+        self.line_coords = line_coords
+    
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'SegmentGeometry':
+        """
+        Compile segment records (see road_graph.segment_record), in node order
+        """
+        start = np.array(
+            [record.get('start_point') or (np.nan, np.nan) for record in records],
+            dtype=np.float64
+        ).reshape(-1, 2)
+        end = np.array(
+            [record.get('end_point') or (np.nan, np.nan) for record in records],
+            dtype=np.float64
+        ).reshape(-1, 2)
+        
+        lines = [record.get('line') or [] for record in records]
+        line_offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum([len(line) for line in lines], out=line_offsets[1:])
+        line_coords = np.array(
+            [position for line in lines for position in line],
+            dtype=np.float64
+        ).reshape(-1, 2)
+        return cls(start, end, line_offsets, line_coords)
+    
+    @property
+    def nbytes(self) -> int:
+        return self.start.nbytes + self.end.nbytes + self.line_offsets.nbytes + self.line_coords.nbytes
+    
+    def start_coordinates(self, node: int) -> Optional[List[float]]:
+        """startPoint of a segment as [lon, lat], None when unknown"""
+        return _position(self.start[node])
+    
+    def end_coordinates(self, node: int) -> Optional[List[float]]:
+        """endPoint of a segment as [lon, lat], None when unknown"""
+        return _position(self.end[node])
+    
+    def line(self, node: int) -> List[List[float]]:
+        """location LineString of a segment as [[lon, lat], ...] (empty when unknown)"""
+        return self.line_coords[self.line_offsets[node]:self.line_offsets[node + 1]].tolist()
+
+
+def _position(point: np.ndarray) -> Optional[List[float]]:
+    return None if np.isnan(point).any() else point.tolist()
@@ -0,0 +1,275 @@
+"""
+Spatial Index
+Uniform grids over lat/lon points and segment polylines for fixed-radius queries
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized great-circle distance in kilometers
+    
+    Accepts scalars or NumPy arrays (broadcast against each other).
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SpatialGrid:
+    """
+    Uniform grid bucketing of points
+    
+    Points are hashed to square-ish cells of `cell_size_m`; a radius query
+    only inspects the 3x3 block of cells around each query point, so bulk
+    queries cost O(n log n) (one sort plus binary searches) instead of
+    all-pairs comparisons.
+    """
+    
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, cell_size_m: float):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_size_m = float(cell_size_m)
+        
+        # Size longitude steps for the highest latitude so no cell is narrower than cell_size_m
+        max_abs_lat = float(np.max(np.abs(self.lats))) if len(self.lats) else 0.0
+        self.lat_step = self.cell_size_m / METERS_PER_DEGREE_LAT
+        self.lon_step = self.lat_step / max(math.cos(math.radians(max_abs_lat)), 0.01)
+        
+        keys = self._cell_keys(self.lats, self.lons)
+        self._order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[self._order]
+    
+    def _cells(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.floor((np.asarray(lats) + 90.0) / self.lat_step).astype(np.int64)
+        cols = np.floor((np.asarray(lons) + 180.0) / self.lon_step).astype(np.int64)
+        return rows, cols
+    
+    @staticmethod
+    def _key(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        return (rows << 32) + cols
+    
+    def _cell_keys(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        return self._key(*self._cells(lats, lons))
+    
+    def query_pairs(
+        self,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        radius_m: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find all (query, point) pairs within `radius_m` of each other
+        
+        Args:
+            lats, lons: Query coordinates
+            radius_m: Search radius in meters (must not exceed the cell size)
+        
+        Returns:
+            (query_indices, point_indices) arrays of equal length
+        """
+        if radius_m > self.cell_size_m:
+            raise ValueError(f"radius {radius_m} m exceeds grid cell size {self.cell_size_m} m")
+        
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        rows, cols = self._cells(lats, lons)
+        
+        query_parts, point_parts = [], []
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                keys = self._key(rows + d_row, cols + d_col)
+                starts = np.searchsorted(self._sorted_keys, keys, side='left')
+                ends = np.searchsorted(self._sorted_keys, keys, side='right')
+                counts = ends - starts
+                if not counts.any():
+                    continue
+                # Expand each [start, end) range into explicit candidate pairs
+                query_idx = np.repeat(np.arange(len(keys)), counts)
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                query_parts.append(query_idx)
+                point_parts.append(self._order[np.repeat(starts, counts) + offsets])
+        
+        if not query_parts:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty
+        
+        query_idx = np.concatenate(query_parts)
+        point_idx = np.concatenate(point_parts)
+        distance_m = haversine_km(
+            lats[query_idx], lons[query_idx],
+            self.lats[point_idx], self.lons[point_idx]
+        ) * 1000.0
+        within = distance_m <= radius_m
+        return query_idx[within], point_idx[within]
+    
+    def query_radius(self, lat: float, lon: float, radius_m: float) -> np.ndarray:
+        """Indices of all points within `radius_m` of a single location"""
+        _, point_idx = self.query_pairs(np.array([lat]), np.array([lon]), radius_m)
+        return point_idx
+
+
+class SegmentGrid:
+    """
+    Uniform grid over polylines for snapping geometries to road segments
+    
+    Polylines are cut into straight pieces in a local equirectangular
+    projection (meters) and every piece is bucketed into each cell its
+    bounding box overlaps. A query only measures the exact point-to-piece
+    distance for pieces in the 3x3 block of cells around each point.
+    """
+    
+    def __init__(self, offsets: np.ndarray, coords: np.ndarray, cell_size_m: float):
+        """
+        Args:
+            offsets: Polyline i is coords[offsets[i]:offsets[i + 1]]
+            coords: (n, 2) array of [lon, lat] vertices (NaN rows are skipped)
+            cell_size_m: Grid cell size, the largest radius a query may use
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        self.cell_size_m = float(cell_size_m)
+        
+        valid = ~np.isnan(coords).any(axis=1)
+        self.lon0 = float(coords[valid, 0].mean()) if valid.any() else 0.0
+        self.lat0 = float(coords[valid, 1].mean()) if valid.any() else 0.0
+        self.x_scale = METERS_PER_DEGREE_LAT * math.cos(math.radians(self.lat0))
+        x, y = self._project(coords[:, 1], coords[:, 0])
+        
+        # A piece joins vertices j and j + 1 of the same polyline; long ones
+        # are split so that no piece spans more than 2x2 cells
+        owners = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        starts = np.nonzero((owners[:-1] == owners[1:]) & valid[:-1] & valid[1:])[0]
+        splits = np.maximum(np.ceil(
+            np.hypot(x[starts + 1] - x[starts], y[starts + 1] - y[starts]) / self.cell_size_m
+        ).astype(np.int64), 1)
+        split_starts = np.repeat(starts, splits)
+        parts = np.arange(splits.sum()) - np.repeat(np.cumsum(splits) - splits, splits)
+        t0 = parts / np.repeat(splits, splits)
+        t1 = (parts + 1) / np.repeat(splits, splits)
+        dx, dy = x[split_starts + 1] - x[split_starts], y[split_starts + 1] - y[split_starts]
+        self.ax, self.ay = x[split_starts] + t0 * dx, y[split_starts] + t0 * dy
+        self.bx, self.by = x[split_starts] + t1 * dx, y[split_starts] + t1 * dy
+        self.owners = owners[split_starts]
+        
+        rows0 = np.floor(np.fmin(self.ay, self.by) / self.cell_size_m).astype(np.int64)
+        rows1 = np.floor(np.fmax(self.ay, self.by) / self.cell_size_m).astype(np.int64)
+        cols0 = np.floor(np.fmin(self.ax, self.bx) / self.cell_size_m).astype(np.int64)
+        cols1 = np.floor(np.fmax(self.ax, self.bx) / self.cell_size_m).astype(np.int64)
+        widths = cols1 - cols0 + 1
+        counts = (rows1 - rows0 + 1) * widths
+        
+        # Expand each piece into the cells of its bounding box
+        pieces = np.repeat(np.arange(len(self.owners)), counts)
+        steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        keys = SpatialGrid._key(
+            rows0[pieces] + steps // widths[pieces],
+            cols0[pieces] + steps % widths[pieces]
+        )
+        order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[order]
+        self._pieces = pieces[order]
+    
+    def _project(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        x = (np.asarray(lons, dtype=np.float64) - self.lon0) * self.x_scale
+        y = (np.asarray(lats, dtype=np.float64) - self.lat0) * METERS_PER_DEGREE_LAT
+        return x, y
+    
+    def query_pairs(
+        self,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        radius_m: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find (query, polyline) pairs within `radius_m` of each other
+        
+        Args:
+            lats, lons: Query coordinates
+            radius_m: Search radius in meters (must not exceed the cell size)
+        
+        Returns:
+            (query_indices, polyline_indices, distances in meters); a pair
+            can repeat when several pieces of a polyline are in range
+        """
+        if radius_m > self.cell_size_m:
+            raise ValueError(f"radius {radius_m} m exceeds grid cell size {self.cell_size_m} m")
+        
+        x, y = self._project(lats, lons)
+        rows = np.floor(y / self.cell_size_m).astype(np.int64)
+        cols = np.floor(x / self.cell_size_m).astype(np.int64)
+        
+        query_parts, piece_parts = [], []
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                keys = SpatialGrid._key(rows + d_row, cols + d_col)
+                starts = np.searchsorted(self._sorted_keys, keys, side='left')
+                counts = np.searchsorted(self._sorted_keys, keys, side='right') - starts
+                if not counts.any():
+                    continue
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                query_parts.append(np.repeat(np.arange(len(keys)), counts))
+                piece_parts.append(self._pieces[np.repeat(starts, counts) + offsets])
+        
+        if not query_parts:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([], dtype=np.float64)
+        
+        query_idx = np.concatenate(query_parts)
+        piece_idx = np.concatenate(piece_parts)
+        
+        # Distance to the closest point of each piece
+        px, py = x[query_idx], y[query_idx]
+        ax, ay = self.ax[piece_idx], self.ay[piece_idx]
+        dx, dy = self.bx[piece_idx] - ax, self.by[piece_idx] - ay
+        length_sq = dx * dx + dy * dy
+        t = np.clip(
+            np.divide((px - ax) * dx + (py - ay) * dy, length_sq, out=np.zeros_like(length_sq), where=length_sq > 0),
+            0.0, 1.0
+        )
+        distance_m = np.hypot(ax + t * dx - px, ay + t * dy - py)
+        within = distance_m <= radius_m
+        return query_idx[within], self.owners[piece_idx[within]], distance_m[within]
+    
+    def nearest(self, lat: float, lon: float, radius_m: float) -> Optional[int]:
+        """Closest polyline to a location, or None if none is within `radius_m`"""
+        _, polylines, distance_m = self.query_pairs(np.array([lat]), np.array([lon]), radius_m)
+        if not len(polylines):
+            return None
+        return int(polylines[np.argmin(distance_m)])
+    
+    def along(self, line: List[Tuple[float, float]], radius_m: float) -> np.ndarray:
+        """
+        Polylines within `radius_m` of a (lon, lat) line or point
+        
+        The line is sampled every `radius_m` meters, so no stretch of it is
+        further than the radius from a sample.
+        """
+        coords = np.asarray(line, dtype=np.float64).reshape(-1, 2)
+        coords = coords[~np.isnan(coords).any(axis=1)]
+        if not len(coords):
+            return np.array([], dtype=np.int64)
+        x, y = self._project(coords[:, 1], coords[:, 0])
+        
+        samples_x, samples_y = [x[:1]], [y[:1]]
+        for i in range(1, len(coords)):
+            steps = max(int(math.ceil(math.hypot(x[i] - x[i - 1], y[i] - y[i - 1]) / radius_m)), 1)
+            t = np.arange(1, steps + 1) / steps
+            samples_x.append(x[i - 1] + t * (x[i] - x[i - 1]))
+            samples_y.append(y[i - 1] + t * (y[i] - y[i - 1]))
+        sample_x, sample_y = np.concatenate(samples_x), np.concatenate(samples_y)
+        
+        _, polylines, _ = self.query_pairs(
+            sample_y / METERS_PER_DEGREE_LAT + self.lat0,
+            sample_x / self.x_scale + self.lon0,
+            radius_m
+        )
+        return np.unique(polylines)
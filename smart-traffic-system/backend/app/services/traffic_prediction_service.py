@@ -104,20 +104,60 @@ class TrafficPredictionService:
             # Use ensemble prediction (XGBoost + LightGBM + Prophet)
             result = self._predictor.predict(features)
             
-            return {
-                'predicted_speed': result['predicted_speed'],
-                'congestion_probability': result['congestion_probability'],
-                'congestion_status': self._get_status_text(result['status']),
-                'confidence_lower': result['confidence_interval'][0],
-                'confidence_upper': result['confidence_interval'][1],
-                'model_contributions': result.get('model_contributions', {}),
-                'timestamp': datetime.now()
-            }
+            return self._format_prediction(result)
             
         except Exception as e:
             print(f"❌ Prediction error: {e}")
             return self._dummy_prediction(features)
     
+    def predict_batch(
+        self,
+        features_list: List[Dict],
+        model_type: str = "ensemble"
+    ) -> List[Dict]:
+        """
+        Make traffic predictions for many feature sets with one model call
+        
+        Per-call DataFrame, scaler and booster overhead dominates single-row
+        predictions, so callers that need many predictions should batch them.
+        
+        Args:
+            features_list: List of engineered feature dictionaries
+            model_type: Type of model to use (ensemble, xgboost, lightgbm)
+        
+        Returns:
+            Prediction results in the same order as features_list
+        """
+        if not features_list:
+            return []
+        
+        if not self.is_ready():
+            return [self._dummy_prediction(features) for features in features_list]
+        
+        try:
+            if hasattr(self._predictor, 'predict_batch'):
+                results = self._predictor.predict_batch(features_list)
+            else:
+                results = [self._predictor.predict(features) for features in features_list]
+            
+            return [self._format_prediction(result) for result in results]
+        
+        except Exception as e:
+            print(f"❌ Batch prediction error: {e}")
+            return [self.predict(features, model_type) for features in features_list]
+    
+    def _format_prediction(self, result: Dict) -> Dict:
+        """Convert a TrafficPredictor result to the API prediction format"""
+        return {
+            'predicted_speed': result['predicted_speed'],
+            'congestion_probability': result['congestion_probability'],
+            'congestion_status': self._get_status_text(result['status']),
+            'confidence_lower': result['confidence_interval'][0],
+            'confidence_upper': result['confidence_interval'][1],
+            'model_contributions': result.get('model_contributions', {}),
+            'timestamp': datetime.now()
+        }
+    
     def predict_future(
         self,
         segment_id: str,
@@ -0,0 +1,225 @@
+"""
+Time-Dependent Travel Time Profiles
+Piecewise-linear speed profiles over the day (5-minute buckets) built from
+historical TrafficFlowObserved data, evaluated by interpolation during search
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.compact_graph import CompactRoadGraph
+
+BUCKET_MINUTES = 5
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES  # 288
+MIN_SPEED = 5.0  # km/h, same floor as the routing cost model
+
+
+def minute_of_day(when: datetime) -> float:
+    """Minutes since midnight, as used by TravelTimeProfiles.travel_minutes"""
+    return when.hour * 60 + when.minute + when.second / 60.0
+
+
+class TravelTimeProfiles:
+    """
+    Per-segment pace (minutes per km) at every 5-minute bucket of the day
+    
+    Segments share rows: one default row per speed limit for segments
+    without observations, plus one row per observed segment. The travel
+    time of edge u -> v leaving at minute t is the edge length times the
+    target segment's pace, linearly interpolated between buckets.
+    
+    Profiles are repaired so arrival time never decreases with departure
+    time (FIFO): over one bucket no edge's travel time may drop by more
+    than the bucket length. Label-setting time-dependent search is exact
+    under this property.
+    """
+    
+    def __init__(
+        self,
+        graph: CompactRoadGraph,
+        rows: np.ndarray,
+        pace: np.ndarray,
+        observed_segments: int = 0
+    ):
+        self.rows = rows                        # int32 row per node
+        self.pace = pace                        # float32 (num_rows, 288)
+        self.min_pace = pace.min(axis=1)        # per row, for incident delays
+        self.observed_segments = observed_segments
+        self.version = graph.version
+        self.built_at = time.time()
+        
+        self._lengths = graph.weights.astype(np.float64)
+        self._targets = graph.targets
+        self._edge_rows = rows[graph.targets]
+    
+    @classmethod
+    def build(
+        cls,
+        graph: CompactRoadGraph,
+        observations: Tuple[Sequence[str], Sequence[int], Sequence[float]],
+        default_speeds: np.ndarray
+    ) -> 'TravelTimeProfiles':
+        """
+        Build profiles from bucketed speed observations
+        
+        Args:
+            graph: Road graph
+            observations: (segment_ids, buckets 0-287, average speeds km/h)
+            default_speeds: Speed per bucket (288,) for segments without data
+        """
+        max_speed = np.maximum(graph.max_speed.astype(np.float64), MIN_SPEED)
+        segment_ids, buckets, speeds = observations
+        
+        # Default rows: one per distinct speed limit
+        limits, rows = np.unique(max_speed, return_inverse=True)
+        speed_rows = [np.minimum(default_speeds, limit) for limit in limits]
+        rows = rows.astype(np.int32)
+        
+        # Observed rows: circular interpolation between observed buckets
+        by_node: Dict[int, Dict[int, float]] = {}
+        for segment_id, bucket, speed in zip(segment_ids, buckets, speeds):
+            node = graph.index_of(segment_id)
+            if node is not None and speed is not None and 0 <= int(bucket) < BUCKETS_PER_DAY:
+                by_node.setdefault(node, {})[int(bucket)] = float(speed)
+        
+        grid = np.arange(BUCKETS_PER_DAY)
+        for node, observed in by_node.items():
+            known = np.array(sorted(observed))
+            values = np.array([observed[b] for b in known])
+            rows[node] = len(speed_rows)
+            speed_rows.append(np.minimum(np.interp(grid, known, values, period=BUCKETS_PER_DAY), max_speed[node]))
+        
+        speed_table = np.maximum(np.vstack(speed_rows), MIN_SPEED) if speed_rows \
+            else np.zeros((0, BUCKETS_PER_DAY))
+        pace = 60.0 / speed_table
+        
+        # FIFO repair for the longest edge entering each row's segments
+        longest = np.zeros(len(pace))
+        if len(graph.targets):
+            np.maximum.at(longest, rows[graph.targets], graph.weights.astype(np.float64))
+        max_drop = BUCKET_MINUTES / np.maximum(longest, 1e-6)
+        for _ in range(2):  # second pass carries the wrap-around at midnight
+            for bucket in range(BUCKETS_PER_DAY):
+                following = (bucket + 1) % BUCKETS_PER_DAY
+                pace[:, following] = np.maximum(pace[:, following], pace[:, bucket] - max_drop)
+        
+        return cls(graph, rows, pace.astype(np.float32), observed_segments=len(by_node))
+    
+    def travel_minutes(
+        self,
+        edges: np.ndarray,
+        depart_minute: float,
+        penalty: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Travel time (minutes) of CSR edges entered at a minute of the day
+        
+        Args:
+            edges: Edge indices into the graph's CSR arrays
+            depart_minute: Minutes since midnight (any real; wrapped to the day)
+            penalty: Optional per-node incident multiplier (>= 1)
+        
+        Incident penalties are applied as a constant delay of (penalty - 1)
+        times the edge's fastest travel time, which keeps FIFO intact.
+        """
+        position = (depart_minute % (24 * 60)) / BUCKET_MINUTES
+        bucket = int(position)
+        fraction = position - bucket
+        rows = self._edge_rows[edges]
+        pace = (self.pace[rows, bucket] * (1.0 - fraction) +
+                self.pace[rows, (bucket + 1) % BUCKETS_PER_DAY] * fraction)
+        lengths = self._lengths[edges]
+        minutes = lengths * pace
+        if penalty is not None:
+            minutes += (penalty[self._targets[edges]] - 1.0) * lengths * self.min_pace[rows]
+        return minutes
+    
+    def travel_minutes_many(
+        self,
+        edges: np.ndarray,
+        depart_minutes: np.ndarray,
+        penalty: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Travel times of CSR edges (rows) entered at many minutes (columns)
+        
+        Same model as travel_minutes, evaluated for every pair at once;
+        penalty, when given, is the per-edge target multiplier matrix of
+        the same shape.
+        """
+        position = (np.asarray(depart_minutes, dtype=np.float64) % (24 * 60)) / BUCKET_MINUTES
+        bucket = position.astype(np.int64)
+        fraction = position - bucket
+        rows = self._edge_rows[edges][:, None]
+        pace = (self.pace[rows, bucket] * (1.0 - fraction) +
+                self.pace[rows, (bucket + 1) % BUCKETS_PER_DAY] * fraction)
+        lengths = self._lengths[edges][:, None]
+        minutes = lengths * pace
+        if penalty is not None:
+            minutes += (penalty - 1.0) * lengths * self.min_pace[rows]
+        return minutes
+    
+    def min_travel_minutes(self, depart_minute: float, horizon: float) -> np.ndarray:
+        """
+        Lower bound on travel_minutes of every CSR edge entered within
+        `horizon` minutes after `depart_minute`
+        
+        Interpolated paces lie between the two buckets they are taken
+        from, so the fastest bucket touched by the window bounds them all.
+        """
+        if horizon >= 24 * 60:
+            row_pace = self.min_pace
+        else:
+            start = depart_minute % (24 * 60)
+            first = int(start // BUCKET_MINUTES)
+            last = int((start + horizon) // BUCKET_MINUTES) + 1
+            buckets = np.arange(first, last + 1) % BUCKETS_PER_DAY
+            row_pace = self.pace[:, buckets].min(axis=1)
+        return self._lengths * row_pace[self._edge_rows]
+
+
+_profiles_lock = threading.Lock()
+_profiles: Dict[Optional[str], TravelTimeProfiles] = {}
+
+
+def get_travel_time_profiles(
+    graph: CompactRoadGraph,
+    observations: Callable[[], Tuple[Sequence[str], Sequence[int], Sequence[float]]],
+    default_speeds: Callable[[], np.ndarray],
+    max_age: float = settings.ROUTING_PROFILE_REFRESH_INTERVAL
+) -> TravelTimeProfiles:
+    """
+    Profiles for a graph version, rebuilt from history when older than max_age
+    
+    Args:
+        graph: Road graph
+        observations: Loads (segment_ids, buckets, speeds) when a build is due
+        default_speeds: Per-bucket speeds for segments without observations
+        max_age: Seconds a build stays valid
+    """
+    profiles = _profiles.get(graph.version)
+    if profiles is not None and time.time() - profiles.built_at < max_age:
+        return profiles
+    
+    with _profiles_lock:
+        profiles = _profiles.get(graph.version)
+        if profiles is None or time.time() - profiles.built_at >= max_age:
+            started = time.time()
+            profiles = TravelTimeProfiles.build(graph, observations(), default_speeds())
+            print(f"⏱️  Travel time profiles built: {profiles.observed_segments} observed segments, "
+                  f"{len(profiles.pace)} profiles ({time.time() - started:.2f}s)")
+            _profiles.clear()
+            _profiles[graph.version] = profiles
+    return profiles
+
+
+def set_travel_time_profiles(profiles: TravelTimeProfiles):
+    """Install prebuilt profiles (e.g. from a graph snapshot) for their graph version"""
+    with _profiles_lock:
+        _profiles.clear()
+        _profiles[profiles.version] = profiles
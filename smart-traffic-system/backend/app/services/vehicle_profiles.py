@@ -0,0 +1,220 @@
+"""
+Vehicle Profiles
+Vehicle types and dimensions, and the per-segment access masks compiled from
+RoadSegment and CityWork restrictions for filtering routing edges
+"""
+
+import json
+import re
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.vehicle import Vehicle
+from app.services.compact_graph import CompactRoadGraph
+
+# Bit i of a vehicle type mask is VEHICLE_TYPES[i] (FIWARE vehicleType values)
+VEHICLE_TYPES = (
+    'car', 'motorcycle', 'moped', 'bicycle', 'van', 'bus',
+    'lorry', 'tanker', 'trailer', 'agriculturalVehicle'
+)
+ALL_VEHICLE_TYPES = (1 << len(VEHICLE_TYPES)) - 1
+
+VEHICLE_TYPE_ALIASES = {
+    'truck': 'lorry',
+    'heavygoodsvehicle': 'lorry',
+    'hgv': 'lorry',
+    'motorbike': 'motorcycle',
+    'scooter': 'moped',
+    'coach': 'bus',
+    'minibus': 'bus',
+    'cartrailer': 'trailer',
+    'carwithtrailer': 'trailer',
+    'tractor': 'agriculturalVehicle'
+}
+ALL_VEHICLES_VALUES = {'all', 'any', 'anyvehicle', 'allvehicles'}
+
+
+class VehicleProfile:
+    """Vehicle type and the dimensions a route must accommodate"""
+    
+    def __init__(self, name: str, vehicle_type: str, height_m: float, width_m: float, weight_t: float):
+        self.name = name
+        self.vehicle_type = vehicle_type
+        self.height_m = height_m
+        self.width_m = width_m
+        self.weight_t = weight_t
+    
+    @property
+    def type_bit(self) -> int:
+        return 1 << VEHICLE_TYPES.index(self.vehicle_type)
+    
+    @property
+    def key(self) -> str:
+        """Identity of the restrictions this profile is subject to"""
+        return f"{self.vehicle_type}:{self.height_m:.2f}:{self.width_m:.2f}:{self.weight_t:.2f}"
+    
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'vehicle_type': self.vehicle_type,
+            'height_m': self.height_m,
+            'width_m': self.width_m,
+            'weight_t': self.weight_t
+        }
+
+
+# Typical laden dimensions per type (height m, width m, gross weight t)
+VEHICLE_PROFILES = {
+    profile.name: profile for profile in (
+        VehicleProfile('car', 'car', 1.6, 1.9, 1.6),
+        VehicleProfile('motorcycle', 'motorcycle', 1.3, 0.9, 0.3),
+        VehicleProfile('moped', 'moped', 1.2, 0.8, 0.15),
+        VehicleProfile('bicycle', 'bicycle', 1.2, 0.7, 0.1),
+        VehicleProfile('van', 'van', 2.6, 2.1, 3.5),
+        VehicleProfile('bus', 'bus', 3.4, 2.55, 16.0),
+        VehicleProfile('lorry', 'lorry', 4.0, 2.55, 26.0),
+        VehicleProfile('tanker', 'tanker', 3.9, 2.55, 40.0),
+        VehicleProfile('trailer', 'trailer', 2.5, 2.3, 3.5),
+        VehicleProfile('agriculturalVehicle', 'agriculturalVehicle', 3.0, 2.55, 8.0)
+    )
+}
+
+
+def normalize_vehicle_type(value: Optional[str]) -> Optional[str]:
+    """Canonical VEHICLE_TYPES name of a vehicle type string, or None if unknown"""
+    if not value:
+        return None
+    folded = re.sub(r'[\s_-]', '', str(value)).lower()
+    for vehicle_type in VEHICLE_TYPES:
+        if vehicle_type.lower() == folded:
+            return vehicle_type
+    return VEHICLE_TYPE_ALIASES.get(folded)
+
+
+def _json_values(text) -> list:
+    """Flatten a JSON column (list, object or scalar) into its leaf values"""
+    if text is None:
+        return []
+    try:
+        value = json.loads(text) if isinstance(text, str) else text
+    except json.JSONDecodeError:
+        value = [part for part in re.split(r'[,;]', text) if part.strip()]
+    values, stack = [], [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif item is not None:
+            values.append(item)
+    return values
+
+
+def vehicle_type_mask(allowed_text) -> int:
+    """
+    Bitmask of the vehicle types an allowedVehicleType/allowedVehicle value permits
+    
+    Missing, empty or unrecognised values permit every type: an unknown
+    vocabulary must not close roads.
+    """
+    mask = 0
+    for value in _json_values(allowed_text):
+        if str(value).strip().lower() in ALL_VEHICLES_VALUES:
+            return ALL_VEHICLE_TYPES
+        vehicle_type = normalize_vehicle_type(value)
+        if vehicle_type is not None:
+            mask |= 1 << VEHICLE_TYPES.index(vehicle_type)
+    return mask or ALL_VEHICLE_TYPES
+
+
+def vehicle_type_names(mask: int) -> list:
+    """Type names of a mask (inverse of vehicle_type_mask)"""
+    return [vehicle_type for i, vehicle_type in enumerate(VEHICLE_TYPES) if mask & (1 << i)]
+
+
+def parse_limit(value) -> Optional[float]:
+    """First positive number in a DECIMAL or JSON limit column (None = no limit)"""
+    for item in _json_values(value) if not isinstance(value, (int, float)) else [value]:
+        try:
+            number = float(item)
+        except (TypeError, ValueError):
+            match = re.search(r'\d+(?:\.\d+)?', str(item))
+            if not match:
+                continue
+            number = float(match.group())
+        if number > 0:
+            return number
+    return None
+
+
+def profile_for_vehicle(vehicle: Vehicle) -> VehicleProfile:
+    """Routing profile of a Vehicle row: its type's dimensions plus its cargo (kg)"""
+    base = VEHICLE_PROFILES[normalize_vehicle_type(vehicle.vehicleType) or 'car']
+    cargo_t = float(vehicle.cargoWeight) / 1000.0 if vehicle.cargoWeight else 0.0
+    return VehicleProfile(vehicle.id, base.vehicle_type, base.height_m, base.width_m, base.weight_t + cargo_t)
+
+
+def resolve_vehicle_profile(
+    db: Session,
+    profile: Optional[str] = None,
+    vehicle_id: Optional[str] = None
+) -> Optional[VehicleProfile]:
+    """
+    Routing profile from a request: a Vehicle entity, else a profile name
+    
+    Returns:
+        VehicleProfile, or None when neither is given (no restrictions)
+    
+    Raises:
+        ValueError: Unknown vehicle ID or profile name
+    """
+    if vehicle_id:
+        vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+        if vehicle is None:
+            raise ValueError(f"Vehicle {vehicle_id} not found")
+        return profile_for_vehicle(vehicle)
+    if profile:
+        vehicle_type = normalize_vehicle_type(profile)
+        if vehicle_type is None:
+            raise ValueError(f"Unknown vehicle profile {profile} (use one of: {', '.join(VEHICLE_PROFILES)})")
+        return VEHICLE_PROFILES[vehicle_type]
+    return None
+
+
+def node_access(graph: CompactRoadGraph, profile: VehicleProfile) -> Optional[np.ndarray]:
+    """
+    Segments a vehicle may enter, as a boolean per node (None = all of them)
+    
+    One bitwise test on the compiled type mask plus three limit
+    comparisons, vectorised over the graph and memoised per profile.
+    """
+    def build():
+        allowed = (graph.vehicle_types & profile.type_bit) != 0
+        allowed &= graph.max_height >= profile.height_m
+        allowed &= graph.max_width >= profile.width_m
+        allowed &= graph.max_weight >= profile.weight_t
+        return (None if allowed.all() else allowed,)
+    
+    return graph.get_precomputed(f'vehicle_nodes:{profile.key}', build)[0]
+
+
+def edge_access(graph: CompactRoadGraph, profile: VehicleProfile) -> Optional[np.ndarray]:
+    """Edges a vehicle may take (into segments it may enter), boolean per CSR edge"""
+    def build():
+        allowed = node_access(graph, profile)
+        return (None if allowed is None else allowed[graph.targets],)
+    
+    return graph.get_precomputed(f'vehicle_edges:{profile.key}', build)[0]
+
+
+def incident_blocks(incident: Dict, profile: VehicleProfile) -> bool:
+    """Whether an incident's vehicle restrictions (CityWork allowedVehicle/maxAuthorizedTonnage) exclude a vehicle"""
+    allowed = incident.get('allowed_vehicles')
+    if allowed and profile.vehicle_type not in allowed:
+        return True
+    tonnage = incident.get('max_tonnage')
+    return tonnage is not None and profile.weight_t > tonnage
+
@@ -0,0 +1 @@
+"""Routing benchmarks on synthetic road networks"""
@@ -0,0 +1,569 @@
+"""
+Routing Benchmark
+Times SmartRoutingService on synthetic networks backed by in-memory SQLite,
+and exits with status 1 when search modes that must agree on travel times
+do not
+
+Usage (from backend/):
+    python -m benchmarks.routing_benchmark --sizes 1000 10000 --output results.json
+    python -m benchmarks.routing_benchmark --output new.json --compare results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.batch_routing import Trip, attach_snapshot, chunk_groups, export_snapshot, group_trips
+from app.services.contraction_hierarchy import get_contraction_hierarchy
+from app.services.graph_cache import get_graph_cache
+from app.services.graph_search import one_to_all
+from app.services.road_graph import build_road_graph
+from app.services.incident_index import IncidentIndex
+from app.services.routing_service import SmartRoutingService
+from app.services.search_stats import SearchStats
+from app.services.travel_time_profiles import BUCKETS_PER_DAY
+from benchmarks.synthetic_network import NETWORKS, bucket_speeds, incidents
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+# (name, find_optimal_route keyword arguments)
+ROUTE_MODES = (
+    ('td/geo', {'engine': 'td', 'heuristic': 'geo'}),
+    ('td/none', {'engine': 'td', 'heuristic': 'none'}),
+    ('td/alt', {'engine': 'td', 'heuristic': 'alt'}),
+    ('td/geo/bidirectional', {'engine': 'td', 'heuristic': 'geo', 'bidirectional': True}),
+    ('astar/geo', {'engine': 'astar', 'heuristic': 'geo'}),
+    ('astar/geo/bidirectional', {'engine': 'astar', 'heuristic': 'geo', 'bidirectional': True}),
+    ('ch', {'engine': 'ch'})
+)
+
+# Route modes that must find the same travel time (exact searches on one cost model)
+AGREEING_MODES = (
+    ('td/none', 'td/geo', 'td/alt', 'td/geo/bidirectional'),
+    ('astar/geo', 'astar/geo/bidirectional')
+)
+AGREEMENT_TOLERANCE_MIN = 1e-3
+
+
+class SyntheticFeatureService:
+    """
+    FeatureEngineeringService stand-in reading a SQLite speed history
+    
+    Same interface and query shapes as the real service (one grouped query
+    for bucket/baseline speeds, one query per engineer_features call), so
+    the search statistics count comparable DB round trips. Like the real
+    features, engineer_features depends on time only through the hour (the
+    granularity SmartRoutingService caches predictions at).
+    """
+    
+    def __init__(self, db: Session, history: Tuple[List[str], List[int], List[float]]):
+        self.db = db
+        db.execute(text("CREATE TABLE BucketSpeed (RefRoadSegment TEXT, Bucket INTEGER, Speed REAL)"))
+        if history[0]:
+            db.execute(
+                text("INSERT INTO BucketSpeed VALUES (:segment, :bucket, :speed)"),
+                [{'segment': s, 'bucket': b, 'speed': v} for s, b, v in zip(*history)]
+            )
+        db.execute(text("CREATE INDEX ix_bucket_speed ON BucketSpeed (RefRoadSegment, Bucket)"))
+        db.commit()
+    
+    def get_bucket_speeds(self, days: int, bucket_minutes: int) -> Tuple[List[str], List[int], List[float]]:
+        rows = self.db.execute(text("SELECT RefRoadSegment, Bucket, Speed FROM BucketSpeed")).all()
+        return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+    
+    def get_baseline_speeds(self, hour: int, day_of_week: int) -> Dict[str, float]:
+        per_hour = BUCKETS_PER_DAY // 24
+        rows = self.db.execute(
+            text("""
+                SELECT RefRoadSegment, AVG(Speed) FROM BucketSpeed
+                WHERE Bucket >= :first AND Bucket < :last
+                GROUP BY RefRoadSegment
+            """),
+            {'first': hour * per_hour, 'last': (hour + 1) * per_hour}
+        ).all()
+        return {row[0]: float(row[1]) for row in rows}
+    
+    def _default_baseline_speed(self, hour: int) -> float:
+        if hour in [7, 8, 17, 18]:
+            return 15.0
+        elif hour >= 22 or hour <= 6:
+            return 35.0
+        else:
+            return 25.0
+    
+    def engineer_features(self, segment_id: str, target_datetime: Optional[datetime] = None) -> Optional[Dict]:
+        target_datetime = target_datetime or datetime.now()
+        per_hour = BUCKETS_PER_DAY // 24
+        speed = self.db.execute(
+            text("""
+                SELECT AVG(Speed) FROM BucketSpeed
+                WHERE RefRoadSegment = :segment AND Bucket >= :first AND Bucket < :last
+            """),
+            {'segment': segment_id, 'first': target_datetime.hour * per_hour, 'last': (target_datetime.hour + 1) * per_hour}
+        ).scalar()
+        if speed is None:
+            return None
+        return {
+            'segment_id': segment_id,
+            'hour': target_datetime.hour,
+            'day_of_week': target_datetime.weekday(),
+            'baseline_speed': float(speed)
+        }
+
+
+class SyntheticPredictionService:
+    """TrafficPredictionService stand-in: baseline speed with a fixed slowdown"""
+    
+    def is_ready(self) -> bool:
+        return True
+    
+    def predict_batch(self, features_list: List[Dict], model_type: str = "ensemble") -> List[Dict]:
+        return [
+            {
+                'predicted_speed': features['baseline_speed'] * 0.9,
+                'congestion_probability': min(max(1.0 - features['baseline_speed'] / 50.0, 0.0), 1.0)
+            }
+            for features in features_list
+        ]
+
+
+class BenchmarkRoutingService(SmartRoutingService):
+    """SmartRoutingService over a prebuilt graph, incident index and stand-in services"""
+    
+    def __init__(self, db: Session, graph, incident_index: IncidentIndex, feature_service: SyntheticFeatureService):
+        self.db = db
+        self.prediction_service = SyntheticPredictionService()
+        self.feature_service = feature_service
+        self.graph = graph
+        self.incident_index = incident_index
+        self.search_stats = SearchStats()
+
+
+def _timings(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'total_ms': round(sum(ordered), 3)
+    }
+
+
+def _timed(fn: Callable):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def _run_calls(
+    calls: List[Callable],
+    success: Callable[[object], bool],
+    stats_of=None,
+    results: Optional[List] = None
+) -> Dict:
+    """
+    Time calls one by one; the first is reported apart from the rest
+    
+    The first call of a mode pays for lazy precomputation (profiles,
+    landmarks, hierarchy, segment grid), so it is the warm-up figure.
+    Results are appended to `results` when given.
+    """
+    samples, succeeded, search_stats = [], 0, []
+    for call in calls:
+        result, elapsed = _timed(call)
+        if results is not None:
+            results.append(result)
+        samples.append(elapsed)
+        succeeded += bool(success(result))
+        if stats_of is not None:
+            search_stats.append(stats_of(result))
+    
+    report = {
+        'first_ms': round(samples[0], 3),
+        'succeeded': succeeded,
+        'warm': _timings(samples[1:]) if len(samples) > 1 else None
+    }
+    if search_stats:
+        report['search_stats_mean'] = {
+            field: round(statistics.fmean(stats[field] for stats in search_stats), 3)
+            for field in SearchStats.FIELDS
+        }
+    return report
+
+
+def _route_minutes(result: Dict, departure: datetime) -> Optional[float]:
+    """Unrounded travel time of a route result (None if no route was found)"""
+    if not result.get('success'):
+        return None
+    return (datetime.fromisoformat(result['estimated_arrival_time']) - departure).total_seconds() / 60.0
+
+
+def check_agreement(results: Dict[str, List[Dict]], pairs: List[Tuple[str, str]], departure: datetime) -> List[str]:
+    """Disagreements between route modes of AGREEING_MODES on the same pairs"""
+    mismatches = []
+    for modes in AGREEING_MODES:
+        ran = [name for name in modes if name in results]
+        for i, (origin, destination) in enumerate(pairs):
+            minutes = {name: _route_minutes(results[name][i], departure) for name in ran}
+            reference = minutes[ran[0]] if ran else None
+            for name in ran[1:]:
+                found = minutes[name]
+                if (found is None) != (reference is None) or (
+                        found is not None and abs(found - reference) > AGREEMENT_TOLERANCE_MIN):
+                    mismatches.append(f"{origin} -> {destination}: {ran[0]} {reference} min, {name} {found} min")
+    return mismatches
+
+
+def check_hierarchy(service: 'BenchmarkRoutingService', graph, pairs: List[Tuple[str, str]], at_time: datetime) -> List[str]:
+    """Pairs where the contraction hierarchy disagrees with Dijkstra on the ROUTING_CH_METRIC weights"""
+    weights = service._edge_minutes(settings.ROUTING_CH_METRIC, at_time)
+    hierarchy = get_contraction_hierarchy(graph).customize(graph, weights, settings.ROUTING_CH_METRIC)
+    mismatches = []
+    for origin, destination in pairs:
+        source, target = graph.index_of(origin), graph.index_of(destination)
+        expected = float(one_to_all(graph.offsets, graph.targets, weights, source)[target])
+        found = hierarchy.query(source, target)
+        minutes = np.inf if found is None else found[0]
+        if minutes != expected and not abs(minutes - expected) <= AGREEMENT_TOLERANCE_MIN:
+            mismatches.append(f"{origin} -> {destination}: ch {minutes} min, dijkstra {expected} min")
+    return mismatches
+
+
+# Per-process state of batch jobs: snapshot -> (graph, incident index)
+_batch_state: Dict[str, Tuple] = {}
+
+
+def _batch_job(snapshot: str, incident_intervals: Dict, trips: Dict[int, Trip], groups: List[List[int]]) -> int:
+    """
+    One /routing/find-routes job, as batch_routing.route_groups runs it
+    
+    Worker processes attach the snapshot once; the benchmark's own
+    process (sequential and thread runs) seeds _batch_state with its graph.
+    Returns the number of routes found.
+    """
+    if snapshot not in _batch_state:
+        attach_snapshot(snapshot)
+        graph = get_graph_cache().get_graph(None)
+        _batch_state[snapshot] = (graph, IncidentIndex(graph, incident_intervals, "bench-batch"))
+    graph, incident_index = _batch_state[snapshot]
+    
+    db = Session(create_engine('sqlite://'))
+    service = BenchmarkRoutingService(db, graph, incident_index, SyntheticFeatureService(db, ([], [], [])))
+    found = 0
+    for group in groups:
+        results = service.find_routes_from(
+            trips[group[0]][0], [trips[index][1] for index in group], [trips[index][2] for index in group]
+        )
+        found += sum(result['success'] for result in results)
+    db.close()
+    return found
+
+
+def _run_batch(executor: Optional[Executor], jobs: List[Tuple]) -> Tuple[float, int]:
+    """Wall time (ms) and routes found for batch jobs, inline when executor is None"""
+    started = time.perf_counter()
+    if executor is None:
+        found = sum(_batch_job(*job) for job in jobs)
+    else:
+        found = sum(future.result() for future in [executor.submit(_batch_job, *job) for job in jobs])
+    return (time.perf_counter() - started) * 1000.0, found
+
+
+def benchmark_batch(graph, service: 'BenchmarkRoutingService', incident_index: IncidentIndex,
+                    incident_intervals: Dict, departure: datetime, rng, args: argparse.Namespace) -> Dict:
+    """
+    Time a /routing/find-routes batch inline, on threads and on worker processes
+    
+    Jobs are the endpoint's chunks of trip groups. Threads share the GIL
+    with each other (and, in the API, with interactive routing); worker
+    processes attach the exported graph and profile snapshot instead.
+    """
+    nodes = rng.choice(graph.num_nodes, size=min(args.batch_origins * 2, graph.num_nodes), replace=False)
+    origins, destinations = nodes[:args.batch_origins], nodes[args.batch_origins:]
+    trips = [
+        (graph.segment_id(int(origin)), graph.segment_id(int(destination)), departure)
+        for origin in origins
+        for destination in rng.choice(destinations, size=min(8, len(destinations)), replace=False)
+    ]
+    snapshot, export_ms = _timed(lambda: export_snapshot(graph, service._travel_time_profiles()))
+    jobs = [
+        (snapshot, incident_intervals, {index: trips[index] for group in groups for index in group}, groups)
+        for groups in chunk_groups(group_trips(trips), settings.ROUTING_BATCH_GROUPS_PER_JOB)
+    ]
+    _batch_state[snapshot] = (graph, incident_index)
+    
+    workers = settings.ROUTING_BATCH_JOBS
+    sequential_ms, found = _run_batch(None, jobs)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        threads_ms, _ = _run_batch(executor, jobs)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        processes_first_ms, _ = _run_batch(executor, jobs)
+        processes_ms, _ = _run_batch(executor, jobs)
+    del _batch_state[snapshot]
+    
+    return {
+        'trips': len(trips),
+        'jobs': len(jobs),
+        'workers': workers,
+        'cpus': multiprocessing.cpu_count(),
+        'succeeded': found,
+        'snapshot_export_ms': round(export_ms, 3),
+        'sequential_ms': round(sequential_ms, 3),
+        'threads_ms': round(threads_ms, 3),
+        'processes_first_ms': round(processes_first_ms, 3),
+        'processes_ms': round(processes_ms, 3),
+        'threads_speedup': round(sequential_ms / threads_ms, 3),
+        'processes_speedup': round(sequential_ms / processes_ms, 3)
+    }
+
+
+def benchmark_network(network: str, segments: int, args: argparse.Namespace) -> Dict:
+    """Build one synthetic network and time every routing operation on it"""
+    rng = np.random.default_rng(args.seed)
+    departure = datetime(2026, 1, 6, 7, 45)  # Tuesday morning rush hour
+    
+    records, generate_ms = _timed(lambda: NETWORKS[network](segments, seed=args.seed))
+    graph, build_ms = _timed(lambda: build_road_graph(records, version=f"bench-{network}-{segments}-{args.seed}"))
+    history = bucket_speeds(records, seed=args.seed)
+    incident_intervals = incidents(records, departure, seed=args.seed)
+    incident_index, incident_ms = _timed(
+        lambda: IncidentIndex(graph, incident_intervals, f"bench-incidents-{args.seed}")
+    )
+    
+    db = Session(create_engine('sqlite://'))
+    service = BenchmarkRoutingService(db, graph, incident_index, SyntheticFeatureService(db, history))
+    del records
+    
+    report = {
+        'network': network,
+        'requested_segments': segments,
+        'segments': graph.num_nodes,
+        'edges': int(len(graph.targets)),
+        'incident_segments': len(incident_intervals),
+        'observed_segments': len(set(history[0])),
+        'generate_ms': round(generate_ms, 3),
+        'graph_build_ms': round(build_ms, 3),
+        'incident_index_ms': round(incident_ms, 3),
+        'routes': {},
+        'skipped': []
+    }
+    
+    pairs = [
+        (graph.segment_id(int(a)), graph.segment_id(int(b)))
+        for a, b in rng.integers(0, graph.num_nodes, size=(args.queries, 2))
+    ]
+    route_ok = lambda result: result['success']
+    route_results: Dict[str, List[Dict]] = {}
+    
+    for name, options in ROUTE_MODES:
+        limit = args.max_ch_segments if options['engine'] == 'ch' else (
+            args.max_astar_segments if options['engine'] == 'astar' else args.max_td_segments
+        )
+        if options.get('heuristic') == 'alt':
+            limit = min(limit, args.max_alt_segments)
+        if graph.num_nodes > limit:
+            report['skipped'].append(name)
+            continue
+        report['routes'][name] = _run_calls(
+            [
+                lambda origin=origin, destination=destination: service.find_optimal_route(
+                    origin, destination, departure, **options
+                )
+                for origin, destination in pairs
+            ],
+            route_ok,
+            lambda result: result.get('search_stats') or SearchStats().to_dict(),
+            route_results.setdefault(name, [])
+        )
+        route_stats = report['routes'][name]['search_stats_mean']
+        _progress(f"  {name}: {report['routes'][name]['first_ms']:.1f} ms first, "
+                  f"{route_stats['nodes_settled']:.0f} settled, "
+                  f"{route_stats['cost_evaluations']:.0f} cost evaluations, "
+                  f"{route_stats['model_calls']:.0f} model calls per query")
+    
+    # Exact modes must agree with each other, and the hierarchy with Dijkstra
+    mismatches = check_agreement(route_results, pairs, departure)
+    if 'ch' in route_results:
+        mismatches += check_hierarchy(service, graph, pairs, departure)
+    report['agreement'] = {'pairs': len(pairs), 'mismatches': mismatches}
+    _progress(f"  agreement: {len(mismatches)} mismatches over {len(pairs)} pairs")
+    
+    if graph.num_nodes <= args.max_td_segments:
+        report['alternatives'] = _run_calls(
+            [
+                lambda origin=origin, destination=destination: service.find_alternative_routes(
+                    origin, destination, departure, num_routes=3, engine='td'
+                )
+                for origin, destination in pairs[:max(args.queries // 4, 2)]
+            ],
+            lambda routes: bool(routes) and routes[0]['success']
+        )
+        
+        matrix_nodes = rng.choice(graph.num_nodes, size=min(args.matrix_size * 2, graph.num_nodes), replace=False)
+        origins = [graph.segment_id(int(node)) for node in matrix_nodes[:args.matrix_size]]
+        destinations = [graph.segment_id(int(node)) for node in matrix_nodes[args.matrix_size:]]
+        report['matrix'] = {
+            'origins': len(origins),
+            'destinations': len(destinations),
+            **_run_calls(
+                [
+                    lambda: service.compute_travel_time_matrix(origins, destinations, departure, engine='td'),
+                    lambda: service.compute_travel_time_matrix(
+                        origins, destinations,
+                        departure_times=[departure + timedelta(minutes=15 * i) for i in range(len(origins))],
+                        engine='td'
+                    ),
+                    lambda: service.compute_travel_time_matrix(origins, destinations, departure, engine='td')
+                ],
+                lambda result: result['success']
+            )
+        }
+        
+        report['isochrone'] = _run_calls(
+            [
+                lambda origin=origin: service.compute_isochrone(origin, args.budgets, departure, engine='td')
+                for origin, _ in pairs[:max(args.queries // 4, 2)]
+            ],
+            lambda result: result['success']
+        )
+        
+        report['best_departure'] = _run_calls(
+            [
+                lambda origin=origin, destination=destination: service.find_best_departure(
+                    origin, destination, departure - timedelta(minutes=75), departure + timedelta(minutes=75)
+                )
+                for origin, destination in pairs[:max(args.queries // 4, 2)]
+            ],
+            lambda result: result['success'],
+            lambda result: result.get('search_stats') or SearchStats().to_dict()
+        )
+        
+        report['batch'] = benchmark_batch(graph, service, incident_index, incident_intervals, departure, rng, args)
+        batch = report['batch']
+        _progress(f"  batch: {batch['trips']} trips in {batch['jobs']} jobs, {batch['sequential_ms']:.0f} ms inline, "
+                  f"{batch['threads_ms']:.0f} ms on {batch['workers']} threads, "
+                  f"{batch['processes_ms']:.0f} ms on {batch['workers']} processes "
+                  f"({batch['processes_first_ms']:.0f} ms with start-up), {batch['cpus']} CPUs")
+    else:
+        report['skipped'].extend(['alternatives', 'matrix', 'isochrone', 'best_departure', 'batch'])
+    
+    db.close()
+    return report
+
+
+def compare(current: Dict, previous: Dict) -> List[str]:
+    """Lines comparing warm median times of matching benchmarks (ratio < 1 is faster)"""
+    def medians(results: Dict) -> Dict[str, float]:
+        found = {}
+        for run in results['runs']:
+            prefix = f"{run['network']}/{run['requested_segments']}"
+            found[f"{prefix} graph_build"] = run['graph_build_ms']
+            sections = [(f"route {name}", section) for name, section in run['routes'].items()]
+            sections += [(name, run[name]) for name in ('alternatives', 'matrix', 'isochrone', 'best_departure')
+                         if name in run]
+            for name, section in sections:
+                if section.get('warm'):
+                    found[f"{prefix} {name}"] = section['warm']['median_ms']
+        return found
+    
+    before, after = medians(previous), medians(current)
+    lines = []
+    for key in sorted(after.keys() & before.keys()):
+        ratio = after[key] / before[key] if before[key] else float('inf')
+        lines.append(f"{key:55s} {before[key]:12.2f} -> {after[key]:12.2f} ms  x{ratio:.2f}")
+    return lines
+
+
+def _progress(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark SmartRoutingService on synthetic road networks")
+    parser.add_argument('--networks', nargs='+', choices=sorted(NETWORKS), default=sorted(NETWORKS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES), help="segments per network")
+    parser.add_argument('--queries', type=int, default=20, help="origin/destination pairs per route mode")
+    parser.add_argument('--matrix-size', type=int, default=25, help="origins (and destinations) per matrix")
+    parser.add_argument('--budgets', nargs='+', type=float, default=[10.0, 20.0, 30.0], help="isochrone budgets (min)")
+    parser.add_argument('--batch-origins', type=int, default=48, help="origins (8 trips each) per batch")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-td-segments', type=int, default=1000000, help="skip td searches above this size")
+    parser.add_argument('--max-astar-segments', type=int, default=100000, help="skip ML (astar) searches above this size")
+    parser.add_argument('--max-alt-segments', type=int, default=100000, help="skip ALT landmarks above this size")
+    parser.add_argument('--max-ch-segments', type=int, default=20000, help="skip hierarchy contraction above this size")
+    parser.add_argument('--output', help="write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="previous JSON results to compare warm medians against")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    
+    # Every search must run: no result cache, and no precomputation from earlier runs
+    settings.ENABLE_CACHE = False
+    cache_dir = tempfile.TemporaryDirectory(prefix="routing-benchmark-")
+    settings.ROUTING_CACHE_DIR = cache_dir.name
+    
+    runs = []
+    try:
+        for network in args.networks:
+            for segments in args.sizes:
+                _progress(f"{network} {segments} segments")
+                runs.append(benchmark_network(network, segments, args))
+    finally:
+        cache_dir.cleanup()
+    
+    results = {
+        'created_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor()
+        },
+        'parameters': {
+            key: value for key, value in vars(args).items() if key not in ('output', 'compare')
+        },
+        'runs': runs
+    }
+    
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        for line in compare(results, previous):
+            _progress(line)
+    
+    mismatches = [
+        f"{run['network']}/{run['requested_segments']} {mismatch}"
+        for run in runs for mismatch in run['agreement']['mismatches']
+    ]
+    if mismatches:
+        for line in mismatches:
+            _progress(f"MISMATCH {line}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Synthetic Road Networks
+Seeded grid and radial city networks in the segment record format of
+road_graph.segment_record, plus speed histories and incidents for them
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.travel_time_profiles import BUCKET_MINUTES, BUCKETS_PER_DAY
+from app.services.spatial_index import METERS_PER_DEGREE_LAT
+
+# Ho Chi Minh City centre
+CENTER_LON = 106.70
+CENTER_LAT = 10.78
+
+ROAD_CLASSES = (
+    # (roadClass, maximumAllowedSpeed, lanes, share of segments)
+    ('Primary', 60.0, 4, 0.15),
+    ('Secondary', 50.0, 3, 0.35),
+    ('Tertiary', 40.0, 2, 0.50)
+)
+
+
+def _record(
+    segment_id: str,
+    start: Tuple[float, float],
+    end: Tuple[float, float],
+    road_class: int,
+    oneway: bool
+) -> Dict:
+    name, max_speed, lanes, _ = ROAD_CLASSES[road_class]
+    length = _length_m(start, end)
+    middle = ((start[0] + end[0]) / 2.0, (start[1] + end[1]) / 2.0)
+    return {
+        'id': segment_id,
+        'name': f"{name} {segment_id}",
+        'length': length,
+        'total_lanes': lanes,
+        'max_speed': max_speed,
+        'road_class': name,
+        'start': start,
+        'end': end,
+        'start_point': start,
+        'end_point': end,
+        'line': [start, middle, end],
+        'oneway': oneway,
+        'date_modified': None
+    }
+
+
+def _length_m(start: Tuple[float, float], end: Tuple[float, float]) -> float:
+    d_east = (end[0] - start[0]) * METERS_PER_DEGREE_LAT * math.cos(math.radians(start[1]))
+    d_north = (end[1] - start[1]) * METERS_PER_DEGREE_LAT
+    return math.hypot(d_east, d_north)
+
+
+def _road_classes(rng: np.random.Generator, count: int) -> np.ndarray:
+    shares = [share for _, _, _, share in ROAD_CLASSES]
+    return rng.choice(len(ROAD_CLASSES), size=count, p=shares)
+
+
+def grid_network(segments: int, seed: int = 42, spacing_m: float = 150.0, oneway_share: float = 0.2) -> Dict[str, Dict]:
+    """
+    Manhattan grid with about `segments` road segments
+    
+    Intersections form an n x n lattice `spacing_m` apart, every lattice
+    edge is one segment; `oneway_share` of them are one-way.
+    """
+    rng = np.random.default_rng(seed)
+    n = max(int(math.ceil((1.0 + math.sqrt(1.0 + 2.0 * segments)) / 2.0)), 2)
+    lat_step = spacing_m / METERS_PER_DEGREE_LAT
+    lon_step = lat_step / math.cos(math.radians(CENTER_LAT))
+    origin_lon = CENTER_LON - lon_step * (n - 1) / 2.0
+    origin_lat = CENTER_LAT - lat_step * (n - 1) / 2.0
+    
+    def point(row: int, col: int) -> Tuple[float, float]:
+        return (origin_lon + col * lon_step, origin_lat + row * lat_step)
+    
+    pairs = [((row, col), (row, col + 1)) for row in range(n) for col in range(n - 1)]
+    pairs += [((row, col), (row + 1, col)) for row in range(n - 1) for col in range(n)]
+    pairs = pairs[:segments]
+    classes = _road_classes(rng, len(pairs))
+    oneway = rng.random(len(pairs)) < oneway_share
+    flip = rng.random(len(pairs)) < 0.5
+    
+    records = {}
+    for i, (a, b) in enumerate(pairs):
+        start, end = (point(*b), point(*a)) if flip[i] else (point(*a), point(*b))
+        segment_id = f"grid_{i:07d}"
+        records[segment_id] = _record(segment_id, start, end, int(classes[i]), bool(oneway[i]))
+    return records
+
+
+def radial_network(segments: int, seed: int = 42, ring_spacing_m: float = 250.0, oneway_share: float = 0.2) -> Dict[str, Dict]:
+    """
+    Ring-and-spoke network with about `segments` road segments
+    
+    Spokes leave the centre and are cut into one segment per ring gap;
+    rings are cut into one segment per spoke gap. Spokes are arterial
+    (Primary), rings get random classes.
+    """
+    rng = np.random.default_rng(seed)
+    spokes = max(int(math.sqrt(segments / 2.0)), 4)
+    rings = max(segments // (2 * spokes), 1)
+    
+    def point(ring: int, spoke: int) -> Tuple[float, float]:
+        radius_m = ring * ring_spacing_m
+        angle = 2.0 * math.pi * spoke / spokes
+        return (
+            CENTER_LON + radius_m * math.cos(angle) / (METERS_PER_DEGREE_LAT * math.cos(math.radians(CENTER_LAT))),
+            CENTER_LAT + radius_m * math.sin(angle) / METERS_PER_DEGREE_LAT
+        )
+    
+    pairs = [((ring, spoke), (ring + 1, spoke)) for spoke in range(spokes) for ring in range(rings)]
+    spoke_count = len(pairs)
+    pairs += [((ring, spoke), (ring, (spoke + 1) % spokes)) for ring in range(1, rings + 1) for spoke in range(spokes)]
+    classes = _road_classes(rng, len(pairs))
+    classes[:spoke_count] = 0
+    oneway = rng.random(len(pairs)) < oneway_share
+    
+    records = {}
+    for i, (a, b) in enumerate(pairs):
+        segment_id = f"radial_{i:07d}"
+        records[segment_id] = _record(segment_id, point(*a), point(*b), int(classes[i]), bool(oneway[i]))
+    return records
+
+
+def bucket_speeds(
+    records: Dict[str, Dict],
+    seed: int = 42,
+    observed_share: float = 0.6
+) -> Tuple[List[str], List[int], List[float]]:
+    """
+    History in the format of FeatureEngineeringService.get_bucket_speeds
+    
+    Observed segments get a morning and evening rush-hour dip of random
+    depth on top of 85% of the speed limit, with noise.
+    """
+    rng = np.random.default_rng(seed)
+    segment_ids = sorted(records)
+    observed = [segment_id for segment_id in segment_ids if rng.random() < observed_share]
+    
+    minutes = np.arange(BUCKETS_PER_DAY) * BUCKET_MINUTES
+    rush = (np.exp(-((minutes - 8 * 60) / 60.0) ** 2) + np.exp(-((minutes - 17.5 * 60) / 75.0) ** 2))
+    
+    ids, buckets, speeds = [], [], []
+    for segment_id in observed:
+        limit = records[segment_id]['max_speed']
+        depth = rng.uniform(0.2, 0.7)
+        profile = limit * 0.85 * (1.0 - depth * rush) * rng.normal(1.0, 0.05, BUCKETS_PER_DAY)
+        ids.extend([segment_id] * BUCKETS_PER_DAY)
+        buckets.extend(range(BUCKETS_PER_DAY))
+        speeds.extend(np.clip(profile, 5.0, limit).tolist())
+    return ids, buckets, speeds
+
+
+def incidents(
+    records: Dict[str, Dict],
+    now: datetime,
+    seed: int = 42,
+    share: float = 0.005
+) -> Dict[str, List[Tuple[float, float, Dict]]]:
+    """
+    Construction zones and accidents as IncidentIndex intervals
+    
+    About `share` of the segments get one incident; two thirds are
+    construction (days long), one third accidents (90 minutes), all
+    starting within the last hour or the next two hours.
+    """
+    rng = np.random.default_rng(seed)
+    segment_ids = sorted(records)
+    count = max(int(len(segment_ids) * share), 1)
+    
+    intervals: Dict[str, List[Tuple[float, float, Dict]]] = {}
+    for i, index in enumerate(rng.choice(len(segment_ids), size=count, replace=False)):
+        start = now + timedelta(minutes=float(rng.uniform(-60, 120)))
+        if i % 3 == 2:
+            end = start + timedelta(minutes=90)
+            incident = {'type': 'accident', 'id': f"accident_{i}", 'start': start, 'end': end,
+                        'state': 'onGoing', 'severity': int(rng.integers(1, 5))}
+        else:
+            end = start + timedelta(days=int(rng.integers(1, 30)))
+            incident = {'type': 'construction', 'id': f"work_{i}", 'start': start, 'end': end, 'state': 'open'}
+        intervals.setdefault(segment_ids[index], []).append((start.timestamp(), end.timestamp(), incident))
+    return intervals
+
+
+NETWORKS = {
+    'grid': grid_network,
+    'radial': radial_network
+}
@@ -16,6 +16,8 @@ sys.path.append(str(Path(__file__).parent))
 
 from app.core.config import settings
 from app.api.v1 import api_router
+from app.services.graph_cache import get_graph_cache
+from app.services.routing_service import start_predicted_speeds
 
 # Create FastAPI app
 app = FastAPI(
@@ -37,6 +39,20 @@ app.add_middleware(
 )
 
 
+# Offline-built road graph, so workers start without reading RoadSegment
+@app.on_event("startup")
+async def load_graph_snapshot():
+    if settings.ROUTING_GRAPH_SNAPSHOT:
+        get_graph_cache().load_snapshot(Path(settings.ROUTING_GRAPH_SNAPSHOT))
+
+
+# Whole-network predictions for the 'predicted' metric, computed off the request path
+@app.on_event("startup")
+async def start_predicted_metric():
+    if settings.ROUTING_CH_METRIC == 'predicted':
+        start_predicted_speeds()
+
+
 # Request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
@@ -73,55 +73,70 @@ class TrafficPredictor:
             }
         """
         
-        # 1. Convert to DataFrame
-        df = pd.DataFrame([features_dict])
-        
-        # 2. Ensure all feature columns exist
-        for col in self.feature_cols:
-            if col not in df.columns:
-                df[col] = 0  # Default value
-        
-        # Select only model features in correct order
-        X = df[self.feature_cols]
-        
-        # 3. Scale features
-        X_scaled = self.scaler.transform(X)
+        return self.predict_batch([features_dict])[0]
+    
+    def predict_batch(self, features_list):
+        """
+        Make predictions for many feature dictionaries at once
         
-        # 4. XGBoost: Congestion probability
-        congestion_prob = self.xgb_model.predict_proba(X_scaled)[0][1]
+        Same ensemble as predict(), but with one DataFrame, one scaler
+        transform and one call per model for the whole batch
         
-        # 5. LightGBM: Speed prediction
-        speed_lgbm = self.lgb_model.predict(X_scaled)[0]
+        Args:
+            features_list: List of feature dictionaries
         
-        # 6. Weighted ensemble (60% LightGBM, 40% baseline)
-        final_speed = 0.60 * speed_lgbm + 0.40 * features_dict.get('speed_baseline', speed_lgbm)
+        Returns:
+            List of prediction dictionaries (same format as predict)
+        """
         
-        # 7. Adjust based on congestion
-        if congestion_prob > 0.7:
-            final_speed *= 0.85  # Reduce 15% if congested
+        # 1. Build feature matrix (missing features default to 0)
+        X = pd.DataFrame(
+            [[features.get(col, 0) for col in self.feature_cols] for features in features_list],
+            columns=self.feature_cols
+        )
         
-        # 8. Confidence interval (±10%)
-        confidence_lower = final_speed * 0.90
-        confidence_upper = final_speed * 1.10
+        # 2. Scale features
+        X_scaled = self.scaler.transform(X)
         
-        # 9. Status
-        if congestion_prob > 0.7:
-            status = '🔴 HEAVY CONGESTION'
-        elif congestion_prob > 0.4:
-            status = '🟠 MODERATE'
-        else:
-            status = '🟢 FREE FLOW'
+        # 3. XGBoost: Congestion probability
+        congestion_probs = self.xgb_model.predict_proba(X_scaled)[:, 1]
+        
+        # 4. LightGBM: Speed prediction
+        speeds_lgbm = self.lgb_model.predict(X_scaled)
+        
+        results = []
+        for features_dict, congestion_prob, speed_lgbm in zip(features_list, congestion_probs, speeds_lgbm):
+            # 5. Weighted ensemble (60% LightGBM, 40% baseline)
+            final_speed = 0.60 * speed_lgbm + 0.40 * features_dict.get('speed_baseline', speed_lgbm)
+            
+            # 6. Adjust based on congestion
+            if congestion_prob > 0.7:
+                final_speed *= 0.85  # Reduce 15% if congested
+            
+            # 7. Confidence interval (±10%)
+            confidence_lower = final_speed * 0.90
+            confidence_upper = final_speed * 1.10
+            
+            # 8. Status
+            if congestion_prob > 0.7:
+                status = '🔴 HEAVY CONGESTION'
+            elif congestion_prob > 0.4:
+                status = '🟠 MODERATE'
+            else:
+                status = '🟢 FREE FLOW'
+            
+            results.append({
+                'predicted_speed': round(float(final_speed), 2),
+                'congestion_probability': round(float(congestion_prob), 3),
+                'status': status,
+                'confidence_interval': (round(float(confidence_lower), 2), round(float(confidence_upper), 2)),
+                'model_contributions': {
+                    'lightgbm_speed': round(float(speed_lgbm), 2),
+                    'xgboost_congestion_prob': round(float(congestion_prob), 3)
+                }
+            })
         
-        return {
-            'predicted_speed': round(final_speed, 2),
-            'congestion_probability': round(congestion_prob, 3),
-            'status': status,
-            'confidence_interval': (round(confidence_lower, 2), round(confidence_upper, 2)),
-            'model_contributions': {
-                'lightgbm_speed': round(speed_lgbm, 2),
-                'xgboost_congestion_prob': round(congestion_prob, 3)
-            }
-        }
+        return results
     
     def predict_segment_future(self, segment_id, current_features, horizon_minutes=30):
         """
@@ -0,0 +1,275 @@
+"""
+Build Road Graph Snapshot
+Compiles RoadSegment rows (SQL Server, another SQLAlchemy database, or a
+JSON/GeoJSON/CSV export) into the routing graph, travel time profiles and
+a checksummed snapshot the backend loads at startup (ROUTING_GRAPH_SNAPSHOT)
+"""
+
+import sys
+import csv
+import json
+import time
+import shutil
+import hashlib
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+# Add parent directories to path
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.traffic import RoadSegment
+from app.services.feature_engineering_service import FeatureEngineeringService
+from app.services.graph_cache import RoadGraphCache
+from app.services.graph_snapshot import load_graph, save_graph
+from app.services.road_graph import segment_record, build_road_graph
+from app.services.travel_time_profiles import TravelTimeProfiles, BUCKET_MINUTES, BUCKETS_PER_DAY
+
+
+def open_session(source: str):
+    """Session on the configured database ('db') or a SQLAlchemy URL such as sqlite:///roads.db"""
+    if source == "db":
+        from app.core.database import SessionLocal
+        return SessionLocal()
+    return sessionmaker(bind=create_engine(source))()
+
+
+def coerce_column(column, value):
+    """Convert a JSON/CSV value to the Python type of a RoadSegment column"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if python_type is int:
+        return int(float(value))
+    if python_type is str:
+        return str(value)
+    return float(value)
+
+
+def make_segment(row: dict) -> RoadSegment:
+    """Transient RoadSegment from a dict keyed by column name (unknown keys are ignored)"""
+    columns = RoadSegment.__table__.columns
+    return RoadSegment(**{
+        key: coerce_column(columns[key], value)
+        for key, value in row.items()
+        if key in columns
+    })
+
+
+def seed_format_row(item: dict) -> dict:
+    """RoadSegment columns of a road_segments.json entry (same mapping as seed_road_segments.py)"""
+    origin, destination = item["origin"], item["destination"]
+    return {
+        "id": item["id"],
+        "roadName": item["name"],
+        "roadClass": item.get("road_class"),
+        "location": {
+            "type": "LineString",
+            "coordinates": [[origin["lng"], origin["lat"]], [destination["lng"], destination["lat"]]]
+        },
+        "startPoint": {"type": "Point", "coordinates": [origin["lng"], origin["lat"]]},
+        "endPoint": {"type": "Point", "coordinates": [destination["lng"], destination["lat"]]},
+        "maximumAllowedSpeed": item.get("speed_limit", 50),
+        "totalLaneNumber": item.get("total_lanes", 4)
+    }
+
+
+def feature_row(feature: dict) -> dict:
+    """RoadSegment columns of a GeoJSON feature: its properties plus the line and end points"""
+    row = dict(feature.get("properties") or {})
+    row.setdefault("id", feature.get("id"))
+    geometry = feature.get("geometry")
+    if geometry and geometry.get("type") == "LineString" and geometry.get("coordinates"):
+        row.setdefault("location", geometry)
+        row.setdefault("startPoint", {"type": "Point", "coordinates": geometry["coordinates"][0]})
+        row.setdefault("endPoint", {"type": "Point", "coordinates": geometry["coordinates"][-1]})
+    return row
+
+
+def load_file_segments(path: Path) -> list:
+    """
+    RoadSegments from an export file
+    
+    - .csv: one row per segment, headers are RoadSegment column names
+    - .geojson / .json FeatureCollection: LineString features with RoadSegment properties
+    - .json list: road_segments.json format (id, name, origin, destination, ...)
+    """
+    if path.suffix.lower() == ".csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("type") == "FeatureCollection":
+            rows = [feature_row(feature) for feature in data["features"]]
+        else:
+            rows = [seed_format_row(item) if "origin" in item else item for item in data]
+    return [make_segment(row) for row in rows]
+
+
+def load_observations(csv_path: str):
+    """
+    Bucketed speeds from a traffic CSV (timestamp, segment_id, speed_kmh),
+    as written by collect_to_csv.py / generate_synthetic_traffic_data.py
+    """
+    import pandas as pd
+    
+    df = pd.read_csv(csv_path, usecols=["timestamp", "segment_id", "speed_kmh"]).dropna()
+    timestamps = pd.to_datetime(df["timestamp"])
+    df["bucket"] = (timestamps.dt.hour * 60 + timestamps.dt.minute) // BUCKET_MINUTES
+    grouped = df.groupby(["segment_id", "bucket"])["speed_kmh"].mean().reset_index()
+    return (
+        grouped["segment_id"].astype(str).tolist(),
+        grouped["bucket"].astype(int).tolist(),
+        grouped["speed_kmh"].astype(float).tolist()
+    )
+
+
+def replace_snapshot(graph, profiles, output: Path, meta: dict):
+    """Write the snapshot next to `output`, then swap it into place"""
+    staging = output.with_name(output.name + ".new")
+    previous = output.with_name(output.name + ".old")
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(previous, ignore_errors=True)
+    save_graph(graph, staging, profiles, meta)
+    if output.exists():
+        output.rename(previous)
+    staging.rename(output)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def build_snapshot(
+    source: str = "db",
+    output: str = None,
+    observations: str = None,
+    profiles: bool = True
+):
+    """
+    Build the routing graph from a source and write it as a snapshot
+    
+    Args:
+        source: 'db', a SQLAlchemy URL, or a .json/.geojson/.csv export
+        output: Snapshot directory (default: graph_snapshot in ROUTING_CACHE_DIR)
+        observations: Traffic CSV for speed profiles (default: TrafficFlowObserved for database sources)
+        profiles: Include travel time profiles
+    """
+    output = Path(output) if output else BACKEND_DIR / settings.ROUTING_CACHE_DIR / "graph_snapshot"
+    
+    print("\n" + "="*60)
+    print("BUILDING ROAD GRAPH SNAPSHOT")
+    print("="*60 + "\n")
+    
+    db = None
+    started = time.time()
+    try:
+        if source == "db" or "://" in source:
+            # Same build as the backend, so the version matches its RoadSegment probe
+            db = open_session(source)
+            cache = RoadGraphCache()
+            graph = cache.get_graph(db)
+            count, max_modified = cache.fingerprint
+            meta = {
+                "source": "database",
+                "fingerprint": [count, max_modified.isoformat() if max_modified else None]
+            }
+        else:
+            path = Path(source)
+            segments = load_file_segments(path)
+            print(f"📄 Loaded {len(segments)} segments from {path}")
+            records = {segment.id: segment_record(segment) for segment in segments}
+            version = hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+            graph = build_road_graph(records, version=version)
+            meta = {"source": path.name, "fingerprint": None}
+        print(f"🗺️  Graph: {graph.num_nodes} segments, {graph.num_edges} connections "
+              f"(version {graph.version}, {time.time() - started:.2f}s)")
+        
+        travel_time_profiles = None
+        if profiles:
+            feature_service = FeatureEngineeringService(db)
+            if observations:
+                speeds = load_observations(observations)
+            elif db is not None:
+                speeds = feature_service.get_bucket_speeds(
+                    days=settings.ROUTING_PROFILE_HISTORY_DAYS,
+                    bucket_minutes=BUCKET_MINUTES
+                )
+            else:
+                speeds = ([], [], [])
+            default_speeds = np.repeat(
+                [feature_service._default_baseline_speed(hour) for hour in range(24)],
+                BUCKETS_PER_DAY // 24
+            )
+            travel_time_profiles = TravelTimeProfiles.build(graph, speeds, default_speeds)
+            print(f"⏱️  Profiles: {travel_time_profiles.observed_segments} observed segments, "
+                  f"{len(travel_time_profiles.pace)} profiles")
+        
+        meta["built_at"] = datetime.now().isoformat()
+        replace_snapshot(graph, travel_time_profiles, output, meta)
+        
+        # Load it back the way the backend does
+        loaded_at = time.perf_counter()
+        load_graph(output, verify=True)
+        load_ms = (time.perf_counter() - loaded_at) * 1000
+        size_mb = sum(file.stat().st_size for file in output.iterdir()) / 1e6
+        
+        print(f"\n" + "="*60)
+        print(f"✅ SNAPSHOT WRITTEN!")
+        print(f"   Path: {output.resolve()}")
+        print(f"   Size: {size_mb:.1f} MB, verified load in {load_ms:.0f} ms")
+        print(f"   Set ROUTING_GRAPH_SNAPSHOT={output.resolve()} in backend/.env")
+        print("="*60 + "\n")
+    
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        sys.exit(1)
+    
+    finally:
+        if db is not None:
+            db.close()
+
+
+def main():
+    """Main function"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build a road graph snapshot for the routing backend")
+    parser.add_argument(
+        "--source",
+        type=str,
+        default="db",
+        help="'db' (backend database), a SQLAlchemy URL, or a .json/.geojson/.csv RoadSegment export"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Snapshot directory (default: <ROUTING_CACHE_DIR>/graph_snapshot)"
+    )
+    parser.add_argument(
+        "--observations",
+        type=str,
+        default=None,
+        help="Traffic CSV (timestamp, segment_id, speed_kmh) for travel time profiles"
+    )
+    parser.add_argument(
+        "--no-profiles",
+        action="store_true",
+        help="Leave travel time profiles out of the snapshot"
+    )
+    
+    args = parser.parse_args()
+    build_snapshot(args.source, args.output, args.observations, not args.no_profiles)
+
+
+if __name__ == "__main__":
+    main()